@@ -2,7 +2,7 @@ import sys
 from pathlib import Path
 from logging.config import fileConfig
 from config import settings
-from app.models import Base
+from app.models import Base  # importing the package registers every model
 from sqlalchemy import engine_from_config, pool
 from alembic import context
 
@@ -38,6 +38,12 @@ def run_migrations_offline() -> None:
 
 def run_migrations_online() -> None:
     """Run migrations in online mode."""
+    # Callers such as database.upgrade_schema() pass their own connection
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _run_with_connection(connection)
+        return
+
     connectable = engine_from_config(
         {"sqlalchemy.url": settings.DATABASE_URL},
         prefix="sqlalchemy.",
@@ -45,14 +51,18 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
-        context.configure(
-            connection=connection,
-            target_metadata=target_metadata,
-            compare_type=True,
-        )
-
-        with context.begin_transaction():
-            context.run_migrations()
+        _run_with_connection(connection)
+
+
+def _run_with_connection(connection) -> None:
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        compare_type=True,
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
 
 
 if context.is_offline_mode():
@@ -0,0 +1,176 @@
+"""Create schema
+
+Revision ID: 4b7f2c9d1e3a
+Revises: ebacf8e0bb7e
+Create Date: 2026-10-19 15:22:12.390977
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b7f2c9d1e3a'
+down_revision: Union[str, None] = 'ebacf8e0bb7e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ENUMS = {
+    'userrole': ('PATIENT', 'DOCTOR'),
+    'appointmentstatus': ('PENDING', 'APPROVED', 'REJECTED', 'COMPLETED', 'CANCELLED'),
+    'recordtype': ('LAB_REPORT', 'PRESCRIPTION', 'MEDICAL_DOCUMENT', 'IMAGING'),
+    'remindertype': ('MEDICINE', 'FOOD', 'EXERCISE', 'CUSTOM'),
+}
+
+
+def _enum(name: str) -> sa.Enum:
+    # PostgreSQL types are created up front with checkfirst: a table dropped
+    # by the old ebacf8e0bb7e left its enum type behind.
+    return sa.Enum(*ENUMS[name], name=name).with_variant(
+        postgresql.ENUM(*ENUMS[name], name=name, create_type=False), 'postgresql'
+    )
+
+
+def upgrade() -> None:
+    # Databases created by the old create_all() at startup already have some
+    # or all of these tables; only create what is missing.
+    bind = op.get_bind()
+    existing = set(sa.inspect(bind).get_table_names())
+    if bind.dialect.name == 'postgresql':
+        for name, values in ENUMS.items():
+            postgresql.ENUM(*values, name=name).create(bind, checkfirst=True)
+
+    if 'users' not in existing:
+        op.create_table('users',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('email', sa.String(length=100), nullable=False),
+        sa.Column('password', sa.String(length=255), nullable=False),
+        sa.Column('role', _enum('userrole'), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_users_email'), 'users', ['email'], unique=True)
+        op.create_index(op.f('ix_users_id'), 'users', ['id'], unique=False)
+    if 'appointments' not in existing:
+        op.create_table('appointments',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('patient_id', sa.Integer(), nullable=False),
+        sa.Column('doctor_id', sa.Integer(), nullable=False),
+        sa.Column('date', sa.DateTime(), nullable=False),
+        sa.Column('reason', sa.String(length=500), nullable=True),
+        sa.Column('status', _enum('appointmentstatus'), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['doctor_id'], ['users.id'], ),
+        sa.ForeignKeyConstraint(['patient_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_appointments_id'), 'appointments', ['id'], unique=False)
+    if 'health_records' not in existing:
+        op.create_table('health_records',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('patient_id', sa.Integer(), nullable=False),
+        sa.Column('type', _enum('recordtype'), nullable=False),
+        sa.Column('title', sa.String(length=200), nullable=False),
+        sa.Column('file_url', sa.String(length=500), nullable=False),
+        sa.Column('uploaded_at', sa.DateTime(), nullable=True),
+        sa.Column('notes', sa.String(length=500), nullable=True),
+        sa.ForeignKeyConstraint(['patient_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_health_records_id'), 'health_records', ['id'], unique=False)
+    if 'medications' not in existing:
+        op.create_table('medications',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('dosage', sa.String(length=50), nullable=False),
+        sa.Column('time', sa.String(length=10), nullable=False),
+        sa.Column('total_tablets', sa.Integer(), nullable=False),
+        sa.Column('remaining_tablets', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_medications_id'), 'medications', ['id'], unique=False)
+    if 'messages' not in existing:
+        op.create_table('messages',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('sender_id', sa.Integer(), nullable=False),
+        sa.Column('receiver_id', sa.Integer(), nullable=False),
+        sa.Column('message', sa.String(length=1000), nullable=False),
+        sa.Column('timestamp', sa.DateTime(), nullable=True),
+        sa.Column('is_read', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['receiver_id'], ['users.id'], ),
+        sa.ForeignKeyConstraint(['sender_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_messages_id'), 'messages', ['id'], unique=False)
+    if 'prescriptions' not in existing:
+        op.create_table('prescriptions',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('patient_id', sa.Integer(), nullable=False),
+        sa.Column('doctor_id', sa.Integer(), nullable=False),
+        sa.Column('medicine', sa.String(length=100), nullable=False),
+        sa.Column('dosage', sa.String(length=50), nullable=False),
+        sa.Column('timing', sa.String(length=200), nullable=False),
+        sa.Column('duration', sa.String(length=50), nullable=True),
+        sa.Column('notes', sa.String(length=500), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['doctor_id'], ['users.id'], ),
+        sa.ForeignKeyConstraint(['patient_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_prescriptions_id'), 'prescriptions', ['id'], unique=False)
+    if 'reminders' not in existing:
+        op.create_table('reminders',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('type', _enum('remindertype'), nullable=False),
+        sa.Column('title', sa.String(length=100), nullable=False),
+        sa.Column('time', sa.String(length=10), nullable=False),
+        sa.Column('is_active', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_reminders_id'), 'reminders', ['id'], unique=False)
+    if 'symptom_diary' not in existing:
+        op.create_table('symptom_diary',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('date', sa.DateTime(), nullable=False),
+        sa.Column('symptoms', sa.String(length=500), nullable=False),
+        sa.Column('severity', sa.Integer(), nullable=False),
+        sa.Column('notes', sa.String(length=1000), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_symptom_diary_id'), 'symptom_diary', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_symptom_diary_id'), table_name='symptom_diary')
+    op.drop_table('symptom_diary')
+    op.drop_index(op.f('ix_reminders_id'), table_name='reminders')
+    op.drop_table('reminders')
+    op.drop_index(op.f('ix_prescriptions_id'), table_name='prescriptions')
+    op.drop_table('prescriptions')
+    op.drop_index(op.f('ix_messages_id'), table_name='messages')
+    op.drop_table('messages')
+    op.drop_index(op.f('ix_medications_id'), table_name='medications')
+    op.drop_table('medications')
+    op.drop_index(op.f('ix_health_records_id'), table_name='health_records')
+    op.drop_table('health_records')
+    op.drop_index(op.f('ix_appointments_id'), table_name='appointments')
+    op.drop_table('appointments')
+    op.drop_index(op.f('ix_users_id'), table_name='users')
+    op.drop_index(op.f('ix_users_email'), table_name='users')
+    op.drop_table('users')
+    if op.get_bind().dialect.name == 'postgresql':
+        for name, values in ENUMS.items():
+            postgresql.ENUM(*values, name=name).drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,65 @@
+"""Audit events
+
+Revision ID: 7d2a9e4c5b10
+Revises: 4b7f2c9d1e3a
+Create Date: 2026-10-19 17:05:41.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d2a9e4c5b10'
+down_revision: Union[str, None] = '4b7f2c9d1e3a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        # Range-partitioned by month: old months can be detached or dropped
+        # without touching the rest, and patient queries only scan the
+        # partitions in their time range. Monthly partitions are created by
+        # app.services.audit_services; the default partition catches rows
+        # for months that do not have one yet.
+        op.execute("""
+            CREATE TABLE audit_events (
+                id BIGINT GENERATED BY DEFAULT AS IDENTITY,
+                occurred_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+                actor_id INTEGER NOT NULL,
+                actor_role VARCHAR(20) NOT NULL,
+                patient_id INTEGER NOT NULL,
+                action VARCHAR(50) NOT NULL,
+                resource_id INTEGER,
+                PRIMARY KEY (id, occurred_at)
+            ) PARTITION BY RANGE (occurred_at)
+        """)
+        op.execute(
+            'CREATE TABLE audit_events_default PARTITION OF audit_events DEFAULT'
+        )
+    else:
+        op.create_table('audit_events',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('occurred_at', sa.DateTime(), nullable=False),
+        sa.Column('actor_id', sa.Integer(), nullable=False),
+        sa.Column('actor_role', sa.String(length=20), nullable=False),
+        sa.Column('patient_id', sa.Integer(), nullable=False),
+        sa.Column('action', sa.String(length=50), nullable=False),
+        sa.Column('resource_id', sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+    op.create_index(
+        'ix_audit_events_patient_occurred',
+        'audit_events',
+        ['patient_id', 'occurred_at'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_audit_events_patient_occurred', table_name='audit_events')
+    # Dropping a partitioned table drops its partitions
+    op.drop_table('audit_events')
@@ -0,0 +1,32 @@
+"""Shard directory
+
+Revision ID: 9e6b3f1a2c47
+Revises: 7d2a9e4c5b10
+Create Date: 2026-10-19 18:12:09.552731
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e6b3f1a2c47'
+down_revision: Union[str, None] = '7d2a9e4c5b10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('shard_directory',
+    sa.Column('patient_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('shard', sa.String(length=50), nullable=False),
+    sa.Column('moving_to', sa.String(length=50), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('patient_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('shard_directory')
@@ -0,0 +1,30 @@
+"""Id blocks for ids unique across shards
+
+Revision ID: a7d2c9e4f5b1
+Revises: f3a9d6c2e1b7
+Create Date: 2026-10-19 17:02:41.530618
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d2c9e4f5b1'
+down_revision: Union[str, None] = 'f3a9d6c2e1b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('id_blocks',
+    sa.Column('table_name', sa.String(length=64), nullable=False),
+    sa.Column('next_id', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('table_name')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('id_blocks')
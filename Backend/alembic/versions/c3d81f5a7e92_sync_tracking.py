@@ -0,0 +1,58 @@
+"""Sync tracking and tombstones
+
+Revision ID: c3d81f5a7e92
+Revises: 9e6b3f1a2c47
+Create Date: 2026-10-19 19:02:37.410558
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3d81f5a7e92'
+down_revision: Union[str, None] = '9e6b3f1a2c47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# table -> (column existing rows take updated_at from, owner columns)
+TABLES = {
+    'medications': ('created_at', ('user_id',)),
+    'reminders': ('created_at', ('user_id',)),
+    'symptom_diary': ('created_at', ('user_id',)),
+    'appointments': ('created_at', ('patient_id', 'doctor_id')),
+    'prescriptions': ('created_at', ('patient_id', 'doctor_id')),
+    'messages': ('timestamp', ('sender_id', 'receiver_id')),
+}
+
+
+def _index_name(table, owner):
+    return f"ix_{table}_{owner.split('_')[0]}_updated"
+
+
+def upgrade() -> None:
+    for table, (created, owners) in TABLES.items():
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=True))
+        op.add_column(table, sa.Column('deleted_at', sa.DateTime(), nullable=True))
+        op.execute(
+            f"UPDATE {table} SET updated_at = COALESCE({created}, CURRENT_TIMESTAMP)"
+        )
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column(
+                'updated_at', existing_type=sa.DateTime(), nullable=False
+            )
+        for owner in owners:
+            op.create_index(
+                _index_name(table, owner), table, [owner, 'updated_at'], unique=False
+            )
+
+
+def downgrade() -> None:
+    for table, (_, owners) in TABLES.items():
+        for owner in owners:
+            op.drop_index(_index_name(table, owner), table_name=table)
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('deleted_at')
+            batch_op.drop_column('updated_at')
@@ -0,0 +1,34 @@
+"""Canonical drug ids
+
+Revision ID: d5e2a7c4b918
+Revises: c3d81f5a7e92
+Create Date: 2026-10-19 21:40:12.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5e2a7c4b918'
+down_revision: Union[str, None] = 'c3d81f5a7e92'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('prescriptions', sa.Column('drug_id', sa.String(length=32), nullable=True))
+    op.create_index(op.f('ix_prescriptions_drug_id'), 'prescriptions', ['drug_id'], unique=False)
+    op.add_column('medications', sa.Column('drug_id', sa.String(length=32), nullable=True))
+    op.create_index(op.f('ix_medications_drug_id'), 'medications', ['drug_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_medications_drug_id'), table_name='medications')
+    with op.batch_alter_table('medications') as batch_op:
+        batch_op.drop_column('drug_id')
+    op.drop_index(op.f('ix_prescriptions_drug_id'), table_name='prescriptions')
+    with op.batch_alter_table('prescriptions') as batch_op:
+        batch_op.drop_column('drug_id')
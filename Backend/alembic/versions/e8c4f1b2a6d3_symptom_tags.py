@@ -0,0 +1,37 @@
+"""Symptom tags
+
+Revision ID: e8c4f1b2a6d3
+Revises: d5e2a7c4b918
+Create Date: 2026-10-19 23:05:41.502377
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8c4f1b2a6d3'
+down_revision: Union[str, None] = 'd5e2a7c4b918'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('symptom_tags',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_index(op.f('ix_symptom_tags_id'), 'symptom_tags', ['id'], unique=False)
+    op.add_column('symptom_diary', sa.Column('tag_ids', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('symptom_diary') as batch_op:
+        batch_op.drop_column('tag_ids')
+    op.drop_index(op.f('ix_symptom_tags_id'), table_name='symptom_tags')
+    op.drop_table('symptom_tags')
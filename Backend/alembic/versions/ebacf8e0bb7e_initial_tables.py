@@ -9,7 +9,6 @@ from typing import Sequence, Union
 
 from alembic import op
 import sqlalchemy as sa
-from sqlalchemy.dialects import postgresql
 
 # revision identifiers, used by Alembic.
 revision: str = 'ebacf8e0bb7e'
@@ -19,127 +18,11 @@ depends_on: Union[str, Sequence[str], None] = None
 
 
 def upgrade() -> None:
-    # ### commands auto generated by Alembic - please adjust! ###
-    op.drop_index('ix_users_email', table_name='users')
-    op.drop_index('ix_users_id', table_name='users')
-    op.drop_table('users')
-    op.drop_index('ix_prescriptions_id', table_name='prescriptions')
-    op.drop_table('prescriptions')
-    op.drop_index('ix_reminders_id', table_name='reminders')
-    op.drop_table('reminders')
-    op.drop_index('ix_appointments_id', table_name='appointments')
-    op.drop_table('appointments')
-    op.drop_index('ix_health_records_id', table_name='health_records')
-    op.drop_table('health_records')
-    op.drop_index('ix_medications_id', table_name='medications')
-    op.drop_table('medications')
-    op.drop_index('ix_symptom_diary_id', table_name='symptom_diary')
-    op.drop_table('symptom_diary')
-    op.drop_index('ix_messages_id', table_name='messages')
-    op.drop_table('messages')
-    # ### end Alembic commands ###
+    # Autogenerated against an empty metadata, this revision used to drop
+    # every table. It is kept as a no-op so existing databases stamped with
+    # it still upgrade; 4b7f2c9d1e3a creates the schema.
+    pass
 
 
 def downgrade() -> None:
-    # ### commands auto generated by Alembic - please adjust! ###
-    op.create_table('messages',
-    sa.Column('id', sa.INTEGER(), autoincrement=True, nullable=False),
-    sa.Column('sender_id', sa.INTEGER(), autoincrement=False, nullable=False),
-    sa.Column('receiver_id', sa.INTEGER(), autoincrement=False, nullable=False),
-    sa.Column('message', sa.VARCHAR(length=1000), autoincrement=False, nullable=False),
-    sa.Column('timestamp', postgresql.TIMESTAMP(), autoincrement=False, nullable=True),
-    sa.Column('is_read', sa.INTEGER(), autoincrement=False, nullable=True),
-    sa.ForeignKeyConstraint(['receiver_id'], ['users.id'], name='messages_receiver_id_fkey'),
-    sa.ForeignKeyConstraint(['sender_id'], ['users.id'], name='messages_sender_id_fkey'),
-    sa.PrimaryKeyConstraint('id', name='messages_pkey')
-    )
-    op.create_index('ix_messages_id', 'messages', ['id'], unique=False)
-    op.create_table('symptom_diary',
-    sa.Column('id', sa.INTEGER(), autoincrement=True, nullable=False),
-    sa.Column('user_id', sa.INTEGER(), autoincrement=False, nullable=False),
-    sa.Column('date', postgresql.TIMESTAMP(), autoincrement=False, nullable=False),
-    sa.Column('symptoms', sa.VARCHAR(length=500), autoincrement=False, nullable=False),
-    sa.Column('severity', sa.INTEGER(), autoincrement=False, nullable=False),
-    sa.Column('notes', sa.VARCHAR(length=1000), autoincrement=False, nullable=True),
-    sa.Column('created_at', postgresql.TIMESTAMP(), autoincrement=False, nullable=True),
-    sa.ForeignKeyConstraint(['user_id'], ['users.id'], name='symptom_diary_user_id_fkey'),
-    sa.PrimaryKeyConstraint('id', name='symptom_diary_pkey')
-    )
-    op.create_index('ix_symptom_diary_id', 'symptom_diary', ['id'], unique=False)
-    op.create_table('medications',
-    sa.Column('id', sa.INTEGER(), autoincrement=True, nullable=False),
-    sa.Column('user_id', sa.INTEGER(), autoincrement=False, nullable=False),
-    sa.Column('name', sa.VARCHAR(length=100), autoincrement=False, nullable=False),
-    sa.Column('dosage', sa.VARCHAR(length=50), autoincrement=False, nullable=False),
-    sa.Column('time', sa.VARCHAR(length=10), autoincrement=False, nullable=False),
-    sa.Column('total_tablets', sa.INTEGER(), autoincrement=False, nullable=False),
-    sa.Column('remaining_tablets', sa.INTEGER(), autoincrement=False, nullable=False),
-    sa.Column('created_at', postgresql.TIMESTAMP(), autoincrement=False, nullable=True),
-    sa.ForeignKeyConstraint(['user_id'], ['users.id'], name='medications_user_id_fkey'),
-    sa.PrimaryKeyConstraint('id', name='medications_pkey')
-    )
-    op.create_index('ix_medications_id', 'medications', ['id'], unique=False)
-    op.create_table('health_records',
-    sa.Column('id', sa.INTEGER(), autoincrement=True, nullable=False),
-    sa.Column('patient_id', sa.INTEGER(), autoincrement=False, nullable=False),
-    sa.Column('type', postgresql.ENUM('LAB_REPORT', 'PRESCRIPTION', 'MEDICAL_DOCUMENT', 'IMAGING', name='recordtype'), autoincrement=False, nullable=False),
-    sa.Column('title', sa.VARCHAR(length=200), autoincrement=False, nullable=False),
-    sa.Column('file_url', sa.VARCHAR(length=500), autoincrement=False, nullable=False),
-    sa.Column('uploaded_at', postgresql.TIMESTAMP(), autoincrement=False, nullable=True),
-    sa.Column('notes', sa.VARCHAR(length=500), autoincrement=False, nullable=True),
-    sa.ForeignKeyConstraint(['patient_id'], ['users.id'], name='health_records_patient_id_fkey'),
-    sa.PrimaryKeyConstraint('id', name='health_records_pkey')
-    )
-    op.create_index('ix_health_records_id', 'health_records', ['id'], unique=False)
-    op.create_table('appointments',
-    sa.Column('id', sa.INTEGER(), autoincrement=True, nullable=False),
-    sa.Column('patient_id', sa.INTEGER(), autoincrement=False, nullable=False),
-    sa.Column('doctor_id', sa.INTEGER(), autoincrement=False, nullable=False),
-    sa.Column('date', postgresql.TIMESTAMP(), autoincrement=False, nullable=False),
-    sa.Column('reason', sa.VARCHAR(length=500), autoincrement=False, nullable=True),
-    sa.Column('status', postgresql.ENUM('PENDING', 'APPROVED', 'REJECTED', 'COMPLETED', 'CANCELLED', name='appointmentstatus'), autoincrement=False, nullable=True),
-    sa.Column('created_at', postgresql.TIMESTAMP(), autoincrement=False, nullable=True),
-    sa.ForeignKeyConstraint(['doctor_id'], ['users.id'], name='appointments_doctor_id_fkey'),
-    sa.ForeignKeyConstraint(['patient_id'], ['users.id'], name='appointments_patient_id_fkey'),
-    sa.PrimaryKeyConstraint('id', name='appointments_pkey')
-    )
-    op.create_index('ix_appointments_id', 'appointments', ['id'], unique=False)
-    op.create_table('reminders',
-    sa.Column('id', sa.INTEGER(), autoincrement=True, nullable=False),
-    sa.Column('user_id', sa.INTEGER(), autoincrement=False, nullable=False),
-    sa.Column('type', postgresql.ENUM('MEDICINE', 'FOOD', 'EXERCISE', 'CUSTOM', name='remindertype'), autoincrement=False, nullable=False),
-    sa.Column('title', sa.VARCHAR(length=100), autoincrement=False, nullable=False),
-    sa.Column('time', sa.VARCHAR(length=10), autoincrement=False, nullable=False),
-    sa.Column('is_active', sa.INTEGER(), autoincrement=False, nullable=True),
-    sa.Column('created_at', postgresql.TIMESTAMP(), autoincrement=False, nullable=True),
-    sa.ForeignKeyConstraint(['user_id'], ['users.id'], name='reminders_user_id_fkey'),
-    sa.PrimaryKeyConstraint('id', name='reminders_pkey')
-    )
-    op.create_index('ix_reminders_id', 'reminders', ['id'], unique=False)
-    op.create_table('prescriptions',
-    sa.Column('id', sa.INTEGER(), autoincrement=True, nullable=False),
-    sa.Column('patient_id', sa.INTEGER(), autoincrement=False, nullable=False),
-    sa.Column('doctor_id', sa.INTEGER(), autoincrement=False, nullable=False),
-    sa.Column('medicine', sa.VARCHAR(length=100), autoincrement=False, nullable=False),
-    sa.Column('dosage', sa.VARCHAR(length=50), autoincrement=False, nullable=False),
-    sa.Column('timing', sa.VARCHAR(length=200), autoincrement=False, nullable=False),
-    sa.Column('duration', sa.VARCHAR(length=50), autoincrement=False, nullable=True),
-    sa.Column('notes', sa.VARCHAR(length=500), autoincrement=False, nullable=True),
-    sa.Column('created_at', postgresql.TIMESTAMP(), autoincrement=False, nullable=True),
-    sa.ForeignKeyConstraint(['doctor_id'], ['users.id'], name='prescriptions_doctor_id_fkey'),
-    sa.ForeignKeyConstraint(['patient_id'], ['users.id'], name='prescriptions_patient_id_fkey'),
-    sa.PrimaryKeyConstraint('id', name='prescriptions_pkey')
-    )
-    op.create_index('ix_prescriptions_id', 'prescriptions', ['id'], unique=False)
-    op.create_table('users',
-    sa.Column('id', sa.INTEGER(), autoincrement=True, nullable=False),
-    sa.Column('name', sa.VARCHAR(length=100), autoincrement=False, nullable=False),
-    sa.Column('email', sa.VARCHAR(length=100), autoincrement=False, nullable=False),
-    sa.Column('password', sa.VARCHAR(length=255), autoincrement=False, nullable=False),
-    sa.Column('role', postgresql.ENUM('PATIENT', 'DOCTOR', name='userrole'), autoincrement=False, nullable=False),
-    sa.Column('created_at', postgresql.TIMESTAMP(), autoincrement=False, nullable=True),
-    sa.PrimaryKeyConstraint('id', name='users_pkey')
-    )
-    op.create_index('ix_users_id', 'users', ['id'], unique=False)
-    op.create_index('ix_users_email', 'users', ['email'], unique=True)
-    # ### end Alembic commands ###
+    pass
@@ -0,0 +1,56 @@
+"""Vital readings and rollups
+
+Revision ID: f3a9d6c2e1b7
+Revises: e8c4f1b2a6d3
+Create Date: 2026-10-19 16:11:56.184293
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a9d6c2e1b7'
+down_revision: Union[str, None] = 'e8c4f1b2a6d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('vital_readings',
+    sa.Column('id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), autoincrement=True, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('device_id', sa.String(length=64), nullable=False),
+    sa.Column('kind', sa.String(length=32), nullable=False),
+    sa.Column('measured_at', sa.DateTime(), nullable=False),
+    sa.Column('value', sa.Float(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_vital_readings_user_kind_time', 'vital_readings', ['user_id', 'kind', 'measured_at'], unique=False)
+    op.create_index('ux_vital_readings_device', 'vital_readings', ['user_id', 'device_id', 'kind', 'measured_at'], unique=True)
+    op.create_table('vital_rollups',
+    sa.Column('id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), autoincrement=True, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=32), nullable=False),
+    sa.Column('bucket', sa.String(length=8), nullable=False),
+    sa.Column('bucket_start', sa.DateTime(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('total', sa.Float(), nullable=False),
+    sa.Column('min_value', sa.Float(), nullable=False),
+    sa.Column('max_value', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ux_vital_rollups_bucket', 'vital_rollups', ['user_id', 'kind', 'bucket', 'bucket_start'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ux_vital_rollups_bucket', table_name='vital_rollups')
+    op.drop_table('vital_rollups')
+    op.drop_index('ux_vital_readings_device', table_name='vital_readings')
+    op.drop_index('ix_vital_readings_user_kind_time', table_name='vital_readings')
+    op.drop_table('vital_readings')
@@ -1,41 +1,83 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from database import get_db
 from app.models.user import User
+from app.utils import etag
+from app.utils.fieldsets import (
+    FIELDS_DESCRIPTION,
+    fields_variant,
+    parse_fields,
+    project_fields,
+    render_fields,
+)
 from app.utils.security import get_current_user
 from app.models.appointment import Appointment
+from app.services.user_services import get_user_name
 from app.schemas.appointment import (
     AppointmentCreate,
     AppointmentResponse,
     AppointmentUpdate,
 )
 from app.utils.security import get_current_doctor
+from app.utils.streaming import stream_ndjson, streamed, wants_ndjson
+from app.utils.metrics import InstrumentedRoute
+
+router = APIRouter(route_class=InstrumentedRoute)
+
+# Columns needed to compute derived response fields
+FIELD_DEPENDS = {"patient_name": ("patient_id",), "doctor_name": ("doctor_id",)}
 
-router = APIRouter()
+
+def _add_names(db, appointments, names):
+    for appt in appointments:
+        if not names or "patient_name" in names:
+            appt.patient_name = get_user_name(db, appt.patient_id)
+        if not names or "doctor_name" in names:
+            appt.doctor_name = get_user_name(db, appt.doctor_id)
 
 
 @router.get("/", response_model=List[AppointmentResponse])
 async def get_appointments(
-    current_user: User = Depends(get_current_user), db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
 ):
     """Get appointments for current user"""
+    names = parse_fields(fields, AppointmentResponse)
+    cached = etag.not_modified(
+        request,
+        response,
+        ("appointments", current_user.id),
+        variant=fields_variant(names),
+    )
+    if cached:
+        return cached
+
     if current_user.role == "patient":
-        appointments = (
-            db.query(Appointment)
-            .filter(Appointment.patient_id == current_user.id)
-            .all()
+        query = db.query(Appointment).filter(
+            Appointment.patient_id == current_user.id
         )
     else:  # doctor
-        appointments = (
-            db.query(Appointment).filter(Appointment.doctor_id == current_user.id).all()
+        query = db.query(Appointment).filter(Appointment.doctor_id == current_user.id)
+    if names:
+        query = project_fields(query, Appointment, names, FIELD_DEPENDS)
+    if wants_ndjson(request):
+        return stream_ndjson(
+            streamed(query),
+            AppointmentResponse,
+            names,
+            response,
+            lambda batch: _add_names(db, batch, names),
         )
+    appointments = query.all()
 
-    # Add user names
-    for appt in appointments:
-        appt.patient_name = appt.patient.name
-        appt.doctor_name = appt.doctor.name
+    _add_names(db, appointments, names)
 
+    if names:
+        return render_fields(appointments, AppointmentResponse, names, response)
     return appointments
 
 
@@ -66,6 +108,7 @@ async def create_appointment(
     db.add(new_appointment)
     db.commit()
     db.refresh(new_appointment)
+    etag.bump("appointments", current_user.id, doctor.id)
 
     new_appointment.patient_name = current_user.name
     new_appointment.doctor_name = doctor.name
@@ -94,7 +137,8 @@ async def update_appointment_status(
     appointment.status = status_data.status
     db.commit()
     db.refresh(appointment)
+    etag.bump("appointments", appointment.patient_id, current_user.id)
 
-    appointment.patient_name = appointment.patient.name
+    appointment.patient_name = get_user_name(db, appointment.patient_id)
     appointment.doctor_name = current_user.name
     return appointment
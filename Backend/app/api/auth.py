@@ -3,14 +3,17 @@ from sqlalchemy.orm import Session
 from database import get_db
 from app.models.user import User
 from app.schemas.user import UserCreate, UserLogin, UserResponse, Token
+from app.services.directory_services import doctor_directory
 from app.utils.security import (
     get_password_hash,
     verify_password,
     create_access_token,
     get_current_user,
 )
+from app.utils.metrics import InstrumentedRoute
+from app.utils.tracing import span
 
-router = APIRouter()
+router = APIRouter(route_class=InstrumentedRoute)
 
 
 @router.post("/register", response_model=Token, status_code=status.HTTP_201_CREATED)
@@ -32,7 +35,8 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
         )
 
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    with span("auth.argon2_hash"):
+        hashed_password = get_password_hash(user_data.password)
     new_user = User(
         name=user_data.name,
         email=user_data.email,
@@ -44,8 +48,11 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     db.commit()
     db.refresh(new_user)
 
+    if new_user.role == "doctor":
+        doctor_directory.add(new_user.id, new_user.name)
+
     # Create access token
-    access_token = create_access_token(data={"sub": new_user.id})
+    access_token = create_access_token(data={"sub": str(new_user.id)})
 
     return {"access_token": access_token, "token_type": "bearer", "user": new_user}
 
@@ -57,7 +64,11 @@ async def login(credentials: UserLogin, db: Session = Depends(get_db)):
     # Find user by email
     user = db.query(User).filter(User.email == credentials.email).first()
 
-    if not user or not verify_password(credentials.password, user.password):
+    with span("auth.argon2_verify"):
+        valid = user is not None and verify_password(
+            credentials.password, user.password
+        )
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -65,7 +76,7 @@ async def login(credentials: UserLogin, db: Session = Depends(get_db)):
         )
 
     # Create access token
-    access_token = create_access_token(data={"sub": user.id})
+    access_token = create_access_token(data={"sub": str(user.id)})
 
     return {"access_token": access_token, "token_type": "bearer", "user": user}
 
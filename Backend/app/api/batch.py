@@ -0,0 +1,186 @@
+import asyncio
+import json
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.orm import Session
+from config import settings
+from database import get_db
+from app.models.user import User
+from app.schemas.batch import (
+    BatchRequest,
+    BatchResponse,
+    BatchSubRequest,
+    BatchSubResponse,
+)
+from app.utils.replicas import RoutingSession
+from app.utils.security import get_current_user
+from app.utils.metrics import InstrumentedRoute
+from app.utils.streaming import NDJSON
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(route_class=InstrumentedRoute)
+
+# Response headers worth returning to the client per sub-request
+FORWARDED_HEADERS = ("content-type", "etag", "cache-control", "retry-after")
+
+
+async def _dispatch(
+    request: Request, sub: BatchSubRequest, state: dict
+) -> BatchSubResponse:
+    """Run one sub-request through the application in-process"""
+    path, _, query = sub.path.partition("?")
+    body = json.dumps(sub.body).encode() if sub.body is not None else b""
+
+    headers = {key.lower(): value for key, value in sub.headers.items()}
+    headers["authorization"] = request.headers.get("authorization", "")
+    headers["content-type"] = "application/json"
+    headers["content-length"] = str(len(body))
+
+    scope = {
+        "type": "http",
+        "asgi": request.scope.get("asgi", {"version": "3.0"}),
+        "http_version": "1.1",
+        "method": sub.method.upper(),
+        "scheme": request.url.scheme,
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": request.scope.get("root_path", ""),
+        "query_string": query.encode(),
+        "headers": [(k.encode("latin-1"), v.encode("latin-1")) for k, v in headers.items()],
+        "client": request.scope.get("client"),
+        "server": request.scope.get("server"),
+        "state": state,
+    }
+
+    sent_body = False
+    finished = asyncio.Event()
+    result = {"status": 500, "headers": {}, "body": b""}
+
+    async def receive():
+        nonlocal sent_body
+        if not sent_body:
+            sent_body = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            result["status"] = message["status"]
+            result["headers"] = {
+                k.decode("latin-1"): v.decode("latin-1")
+                for k, v in message.get("headers", [])
+            }
+        elif message["type"] == "http.response.body":
+            result["body"] += message.get("body", b"")
+            if not message.get("more_body", False):
+                finished.set()
+
+    try:
+        await request.app(scope, receive, send)
+    except Exception:
+        # The error middleware re-raises after sending its 500; the rest of
+        # the batch still runs and is returned
+        logger.exception("Batch sub-request %s %s failed", sub.method, path)
+        if not finished.is_set():  # failed part-way through its body
+            result.update(
+                status=500,
+                headers={"content-type": "application/json"},
+                body=b'{"detail":"Internal Server Error"}',
+            )
+        shared = state.get("batch_db")
+        if shared is not None:
+            shared.rollback()
+    finally:
+        finished.set()
+
+    payload = result["body"]
+    if payload and result["headers"].get("content-type", "").startswith(
+        "application/json"
+    ):
+        payload = json.loads(payload)
+    elif payload:
+        payload = payload.decode("utf-8", errors="replace")
+    else:
+        payload = None
+
+    return BatchSubResponse(
+        id=sub.id,
+        status=result["status"],
+        headers={
+            key: value
+            for key, value in result["headers"].items()
+            if key in FORWARDED_HEADERS
+        },
+        body=payload,
+    )
+
+
+@router.post("/", response_model=BatchResponse)
+async def run_batch(
+    batch: BatchRequest,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Execute several API requests in one round-trip
+
+    The caller is authenticated once for the whole batch. Consecutive GETs
+    run concurrently and share this request's session: the routers are
+    async and query synchronously on the event loop, so sub-requests only
+    interleave between queries. NDJSON responses are serialized in the
+    threadpool, so those GETs get sessions of their own. Any other method
+    is a barrier that runs on its own with its own session, in order. A
+    sub-request that fails gets its 500 without failing the others.
+    """
+    if len(batch.requests) > settings.BATCH_MAX_REQUESTS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"A batch may contain at most {settings.BATCH_MAX_REQUESTS} requests",
+        )
+    for sub in batch.requests:
+        if not sub.path.startswith("/api/") or sub.path.startswith("/api/batch"):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unsupported batch path: {sub.path}",
+            )
+
+    base_state = dict(request.scope.get("state", {}))
+    base_state.pop("batch_db", None)
+    read_state = {**base_state, "batch_user": current_user}
+    # A doctor's reads may each name a different patient, and so a different
+    # shard, which one shared session cannot follow
+    if RoutingSession.shards is None or current_user.role == "patient":
+        read_state["batch_db"] = db
+    write_state = {**base_state, "batch_user": current_user}
+
+    def state_for(sub: BatchSubRequest) -> dict:
+        headers = {key.lower(): value for key, value in sub.headers.items()}
+        if NDJSON in headers.get("accept", ""):
+            return dict(write_state)
+        return dict(read_state)
+
+    responses = []
+    pending_reads = []
+    for sub in batch.requests:
+        if sub.method.upper() == "GET":
+            pending_reads.append(sub)
+            continue
+        if pending_reads:
+            responses += await asyncio.gather(
+                *(_dispatch(request, read, state_for(read)) for read in pending_reads)
+            )
+            pending_reads = []
+        responses.append(await _dispatch(request, sub, dict(write_state)))
+        # Rows loaded by earlier reads may have been changed by the write,
+        # and a replica may not have it yet
+        db.expire_all()
+        db.info["wrote"] = True
+
+    if pending_reads:
+        responses += await asyncio.gather(
+            *(_dispatch(request, read, state_for(read)) for read in pending_reads)
+        )
+
+    return {"responses": responses}
@@ -1,21 +1,88 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
-from database import get_db
+from datetime import datetime, timedelta
+from typing import List, Optional
+from config import settings
+from database import get_db, get_read_db
+from app.models.appointment import Appointment
 from app.models.user import User
-from app.utils.security import get_current_doctor
-from app.schemas.user import UserResponse
+from app.utils import etag
+from app.utils.fieldsets import (
+    FIELDS_DESCRIPTION,
+    parse_fields,
+    project_fields,
+    render_fields,
+)
+from app.services.audit_services import record_access
+from app.services.directory_services import doctor_directory
+from app.services.export_services import (
+    EXPORTS,
+    FORMATS,
+    export_binds,
+    export_columns,
+    export_stream,
+    unknown_columns,
+)
+from app.services.symptom_services import (
+    co_occurrence,
+    load_matrix,
+    severity_correlations,
+    trends,
+)
+from app.utils.security import get_current_doctor, get_current_user
+from app.utils.streaming import stream_ndjson, streamed, wants_ndjson
+from app.schemas.symptom_diary import (
+    CoOccurrenceResponse,
+    SeverityCorrelation,
+    TrendResponse,
+)
+from app.schemas.user import DoctorSummary, UserResponse
+from app.utils.symptom_matrix import PERIODS
+from app.utils.metrics import InstrumentedRoute
 
 
-router = APIRouter()
+router = APIRouter(route_class=InstrumentedRoute)
+
+
+@router.get("/directory", response_model=List[DoctorSummary])
+async def search_doctors(
+    q: str = Query("", max_length=100, description="Name prefix (typeahead)"),
+    mine: bool = Query(False, description="Only doctors I have appointments with"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Search doctors by name prefix"""
+    # Normally built at startup; a refresh queries (in a session of its own),
+    # so keep it off the event loop
+    await asyncio.to_thread(doctor_directory.refresh)
+
+    only_ids = None
+    if mine:
+        only_ids = [
+            row[0]
+            for row in db.query(Appointment.doctor_id)
+            .filter(Appointment.patient_id == current_user.id)
+            .distinct()
+            .all()
+        ]
+
+    return doctor_directory.search(q, limit=limit, offset=offset, only_ids=only_ids)
 
 
 @router.get("/patients", response_model=List[UserResponse])
 async def get_doctor_patients(
-    current_user: User = Depends(get_current_doctor), db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    current_user: User = Depends(get_current_doctor),
+    db: Session = Depends(get_db),
 ):
     """Get list of patients for doctor"""
-    from app.models.appointment import Appointment
+    names = parse_fields(fields, UserResponse)
 
     # Get unique patients who have appointments with this doctor
     patient_ids = (
@@ -26,24 +93,31 @@ async def get_doctor_patients(
     )
 
     patient_ids = [pid[0] for pid in patient_ids]
-    patients = db.query(User).filter(User.id.in_(patient_ids)).all()
+    query = db.query(User).filter(User.id.in_(patient_ids))
+    if names:
+        query = project_fields(query, User, names)
+    if wants_ndjson(request):
+        return stream_ndjson(streamed(query), UserResponse, names, response)
+    patients = query.all()
 
+    if names:
+        return render_fields(patients, UserResponse, names, response)
     return patients
 
 
 @router.get("/patient/{patient_id}/records")
 async def get_patient_records(
     patient_id: int,
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_doctor),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     """Get patient's health records and history"""
     from app.models.health_record import HealthRecord
     from app.models.symptom_diary import SymptomDiary
 
     # Verify patient exists and has appointments with this doctor
-    from app.models.appointment import Appointment
-
     has_appointment = (
         db.query(Appointment)
         .filter(
@@ -58,6 +132,19 @@ async def get_patient_records(
             status_code=403, detail="No access to this patient's records"
         )
 
+    # Buffered and written in batches; a 304 below is still an access
+    record_access(current_user, patient_id, "patient_records.read")
+
+    cached = etag.not_modified(
+        request,
+        response,
+        ("health_records", patient_id),
+        ("symptom_diary", patient_id),
+        db=db,
+    )
+    if cached:
+        return cached
+
     records = db.query(HealthRecord).filter(HealthRecord.patient_id == patient_id).all()
     symptoms = (
         db.query(SymptomDiary)
@@ -68,3 +155,118 @@ async def get_patient_records(
     )
 
     return {"health_records": records, "recent_symptoms": symptoms}
+
+
+def _cohort(
+    db: Session,
+    doctor: User,
+    patient_id: Optional[int],
+    action: str = "symptom_analytics.read",
+) -> List[int]:
+    """The doctor's patients, or just ``patient_id`` if it is one of them"""
+    query = db.query(Appointment.patient_id).filter(Appointment.doctor_id == doctor.id)
+    if patient_id is not None:
+        if not query.filter(Appointment.patient_id == patient_id).first():
+            raise HTTPException(
+                status_code=403, detail="No access to this patient's records"
+            )
+        record_access(doctor, patient_id, action)
+        return [patient_id]
+    return [row[0] for row in query.distinct().all()]
+
+
+def _since(days: int) -> datetime:
+    return datetime.utcnow() - timedelta(days=days)
+
+
+ANALYTICS_PATIENT = Query(None, description="One patient instead of all your patients")
+ANALYTICS_DAYS = Query(90, ge=1, le=730, description="Entries from the last N days")
+
+
+@router.get("/symptoms/co-occurrence", response_model=CoOccurrenceResponse)
+async def symptom_co_occurrence(
+    tag: str = Query(..., min_length=1, max_length=100),
+    patient_id: Optional[int] = ANALYTICS_PATIENT,
+    days: int = ANALYTICS_DAYS,
+    limit: int = Query(20, ge=1, le=100),
+    current_user: User = Depends(get_current_doctor),
+    db: Session = Depends(get_read_db),
+):
+    """Symptoms reported in the same diary entries as ``tag``"""
+    matrix = load_matrix(db, _cohort(db, current_user, patient_id), _since(days))
+    return co_occurrence(matrix, tag, limit)
+
+
+@router.get("/symptoms/trends", response_model=TrendResponse)
+async def symptom_trends(
+    tags: Optional[str] = Query(None, description="Comma-separated; default the most frequent"),
+    period: str = Query("week", pattern="^(" + "|".join(PERIODS) + ")$"),
+    patient_id: Optional[int] = ANALYTICS_PATIENT,
+    days: int = ANALYTICS_DAYS,
+    limit: int = Query(5, ge=1, le=20),
+    current_user: User = Depends(get_current_doctor),
+    db: Session = Depends(get_read_db),
+):
+    """Diary entries per day, week or month mentioning each symptom"""
+    matrix = load_matrix(db, _cohort(db, current_user, patient_id), _since(days))
+    names = [tag for tag in (tags or "").split(",") if tag.strip()]
+    return trends(matrix, names, period, limit)
+
+
+@router.get("/symptoms/severity", response_model=List[SeverityCorrelation])
+async def symptom_severity(
+    patient_id: Optional[int] = ANALYTICS_PATIENT,
+    days: int = ANALYTICS_DAYS,
+    limit: int = Query(20, ge=1, le=100),
+    current_user: User = Depends(get_current_doctor),
+    db: Session = Depends(get_read_db),
+):
+    """How the most frequent symptoms relate to the severity reported"""
+    matrix = load_matrix(db, _cohort(db, current_user, patient_id), _since(days))
+    return severity_correlations(matrix, limit)
+
+
+@router.get("/export/{dataset}")
+async def export_cohort(
+    dataset: str,
+    format: str = Query("arrow", pattern="^(" + "|".join(FORMATS) + ")$"),
+    columns: Optional[str] = Query(None, description="Comma separated (default: all)"),
+    since: Optional[datetime] = Query(None, description="Rows dated at or after"),
+    until: Optional[datetime] = Query(None, description="Rows dated before"),
+    patient_id: Optional[int] = ANALYTICS_PATIENT,
+    current_user: User = Depends(get_current_doctor),
+    db: Session = Depends(get_read_db),
+):
+    """Stream your patients' symptoms, medications or prescriptions as Arrow or Parquet"""
+    if dataset not in EXPORTS:
+        raise HTTPException(status_code=404, detail=f"Unknown dataset {dataset!r}")
+    names = [name.strip() for name in (columns or "").split(",") if name.strip()]
+    unknown = unknown_columns(dataset, names)
+    if unknown:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown columns: {', '.join(unknown)}"
+        )
+
+    patient_ids = _cohort(db, current_user, patient_id, "cohort_export.read")
+    if patient_id is None:
+        for cohort_patient in patient_ids:
+            record_access(current_user, cohort_patient, "cohort_export.read")
+
+    try:
+        body = export_stream(
+            dataset,
+            format,
+            export_binds(db, dataset, patient_ids),
+            names or export_columns(dataset),
+            since,
+            until,
+            settings.EXPORT_BATCH_SIZE,
+        )
+    except ImportError:
+        raise HTTPException(status_code=501, detail="Exports need pyarrow installed")
+    media_type, extension = FORMATS[format]
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{dataset}.{extension}"'},
+    )
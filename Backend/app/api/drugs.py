@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Depends, Query
+from typing import List
+from app.models.user import User
+from app.schemas.drug import DrugMatch
+from app.services.drug_services import search_drugs
+from app.utils.security import get_current_user
+from app.utils.metrics import InstrumentedRoute
+
+router = APIRouter(route_class=InstrumentedRoute)
+
+
+@router.get("/search", response_model=List[DrugMatch])
+async def search(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=25),
+    current_user: User = Depends(get_current_user),
+):
+    """Typeahead for drug names and synonyms, tolerating one typo"""
+    return search_drugs(q, limit)
@@ -1,33 +1,82 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+    UploadFile,
+    File,
+)
+from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
-from typing import List
-from database import get_db
+from typing import List, Optional
+from database import get_db, get_read_db
 from app.models.user import User
+from app.services.audit_services import record_access
+from app.utils import etag
+from app.utils.fieldsets import (
+    FIELDS_DESCRIPTION,
+    fields_variant,
+    parse_fields,
+    project_fields,
+    render_fields,
+)
 from app.utils.security import get_current_user
+from app.utils.streaming import stream_ndjson, streamed, wants_ndjson
 from app.models.health_record import HealthRecord
+from app.schemas.audit import AuditEventResponse
 from app.schemas.health_record import HealthRecordResponse
 import os
 import shutil
 from datetime import datetime
+from app.utils.metrics import InstrumentedRoute
+from app.utils.tracing import span
 
-router = APIRouter()
+router = APIRouter(route_class=InstrumentedRoute)
+
+# file_url is the download endpoint's, built from the id
+FIELD_DEPENDS = {"file_url": ("id",)}
 
 
 @router.get("/", response_model=List[HealthRecordResponse])
 async def get_health_records(
-    current_user: User = Depends(get_current_user), db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db),
 ):
     """Get health records"""
+    names = parse_fields(fields, HealthRecordResponse)
+    if current_user.role == "patient":
+        record_access(current_user, current_user.id, "health_records.list")
+    cached = etag.not_modified(
+        request,
+        response,
+        ("health_records", current_user.id),
+        variant=fields_variant(names),
+        db=db,
+    )
+    if cached:
+        return cached
+
     if current_user.role == "patient":
-        records = (
-            db.query(HealthRecord)
-            .filter(HealthRecord.patient_id == current_user.id)
-            .all()
+        query = db.query(HealthRecord).filter(
+            HealthRecord.patient_id == current_user.id
         )
+        if names:
+            query = project_fields(query, HealthRecord, names, FIELD_DEPENDS)
+        if wants_ndjson(request):
+            return stream_ndjson(streamed(query), HealthRecordResponse, names, response)
+        records = query.all()
     else:
         # Doctors can view specific patient records via different endpoint
         records = []
 
+    if names:
+        return render_fields(records, HealthRecordResponse, names, response)
     return records
 
 
@@ -57,19 +106,84 @@ async def upload_health_record(
     file_path = f"{upload_dir}/{filename}"
 
     # Save file
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    with span("file.write", **{"file.path": file_path}) as write_span:
+        with open(file_path, "wb") as buffer:
+            shutil.copyfileobj(file.file, buffer)
+            if write_span is not None:
+                write_span.set_attribute("file.size", buffer.tell())
 
     # Create database record
     new_record = HealthRecord(
         patient_id=current_user.id,
         type=record_type,
         title=title or file.filename,
-        file_url=f"/{file_path}",
+        file_path=f"/{file_path}",
         notes=notes,
     )
     db.add(new_record)
     db.commit()
     db.refresh(new_record)
+    etag.bump("health_records", current_user.id)
 
     return new_record
+
+
+@router.get("/access-log", response_model=List[AuditEventResponse])
+async def get_access_log(
+    limit: int = Query(50, ge=1, le=500),
+    before: Optional[datetime] = Query(None, description="Events before this time"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Who accessed my health records, newest first"""
+    from app.models.audit import AuditEvent
+
+    if current_user.role != "patient":
+        raise HTTPException(status_code=403, detail="Only patients have an access log")
+
+    query = db.query(AuditEvent).filter(AuditEvent.patient_id == current_user.id)
+    if before is not None:
+        query = query.filter(AuditEvent.occurred_at < before)
+    return query.order_by(AuditEvent.occurred_at.desc()).limit(limit).all()
+
+
+@router.get("/{record_id}/download")
+async def download_health_record(
+    record_id: int,
+    patient_id: Optional[int] = Query(
+        None, description="Owner of the record; doctors pass it to find the record"
+    ),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Download a health record file (the only way files are served); audited"""
+    from app.models.appointment import Appointment
+
+    record = db.query(HealthRecord).filter(HealthRecord.id == record_id).first()
+    if record is None or patient_id not in (None, record.patient_id):
+        raise HTTPException(status_code=404, detail="Health record not found")
+
+    if current_user.role == "patient":
+        allowed = record.patient_id == current_user.id
+    else:
+        allowed = (
+            db.query(Appointment.id)
+            .filter(
+                Appointment.patient_id == record.patient_id,
+                Appointment.doctor_id == current_user.id,
+            )
+            .first()
+            is not None
+        )
+    if not allowed:
+        raise HTTPException(status_code=403, detail="No access to this record")
+
+    upload_root = os.path.realpath("uploads")
+    file_path = os.path.realpath(record.file_path.lstrip("/"))
+    if not file_path.startswith(upload_root + os.sep) or not os.path.isfile(file_path):
+        raise HTTPException(status_code=404, detail="File not found")
+
+    record_access(
+        current_user, record.patient_id, "health_records.download", record.id
+    )
+    return FileResponse(file_path, filename=os.path.basename(file_path))
@@ -1,27 +1,61 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from database import get_db
 from app.models.user import User
 from app.models.medications import Medication
+from app.services.drug_services import drug_id_for
 from app.schemas.medications import (
     MedicationCreate,
     MedicationResponse,
     MedicationUpdate,
 )
+from app.utils import etag
+from app.utils.fieldsets import (
+    FIELDS_DESCRIPTION,
+    fields_variant,
+    parse_fields,
+    project_fields,
+    render_fields,
+)
 from app.utils.security import get_current_user
+from app.utils.streaming import stream_ndjson, streamed, wants_ndjson
+from app.utils.metrics import InstrumentedRoute
+
+router = APIRouter(route_class=InstrumentedRoute)
 
-router = APIRouter()
+# Columns needed to compute derived response fields
+FIELD_DEPENDS = {"stock_level": ("remaining_tablets",)}
 
 
 @router.get("/", response_model=List[MedicationResponse])
 async def get_medications(
-    current_user: User = Depends(get_current_user), db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
 ):
     """Get all medications for current user"""
-    medications = (
-        db.query(Medication).filter(Medication.user_id == current_user.id).all()
+    names = parse_fields(fields, MedicationResponse)
+    cached = etag.not_modified(
+        request,
+        response,
+        ("medications", current_user.id),
+        variant=fields_variant(names),
     )
+    if cached:
+        return cached
+
+    query = db.query(Medication).filter(Medication.user_id == current_user.id)
+    if names:
+        query = project_fields(query, Medication, names, FIELD_DEPENDS)
+    if wants_ndjson(request):
+        return stream_ndjson(streamed(query), MedicationResponse, names, response)
+    medications = query.all()
+
+    if names:
+        return render_fields(medications, MedicationResponse, names, response)
     return medications
 
 
@@ -34,10 +68,15 @@ async def create_medication(
     db: Session = Depends(get_db),
 ):
     """Add new medication"""
-    new_medication = Medication(user_id=current_user.id, **medication_data.dict())
+    new_medication = Medication(
+        user_id=current_user.id,
+        drug_id=drug_id_for(medication_data.name),
+        **medication_data.dict(),
+    )
     db.add(new_medication)
     db.commit()
     db.refresh(new_medication)
+    etag.bump("medications", current_user.id)
     return new_medication
 
 
@@ -64,6 +103,7 @@ async def update_medication(
 
     db.commit()
     db.refresh(medication)
+    etag.bump("medications", current_user.id)
     return medication
 
 
@@ -83,5 +123,7 @@ async def delete_medication(
     if not medication:
         raise HTTPException(status_code=404, detail="Medication not found")
 
-    db.delete(medication)
+    # A tombstone, so syncing clients learn of the delete
+    medication.soft_delete()
     db.commit()
+    etag.bump("medications", current_user.id)
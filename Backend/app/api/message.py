@@ -1,34 +1,98 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.orm import Session
-from typing import List
-from database import get_db
+from typing import List, Optional
+from database import get_db, get_read_db
 from app.models.user import User
+from app.utils import etag
+from app.utils.fieldsets import (
+    FIELDS_DESCRIPTION,
+    fields_variant,
+    parse_fields,
+    project_fields,
+    render_fields,
+)
+from app.utils.replicas import RoutingSession
 from app.utils.security import get_current_user
+from app.utils.sharding import use_shard
+from app.utils.streaming import stream_ndjson, streamed, wants_ndjson
 from app.models.message import Message
+from app.services.user_services import get_user_name
 from app.schemas.message import MessageCreate, MessageResponse
+from app.utils.metrics import InstrumentedRoute
 
-router = APIRouter()
+router = APIRouter(route_class=InstrumentedRoute)
+
+# Columns needed to compute derived response fields
+FIELD_DEPENDS = {"sender_name": ("sender_id",), "receiver_name": ("receiver_id",)}
+
+
+def _add_names(db, messages, names):
+    for msg in messages:
+        if not names or "sender_name" in names:
+            msg.sender_name = get_user_name(db, msg.sender_id)
+        if not names or "receiver_name" in names:
+            msg.receiver_name = get_user_name(db, msg.receiver_id)
 
 
 @router.get("/", response_model=List[MessageResponse])
 async def get_messages(
-    current_user: User = Depends(get_current_user), db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db),
 ):
     """Get all messages for current user"""
-    messages = (
-        db.query(Message)
-        .filter(
-            (Message.sender_id == current_user.id)
-            | (Message.receiver_id == current_user.id)
-        )
-        .order_by(Message.timestamp.desc())
-        .all()
+    names = parse_fields(fields, MessageResponse)
+    cached = etag.not_modified(
+        request,
+        response,
+        ("messages", current_user.id),
+        variant=fields_variant(names),
+        db=db,
     )
+    if cached:
+        return cached
 
-    for msg in messages:
-        msg.sender_name = msg.sender.name
-        msg.receiver_name = msg.receiver.name
+    stream = wants_ndjson(request)
+
+    def inbox(shard_db):
+        query = (
+            shard_db.query(Message)
+            .filter(
+                (Message.sender_id == current_user.id)
+                | (Message.receiver_id == current_user.id)
+            )
+            .order_by(Message.timestamp.desc())
+        )
+        if names:
+            query = project_fields(query, Message, [*names, "timestamp"], FIELD_DEPENDS)
+        return streamed(query) if stream else query.all()
 
+    shards = RoutingSession.shards
+    if shards is not None and current_user.role != "patient":
+        # A doctor's messages are on the shards of the patients they talk to
+        if stream:
+            messages = shards.merge(inbox, key=lambda msg: msg.timestamp, reverse=True)
+        else:
+            messages = shards.scatter(inbox)
+            messages.sort(key=lambda msg: msg.timestamp, reverse=True)
+    else:
+        messages = inbox(db)
+
+    if stream:
+        return stream_ndjson(
+            messages,
+            MessageResponse,
+            names,
+            response,
+            lambda batch: _add_names(db, batch, names),
+        )
+
+    _add_names(db, messages, names)
+
+    if names:
+        return render_fields(messages, MessageResponse, names, response)
     return messages
 
 
@@ -39,24 +103,55 @@ async def send_message(
     db: Session = Depends(get_db),
 ):
     """Send a message"""
+    if RoutingSession.shards is not None:
+        # Messages are stored on the shard of the one patient taking part
+        receiver = db.query(User.role).filter(User.id == message_data.receiver_id).first()
+        if receiver is None or (receiver.role == "patient") == (
+            current_user.role == "patient"
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Messages must be between a patient and a doctor",
+            )
+        if current_user.role != "patient":
+            use_shard(db, message_data.receiver_id)
+
     new_message = Message(sender_id=current_user.id, **message_data.dict())
     db.add(new_message)
     db.commit()
     db.refresh(new_message)
+    etag.bump("messages", current_user.id, new_message.receiver_id)
+    etag.bump_pair("chat", current_user.id, new_message.receiver_id)
 
     new_message.sender_name = current_user.name
-    new_message.receiver_name = new_message.receiver.name
+    new_message.receiver_name = get_user_name(db, new_message.receiver_id)
     return new_message
 
 
 @router.get("/chat/{user_id}", response_model=List[MessageResponse])
 async def get_chat_history(
     user_id: int,
+    request: Request,
+    response: Response,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     """Get chat history with specific user"""
-    messages = (
+    names = parse_fields(fields, MessageResponse)
+    cached = etag.not_modified(
+        request,
+        response,
+        etag.pair_key("chat", current_user.id, user_id),
+        variant=fields_variant(names),
+        db=db,
+    )
+    if cached:
+        return cached
+
+    if current_user.role != "patient":
+        use_shard(db, user_id)
+    query = (
         db.query(Message)
         .filter(
             ((Message.sender_id == current_user.id) & (Message.receiver_id == user_id))
@@ -66,11 +161,21 @@ async def get_chat_history(
             )
         )
         .order_by(Message.timestamp.asc())
-        .all()
     )
+    if names:
+        query = project_fields(query, Message, names, FIELD_DEPENDS)
+    if wants_ndjson(request):
+        return stream_ndjson(
+            streamed(query),
+            MessageResponse,
+            names,
+            response,
+            lambda batch: _add_names(db, batch, names),
+        )
+    messages = query.all()
 
-    for msg in messages:
-        msg.sender_name = msg.sender.name
-        msg.receiver_name = msg.receiver.name
+    _add_names(db, messages, names)
 
+    if names:
+        return render_fields(messages, MessageResponse, names, response)
     return messages
@@ -1,15 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
-from database import get_db
+from database import get_read_db
 from app.models.user import User
+from app.services.user_services import get_user_name
+from app.utils import etag
 from app.utils.security import get_current_user
+from app.utils.metrics import InstrumentedRoute
 
-router = APIRouter()
+router = APIRouter(route_class=InstrumentedRoute)
 
 
 @router.get("/dashboard")
 async def get_patient_dashboard(
-    current_user: User = Depends(get_current_user), db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db),
 ):
     """Get patient dashboard overview"""
     from app.models.medications import Medication
@@ -20,6 +26,19 @@ async def get_patient_dashboard(
     if current_user.role != "patient":
         raise HTTPException(status_code=403, detail="Only patients can access this")
 
+    # "Upcoming" depends on the clock, so the tag also rolls over every hour
+    cached = etag.not_modified(
+        request,
+        response,
+        ("medications", current_user.id),
+        ("reminders", current_user.id),
+        ("appointments", current_user.id),
+        variant=datetime.utcnow().strftime("%Y%m%d%H"),
+        db=db,
+    )
+    if cached:
+        return cached
+
     # Get today's medications
     medications = (
         db.query(Medication).filter(Medication.user_id == current_user.id).all()
@@ -48,7 +67,7 @@ async def get_patient_dashboard(
 
     # Add doctor names
     for appt in upcoming:
-        appt.doctor_name = appt.doctor.name
+        appt.doctor_name = get_user_name(db, appt.doctor_id)
 
     return {
         "medications": medications,
@@ -1,48 +1,142 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
-from typing import List
-from database import get_db
+from typing import List, Optional
+from database import SessionLocal, get_db
 from app.models.user import User
+from app.models.medications import Medication
 from app.models.prescription import Prescription
-from app.schemas.prescription import PrescriptionCreate, PrescriptionResponse
+from app.models.reminder import Reminder
+from app.services.cache_services import mark_dirty
+from app.services.drug_services import drug_id_for
+from app.services.interaction_services import (
+    active_drugs,
+    check_interactions,
+    interactions,
+)
+from app.services.medication_services import medication_row, parse_timing
+from app.services.prescription_services import get_patient_prescriptions
+from app.services.remainder_services import medicine_reminder_rows
+from app.services.user_services import get_user_name
+from app.schemas.prescription import (
+    InteractionCheckRequest,
+    InteractionCheckResponse,
+    PrescriptionBundleCreate,
+    PrescriptionBundleResponse,
+    PrescriptionCreate,
+    PrescriptionCreatedResponse,
+    PrescriptionResponse,
+)
+from app.utils import etag
+from app.utils.fieldsets import (
+    FIELDS_DESCRIPTION,
+    fields_variant,
+    parse_fields,
+    project_fields,
+    render_fields,
+)
 from app.utils.security import get_current_user, get_current_doctor
+from app.utils.sharding import use_shard
+from app.utils.streaming import stream_ndjson, streamed, wants_ndjson
+from app.utils.metrics import InstrumentedRoute
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(route_class=InstrumentedRoute)
+
+# Columns needed to compute derived response fields
+FIELD_DEPENDS = {"doctor_name": ("doctor_id",)}
+
 
-router = APIRouter()
+def _add_medications(patient_id: int, rows: List[dict]) -> List[int]:
+    """Insert and commit medications on the patient's shard, in a session of their own"""
+    with SessionLocal() as shard_db:
+        use_shard(shard_db, patient_id)
+        ids = shard_db.scalars(insert(Medication).returning(Medication.id), rows).all()
+        mark_dirty(shard_db, f"medications:user:{patient_id}")
+        shard_db.commit()
+    return list(ids)
+
+
+def _remove_medications(patient_id: int, medication_ids: List[int]) -> None:
+    """Undo _add_medications, leaving tombstones for syncing clients"""
+    with SessionLocal() as shard_db:
+        use_shard(shard_db, patient_id)
+        medications = shard_db.query(Medication).filter(Medication.id.in_(medication_ids))
+        for medication in medications:
+            medication.soft_delete()
+        shard_db.commit()
+
+
+def _add_doctor_names(db, prescriptions, names):
+    if not names or "doctor_name" in names:
+        for rx in prescriptions:
+            rx.doctor_name = get_user_name(db, rx.doctor_id)
 
 
 @router.get("/", response_model=List[PrescriptionResponse])
 async def get_prescriptions(
-    current_user: User = Depends(get_current_user), db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
 ):
     """Get prescriptions (patient sees their own, doctor sees their created ones)"""
+    names = parse_fields(fields, PrescriptionResponse)
+    cached = etag.not_modified(
+        request,
+        response,
+        ("prescriptions", current_user.id),
+        variant=fields_variant(names),
+    )
+    if cached:
+        return cached
+
+    stream = wants_ndjson(request)
     if current_user.role == "patient":
-        prescriptions = (
-            db.query(Prescription)
-            .filter(Prescription.patient_id == current_user.id)
-            .all()
+        if not names and not stream:
+            return get_patient_prescriptions(db, current_user.id)
+        query = db.query(Prescription).filter(
+            Prescription.patient_id == current_user.id
         )
     else:
-        prescriptions = (
-            db.query(Prescription)
-            .filter(Prescription.doctor_id == current_user.id)
-            .all()
+        query = db.query(Prescription).filter(
+            Prescription.doctor_id == current_user.id
+        )
+    if names:
+        query = project_fields(query, Prescription, names, FIELD_DEPENDS)
+    if stream:
+        return stream_ndjson(
+            streamed(query),
+            PrescriptionResponse,
+            names,
+            response,
+            lambda batch: _add_doctor_names(db, batch, names),
         )
+    prescriptions = query.all()
 
-    for rx in prescriptions:
-        rx.doctor_name = rx.doctor.name
+    _add_doctor_names(db, prescriptions, names)
 
+    if names:
+        return render_fields(prescriptions, PrescriptionResponse, names, response)
     return prescriptions
 
 
 @router.post(
-    "/", response_model=PrescriptionResponse, status_code=status.HTTP_201_CREATED
+    "/", response_model=PrescriptionCreatedResponse, status_code=status.HTTP_201_CREATED
 )
 async def create_prescription(
     prescription_data: PrescriptionCreate,
     current_user: User = Depends(get_current_doctor),
     db: Session = Depends(get_db),
 ):
-    """Create prescription (Doctor only)"""
+    """Create prescription (Doctor only)
+
+    The response lists known interactions with the patient's active drugs;
+    they are warnings, the prescription is created regardless.
+    """
     # Verify patient exists
     patient = (
         db.query(User)
@@ -53,12 +147,195 @@ async def create_prescription(
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
 
+    warnings = check_interactions(
+        [prescription_data.medicine], active_drugs(db, patient.id)
+    )
     new_prescription = Prescription(
-        doctor_id=current_user.id, **prescription_data.dict()
+        doctor_id=current_user.id,
+        drug_id=drug_id_for(prescription_data.medicine),
+        **prescription_data.dict(),
     )
     db.add(new_prescription)
     db.commit()
     db.refresh(new_prescription)
+    etag.bump("prescriptions", patient.id, current_user.id)
 
     new_prescription.doctor_name = current_user.name
+    new_prescription.interactions = warnings
     return new_prescription
+
+
+@router.post(
+    "/bulk",
+    response_model=PrescriptionBundleResponse,
+    status_code=status.HTTP_201_CREATED,
+)
+async def create_prescription_bundle(
+    bundle: PrescriptionBundleCreate,
+    current_user: User = Depends(get_current_doctor),
+    db: Session = Depends(get_db),
+):
+    """Prescribe several drugs at once (Doctor only)
+
+    Also adds the matching medications and dose reminders to the patient's
+    schedule. Each table gets a single multi-row INSERT, so the number of
+    statements does not grow with the number of drugs. Interactions among
+    the drugs and with the patient's active ones are returned as warnings.
+    """
+    patient = (
+        db.query(User)
+        .filter(User.id == bundle.patient_id, User.role == "patient")
+        .first()
+    )
+
+    if not patient:
+        raise HTTPException(status_code=404, detail="Patient not found")
+
+    warnings = check_interactions(
+        [item.medicine for item in bundle.items], active_drugs(db, patient.id)
+    )
+    prescription_rows = []
+    medication_rows = []
+    reminder_rows = []
+    for item in bundle.items:
+        drug_id = drug_id_for(item.medicine)
+        prescription_rows.append(
+            {
+                "patient_id": patient.id,
+                "doctor_id": current_user.id,
+                "medicine": item.medicine,
+                "drug_id": drug_id,
+                "dosage": item.dosage,
+                "timing": item.timing,
+                "duration": item.duration,
+                "notes": item.notes,
+            }
+        )
+        times = parse_timing(item.timing)
+        if bundle.create_medications:
+            row = medication_row(
+                patient.id,
+                item.medicine,
+                item.dosage,
+                times,
+                item.duration,
+                item.total_tablets,
+            )
+            if row:
+                row["drug_id"] = drug_id
+                medication_rows.append(row)
+        if bundle.create_reminders:
+            reminder_rows += medicine_reminder_rows(
+                patient.id, item.medicine, item.dosage, times
+            )
+
+    # With shards the medications may be on another database than the
+    # prescriptions and reminders, which one transaction cannot span. They
+    # are then committed first, on their own, and removed again if the rest
+    # fails, so a bundle is never left half written.
+    patient_id, doctor_id = patient.id, current_user.id
+    medication_ids = []
+    apart = False
+    if medication_rows:
+        use_shard(db, patient.id)
+        apart = db.get_bind(mapper=Medication.__mapper__) is not db.get_bind(
+            mapper=Prescription.__mapper__
+        )
+        if apart:
+            medication_ids = _add_medications(patient_id, medication_rows)
+
+    try:
+        # render_nulls keeps rows with empty optional columns in the same batch
+        prescriptions = db.scalars(
+            insert(Prescription)
+            .returning(Prescription)
+            .execution_options(render_nulls=True),
+            prescription_rows,
+        ).all()
+        if medication_rows and not apart:
+            medication_ids = db.scalars(
+                insert(Medication).returning(Medication.id), medication_rows
+            ).all()
+        reminder_ids = []
+        if reminder_rows:
+            reminder_ids = db.scalars(
+                insert(Reminder).returning(Reminder.id), reminder_rows
+            ).all()
+
+        # Serialize before commit expires the returned rows
+        created = []
+        for rx in sorted(prescriptions, key=lambda rx: rx.id):
+            rx.doctor_name = current_user.name
+            created.append(PrescriptionResponse.model_validate(rx))
+
+        # Bulk inserts bypass the unit of work, so name the affected cache tags
+        mark_dirty(
+            db,
+            f"prescriptions:user:{patient.id}",
+            f"prescriptions:user:{current_user.id}",
+            f"medications:user:{patient.id}",
+            f"reminders:user:{patient.id}",
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        if not (apart and medication_ids):
+            raise
+        try:
+            _remove_medications(patient_id, medication_ids)
+        except Exception:
+            logger.exception(
+                "Medications %s of an unsaved bundle for patient %s could not be removed",
+                medication_ids,
+                patient_id,
+            )
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=(
+                    "The prescriptions were not saved, but their medications "
+                    f"{sorted(medication_ids)} were added to the patient's schedule "
+                    "and could not be removed"
+                ),
+            )
+        finally:
+            etag.bump("medications", patient_id)
+        raise
+    etag.bump("prescriptions", patient_id, doctor_id)
+    if medication_ids:
+        etag.bump("medications", patient_id)
+    if reminder_ids:
+        etag.bump("reminders", patient_id)
+
+    return {
+        "prescriptions": created,
+        "medication_ids": sorted(medication_ids),
+        "reminder_ids": sorted(reminder_ids),
+        "interactions": warnings,
+    }
+
+
+@router.post("/interactions", response_model=InteractionCheckResponse)
+async def check_regimen(
+    regimen: InteractionCheckRequest,
+    current_user: User = Depends(get_current_doctor),
+    db: Session = Depends(get_db),
+):
+    """Check a whole regimen for interactions without prescribing (Doctor only)
+
+    With ``patient_id`` the drugs are also checked against the patient's
+    current medications and active prescriptions.
+    """
+    existing = []
+    if regimen.patient_id is not None:
+        exists = (
+            db.query(User.id)
+            .filter(User.id == regimen.patient_id, User.role == "patient")
+            .first()
+        )
+        if not exists:
+            raise HTTPException(status_code=404, detail="Patient not found")
+        existing = active_drugs(db, regimen.patient_id)
+    return {
+        "interactions": check_interactions(regimen.drugs, existing),
+        "unknown": interactions.unknown(regimen.drugs),
+    }
@@ -1,25 +1,55 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Query, Request, Response, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from database import get_db
 from app.models.user import User
+from app.utils import etag
+from app.utils.fieldsets import (
+    FIELDS_DESCRIPTION,
+    fields_variant,
+    parse_fields,
+    project_fields,
+    render_fields,
+)
 from app.utils.security import get_current_user
+from app.utils.streaming import stream_ndjson, streamed, wants_ndjson
 from app.models.reminder import Reminder
 from app.schemas.reminder import ReminderCreate, ReminderResponse
+from app.utils.metrics import InstrumentedRoute
 
-router = APIRouter()
+router = APIRouter(route_class=InstrumentedRoute)
 
 
 @router.get("/", response_model=List[ReminderResponse])
 async def get_reminders(
-    current_user: User = Depends(get_current_user), db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
 ):
     """Get all reminders for current user"""
-    reminders = (
-        db.query(Reminder)
-        .filter(Reminder.user_id == current_user.id, Reminder.is_active == 1)
-        .all()
+    names = parse_fields(fields, ReminderResponse)
+    cached = etag.not_modified(
+        request,
+        response,
+        ("reminders", current_user.id),
+        variant=fields_variant(names),
     )
+    if cached:
+        return cached
+
+    query = db.query(Reminder).filter(
+        Reminder.user_id == current_user.id, Reminder.is_active == 1
+    )
+    if names:
+        query = project_fields(query, Reminder, names)
+    if wants_ndjson(request):
+        return stream_ndjson(streamed(query), ReminderResponse, names, response)
+    reminders = query.all()
+
+    if names:
+        return render_fields(reminders, ReminderResponse, names, response)
     return reminders
 
 
@@ -34,4 +64,5 @@ async def create_reminder(
     db.add(new_reminder)
     db.commit()
     db.refresh(new_reminder)
+    etag.bump("reminders", current_user.id)
     return new_reminder
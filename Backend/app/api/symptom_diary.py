@@ -1,27 +1,59 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Query, Request, Response, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from database import get_db
 from app.models.user import User
+from app.utils import etag
+from app.utils.fieldsets import (
+    FIELDS_DESCRIPTION,
+    fields_variant,
+    parse_fields,
+    project_fields,
+    render_fields,
+)
 from app.utils.security import get_current_user
+from app.utils.streaming import stream_ndjson, streamed, wants_ndjson
 from app.models.symptom_diary import SymptomDiary
 from app.schemas.symptom_diary import SymptomDiaryCreate, SymptomDiaryResponse
+from app.services.symptom_services import tag_ids_for
 from datetime import datetime
+from app.utils.metrics import InstrumentedRoute
 
-router = APIRouter()
+router = APIRouter(route_class=InstrumentedRoute)
 
 
 @router.get("/", response_model=List[SymptomDiaryResponse])
 async def get_symptom_history(
-    current_user: User = Depends(get_current_user), db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
 ):
     """Get symptom diary history"""
-    entries = (
+    names = parse_fields(fields, SymptomDiaryResponse)
+    cached = etag.not_modified(
+        request,
+        response,
+        ("symptom_diary", current_user.id),
+        variant=fields_variant(names),
+    )
+    if cached:
+        return cached
+
+    query = (
         db.query(SymptomDiary)
         .filter(SymptomDiary.user_id == current_user.id)
         .order_by(SymptomDiary.date.desc())
-        .all()
     )
+    if names:
+        query = project_fields(query, SymptomDiary, names)
+    if wants_ndjson(request):
+        return stream_ndjson(streamed(query), SymptomDiaryResponse, names, response)
+    entries = query.all()
+
+    if names:
+        return render_fields(entries, SymptomDiaryResponse, names, response)
     return entries
 
 
@@ -38,10 +70,12 @@ async def create_symptom_entry(
         user_id=current_user.id,
         date=entry_data.date or datetime.utcnow(),
         symptoms=entry_data.symptoms,
+        tag_ids=tag_ids_for(entry_data.symptoms),
         severity=entry_data.severity,
         notes=entry_data.notes,
     )
     db.add(new_entry)
     db.commit()
     db.refresh(new_entry)
+    etag.bump("symptom_diary", current_user.id)
     return new_entry
@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import Optional
+from database import get_db
+from app.models.user import User
+from app.schemas.sync import SyncResponse
+from app.services.sync_services import (
+    InvalidSyncToken,
+    collect_changes,
+    decode_token,
+    tombstone_cutoff,
+)
+from app.utils.security import get_current_user
+from app.utils.metrics import InstrumentedRoute
+
+router = APIRouter(route_class=InstrumentedRoute)
+
+
+@router.get("/", response_model=SyncResponse)
+async def sync(
+    since: Optional[str] = Query(None, description="Token from the previous sync"),
+    current_user: User = Depends(get_current_user),
+    # Not a replica: rows it has not replayed yet would be behind the token
+    db: Session = Depends(get_db),
+):
+    """Changes to the user's data since the last sync, including deletions
+
+    Without ``since``, or when the token predates the tombstones still kept,
+    every row is returned with ``reset`` set.
+    """
+    changed_after = None
+    if since is not None:
+        try:
+            changed_after = decode_token(since)
+        except InvalidSyncToken:
+            raise HTTPException(status_code=400, detail="Invalid sync token")
+        if changed_after < tombstone_cutoff():
+            changed_after = None
+
+    return collect_changes(db, current_user, changed_after)
@@ -0,0 +1,72 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+from typing import Optional
+from config import settings
+from database import get_db, get_read_db
+from app.models.user import User
+from app.models.vital import VitalKind
+from app.schemas.vital import VitalBatch, VitalIngestResponse, VitalSeries
+from app.services.audit_services import record_access
+from app.services.vital_services import (
+    RESOLUTIONS,
+    ingest_readings,
+    to_utc,
+    vital_series,
+)
+from app.utils.security import get_current_user
+from app.utils.metrics import InstrumentedRoute
+
+router = APIRouter(route_class=InstrumentedRoute)
+
+
+@router.post("/", response_model=VitalIngestResponse)
+async def ingest_vitals(
+    batch: VitalBatch,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Upload a batch of readings from one of your devices"""
+    if len(batch.readings) > settings.VITALS_MAX_BATCH:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.VITALS_MAX_BATCH} readings per request",
+        )
+    return ingest_readings(db, current_user.id, batch.device_id, batch.readings)
+
+
+@router.get("/", response_model=VitalSeries)
+async def get_vitals(
+    kind: VitalKind,
+    start: Optional[datetime] = Query(None, description="Default: 24 hours before end"),
+    end: Optional[datetime] = Query(None, description="Default: now"),
+    resolution: str = Query("auto", pattern="^(" + "|".join(RESOLUTIONS) + ")$"),
+    patient_id: Optional[int] = Query(None, description="Doctors: whose readings"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db),
+):
+    """Readings of one kind over a time range, as hourly or daily stats for long ranges"""
+    from app.models.appointment import Appointment
+
+    user_id = current_user.id
+    if patient_id is not None and patient_id != current_user.id:
+        has_appointment = (
+            db.query(Appointment)
+            .filter(
+                Appointment.patient_id == patient_id,
+                Appointment.doctor_id == current_user.id,
+            )
+            .first()
+        )
+        if not has_appointment:
+            raise HTTPException(
+                status_code=403, detail="No access to this patient's records"
+            )
+        record_access(current_user, patient_id, "vitals.read")
+        user_id = patient_id
+
+    end = to_utc(end) if end else datetime.utcnow()
+    start = to_utc(start) if start else end - timedelta(hours=24)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    return vital_series(db, user_id, kind, start, end, resolution)
@@ -1,14 +1,17 @@
-from sqlalchemy.ext.declarative import declarative_base
+from database import Base
 from .user import User, UserRole
 from .medications import Medication, StockLevel
 from .reminder import Reminder, ReminderType
 from .symptom_diary import SymptomDiary
+from .symptom_tag import SymptomTag
 from .message import Message
 from .appointment import Appointment, AppointmentStatus
 from .health_record import HealthRecord, RecordType
 from .prescription import Prescription
-
-Base = declarative_base()
+from .audit import AuditEvent
+from .shard import IdBlock, ShardAssignment
+from .vital import VitalKind, VitalReading, VitalRollup
+from .sync import SyncMixin
 
 __all__ = [
     "Base",
@@ -19,10 +22,18 @@ __all__ = [
     "Reminder",
     "ReminderType",
     "SymptomDiary",
+    "SymptomTag",
     "Message",
     "Appointment",
     "AppointmentStatus",
     "HealthRecord",
     "RecordType",
     "Prescription",
+    "AuditEvent",
+    "ShardAssignment",
+    "IdBlock",
+    "VitalKind",
+    "VitalReading",
+    "VitalRollup",
+    "SyncMixin",
 ]
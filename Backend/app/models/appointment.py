@@ -4,12 +4,14 @@ from sqlalchemy import (
     String,
     ForeignKey,
     DateTime,
+    Index,
     Enum as SQLEnum,
 )
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
 from database import Base
+from .sync import SyncMixin
 
 
 class AppointmentStatus(str, enum.Enum):
@@ -20,8 +22,12 @@ class AppointmentStatus(str, enum.Enum):
     CANCELLED = "cancelled"
 
 
-class Appointment(Base):
+class Appointment(SyncMixin, Base):
     __tablename__ = "appointments"
+    __table_args__ = (
+        Index("ix_appointments_patient_updated", "patient_id", "updated_at"),
+        Index("ix_appointments_doctor_updated", "doctor_id", "updated_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     patient_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -0,0 +1,29 @@
+from sqlalchemy import BigInteger, Column, DateTime, Index, Integer, String
+from datetime import datetime
+from database import Base
+
+
+class AuditEvent(Base):
+    """Who accessed which patient's records; written in batches by audit_services
+
+    No foreign keys, so audit writes never lock or check users. On
+    PostgreSQL the table is range-partitioned by month on occurred_at, with
+    primary key (id, occurred_at); see the migration.
+    """
+
+    __tablename__ = "audit_events"
+    __table_args__ = (
+        Index("ix_audit_events_patient_occurred", "patient_id", "occurred_at"),
+    )
+
+    id = Column(
+        BigInteger().with_variant(Integer, "sqlite"),
+        primary_key=True,
+        autoincrement=True,
+    )
+    occurred_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    actor_id = Column(Integer, nullable=False)
+    actor_role = Column(String(20), nullable=False)
+    patient_id = Column(Integer, nullable=False)
+    action = Column(String(50), nullable=False)
+    resource_id = Column(Integer)
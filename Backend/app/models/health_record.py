@@ -9,7 +9,7 @@ from sqlalchemy import (
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
-from database import Base
+from database import Base, global_id
 
 
 class RecordType(str, enum.Enum):
@@ -22,12 +22,20 @@ class RecordType(str, enum.Enum):
 class HealthRecord(Base):
     __tablename__ = "health_records"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(
+        Integer, primary_key=True, index=True, default=global_id("health_records")
+    )
     patient_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     type = Column(SQLEnum(RecordType), nullable=False)
     title = Column(String(200), nullable=False)
-    file_url = Column(String(500), nullable=False)
+    # Where the file is stored, under uploads/; the column keeps its old name
+    file_path = Column("file_url", String(500), nullable=False)
     uploaded_at = Column(DateTime, default=datetime.utcnow)
     notes = Column(String(500))
 
     patient = relationship("User", back_populates="health_records")
+
+    @property
+    def file_url(self) -> str:
+        """Files are only served by the download endpoint, which checks access"""
+        return f"/api/health-records/{self.id}/download"
@@ -1,8 +1,9 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
-from database import Base
+from database import Base, global_id
+from .sync import SyncMixin
 
 
 class StockLevel(str, enum.Enum):
@@ -12,12 +13,18 @@ class StockLevel(str, enum.Enum):
     HIGH = "high"  # > 20 tablets
 
 
-class Medication(Base):
+class Medication(SyncMixin, Base):
     __tablename__ = "medications"
+    __table_args__ = (
+        Index("ix_medications_user_updated", "user_id", "updated_at"),
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(
+        Integer, primary_key=True, index=True, default=global_id("medications")
+    )
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     name = Column(String(100), nullable=False)
+    drug_id = Column(String(32), index=True)  # canonical id from the drug dictionary
     dosage = Column(String(50), nullable=False)
     time = Column(String(10), nullable=False)  # HH:MM format
     total_tablets = Column(Integer, nullable=False)
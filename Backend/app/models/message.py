@@ -1,13 +1,20 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
-from database import Base
+from database import Base, global_id
+from .sync import SyncMixin
 
 
-class Message(Base):
+class Message(SyncMixin, Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        Index("ix_messages_sender_updated", "sender_id", "updated_at"),
+        Index("ix_messages_receiver_updated", "receiver_id", "updated_at"),
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(
+        Integer, primary_key=True, index=True, default=global_id("messages")
+    )
     sender_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     receiver_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     message = Column(String(1000), nullable=False)
@@ -1,16 +1,22 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
+from .sync import SyncMixin
 
 
-class Prescription(Base):
+class Prescription(SyncMixin, Base):
     __tablename__ = "prescriptions"
+    __table_args__ = (
+        Index("ix_prescriptions_patient_updated", "patient_id", "updated_at"),
+        Index("ix_prescriptions_doctor_updated", "doctor_id", "updated_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     patient_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     doctor_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     medicine = Column(String(100), nullable=False)
+    drug_id = Column(String(32), index=True)  # canonical id from the drug dictionary
     dosage = Column(String(50), nullable=False)
     timing = Column(String(200), nullable=False)  # e.g., "Morning, Evening"
     duration = Column(String(50))  # e.g., "7 days"
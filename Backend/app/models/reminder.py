@@ -4,12 +4,14 @@ from sqlalchemy import (
     String,
     ForeignKey,
     DateTime,
+    Index,
     Enum as SQLEnum,
 )
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
 from database import Base
+from .sync import SyncMixin
 
 
 class ReminderType(str, enum.Enum):
@@ -19,8 +21,11 @@ class ReminderType(str, enum.Enum):
     CUSTOM = "custom"
 
 
-class Reminder(Base):
+class Reminder(SyncMixin, Base):
     __tablename__ = "reminders"
+    __table_args__ = (
+        Index("ix_reminders_user_updated", "user_id", "updated_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -0,0 +1,32 @@
+from sqlalchemy import BigInteger, Column, DateTime, Integer, String
+from datetime import datetime
+from database import Base
+
+
+class ShardAssignment(Base):
+    """Where a patient's sharded rows live, when that is not their ring shard
+
+    Written by shards.py: rows pin patients before the ring changes and
+    mark moves in progress (moving_to). Kept on the primary.
+    """
+
+    __tablename__ = "shard_directory"
+
+    patient_id = Column(Integer, primary_key=True, autoincrement=False)
+    shard = Column(String(50), nullable=False)
+    moving_to = Column(String(50))
+    updated_at = Column(
+        DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False
+    )
+
+
+class IdBlock(Base):
+    """Next free id of a sharded table, shared by every shard (IdAllocator)
+
+    Kept on the primary; processes reserve ids from it a block at a time.
+    """
+
+    __tablename__ = "id_blocks"
+
+    table_name = Column(String(64), primary_key=True)
+    next_id = Column(BigInteger, nullable=False)
@@ -1,16 +1,23 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index, JSON
 from sqlalchemy.orm import relationship
 from datetime import datetime
-from database import Base
+from database import Base, global_id
+from .sync import SyncMixin
 
 
-class SymptomDiary(Base):
+class SymptomDiary(SyncMixin, Base):
     __tablename__ = "symptom_diary"
+    __table_args__ = (
+        Index("ix_symptom_diary_user_updated", "user_id", "updated_at"),
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(
+        Integer, primary_key=True, index=True, default=global_id("symptom_diary")
+    )
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     date = Column(DateTime, nullable=False, default=datetime.utcnow)
     symptoms = Column(String(500), nullable=False)
+    tag_ids = Column(JSON(none_as_null=True))  # SymptomTag ids parsed from symptoms
     severity = Column(Integer, nullable=False)  # 1-10 scale
     notes = Column(String(1000))
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, DateTime, Integer, String
+from datetime import datetime
+from database import Base
+
+
+class SymptomTag(Base):
+    """A normalized symptom ("headache"); diary entries store the ids
+
+    Kept on the primary and shared by every shard.
+    """
+
+    __tablename__ = "symptom_tags"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(100), nullable=False, unique=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
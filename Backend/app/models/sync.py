@@ -0,0 +1,36 @@
+from sqlalchemy import Column, DateTime, event
+from sqlalchemy.orm import Session, with_loader_criteria
+from datetime import datetime
+
+
+class SyncMixin:
+    """Change tracking for /api/sync: last change time and a delete tombstone
+
+    Deleting sets deleted_at instead of removing the row, so clients can be
+    told about it; tombstones are purged after SYNC_TOMBSTONE_DAYS.
+    """
+
+    updated_at = Column(
+        DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False
+    )
+    deleted_at = Column(DateTime)
+
+    def soft_delete(self) -> None:
+        self.deleted_at = datetime.utcnow()
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _hide_deleted(state) -> None:
+    # Tombstones are invisible to ORM queries (including relationship loads)
+    # unless a query asks for them with include_deleted=True
+    if (
+        state.is_select
+        and not state.is_column_load
+        and not state.is_relationship_load
+        and not state.execution_options.get("include_deleted", False)
+    ):
+        state.statement = state.statement.options(
+            with_loader_criteria(
+                SyncMixin, lambda cls: cls.deleted_at.is_(None), include_aliases=True
+            )
+        )
@@ -0,0 +1,84 @@
+from sqlalchemy import BigInteger, Column, DateTime, Float, ForeignKey, Index, Integer, String
+from datetime import datetime
+import enum
+from database import Base, global_id
+
+
+class VitalKind(str, enum.Enum):
+    HEART_RATE = "heart_rate"  # bpm
+    SYSTOLIC_BP = "systolic_bp"  # mmHg
+    DIASTOLIC_BP = "diastolic_bp"  # mmHg
+    GLUCOSE = "glucose"  # mg/dL
+    SPO2 = "spo2"  # %
+    TEMPERATURE = "temperature"  # °C
+    RESPIRATORY_RATE = "respiratory_rate"  # breaths/min
+    WEIGHT = "weight"  # kg
+
+
+class VitalReading(Base):
+    """One measurement from a home device; written in batches by vital_services
+
+    A device sends each reading once: (patient, device, kind, time) is unique
+    and re-sent readings are ignored.
+    """
+
+    __tablename__ = "vital_readings"
+    __table_args__ = (
+        Index(
+            "ux_vital_readings_device",
+            "user_id",
+            "device_id",
+            "kind",
+            "measured_at",
+            unique=True,
+        ),
+        Index("ix_vital_readings_user_kind_time", "user_id", "kind", "measured_at"),
+    )
+
+    id = Column(
+        BigInteger().with_variant(Integer, "sqlite"),
+        primary_key=True,
+        autoincrement=True,
+        default=global_id("vital_readings"),
+    )
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    device_id = Column(String(64), nullable=False)
+    kind = Column(String(32), nullable=False)  # a VitalKind value
+    measured_at = Column(DateTime, nullable=False)
+    value = Column(Float, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class VitalRollup(Base):
+    """Count, sum, min and max of a patient's readings of one kind per hour or day
+
+    Updated in the same transaction as the readings it covers, so it always
+    agrees with them.
+    """
+
+    __tablename__ = "vital_rollups"
+    __table_args__ = (
+        Index(
+            "ux_vital_rollups_bucket",
+            "user_id",
+            "kind",
+            "bucket",
+            "bucket_start",
+            unique=True,
+        ),
+    )
+
+    id = Column(
+        BigInteger().with_variant(Integer, "sqlite"),
+        primary_key=True,
+        autoincrement=True,
+        default=global_id("vital_rollups"),
+    )
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    kind = Column(String(32), nullable=False)
+    bucket = Column(String(8), nullable=False)  # "hour" or "day"
+    bucket_start = Column(DateTime, nullable=False)
+    count = Column(Integer, nullable=False)
+    total = Column(Float, nullable=False)
+    min_value = Column(Float, nullable=False)
+    max_value = Column(Float, nullable=False)
@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Optional
+
+
+class AuditEventResponse(BaseModel):
+    occurred_at: datetime
+    actor_id: int
+    actor_role: str
+    action: str
+    resource_id: Optional[int] = None
+
+    class Config:
+        from_attributes = True
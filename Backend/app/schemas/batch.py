@@ -0,0 +1,25 @@
+from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
+
+
+class BatchSubRequest(BaseModel):
+    id: Optional[str] = None
+    method: str = "GET"
+    path: str
+    headers: Dict[str, str] = {}
+    body: Optional[Any] = None
+
+
+class BatchRequest(BaseModel):
+    requests: List[BatchSubRequest]
+
+
+class BatchSubResponse(BaseModel):
+    id: Optional[str] = None
+    status: int
+    headers: Dict[str, str] = {}
+    body: Optional[Any] = None
+
+
+class BatchResponse(BaseModel):
+    responses: List[BatchSubResponse]
@@ -0,0 +1,7 @@
+from pydantic import BaseModel
+
+
+class DrugMatch(BaseModel):
+    id: str  # canonical drug id
+    name: str
+    matched: str  # the normalized name or synonym that matched the query
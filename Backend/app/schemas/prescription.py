@@ -1,6 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 
 class PrescriptionBase(BaseModel):
@@ -24,3 +24,48 @@ class PrescriptionResponse(PrescriptionBase):
 
     class Config:
         from_attributes = True
+
+
+class InteractionWarning(BaseModel):
+    drug: str
+    interacts_with: str
+    severity: str  # minor, moderate, major or contraindicated
+    description: Optional[str] = None
+
+
+class PrescriptionCreatedResponse(PrescriptionResponse):
+    interactions: List[InteractionWarning] = []
+
+
+class PrescriptionItem(BaseModel):
+    # Column lengths, so overlong items are a 422 rather than a database error
+    medicine: str = Field(..., max_length=100)
+    dosage: str = Field(..., max_length=50)
+    timing: str = Field(..., max_length=200)
+    duration: Optional[str] = Field(None, max_length=50)
+    notes: Optional[str] = Field(None, max_length=500)
+    total_tablets: Optional[int] = Field(None, ge=0)
+
+
+class PrescriptionBundleCreate(BaseModel):
+    patient_id: int
+    items: List[PrescriptionItem] = Field(..., min_length=1, max_length=50)
+    create_medications: bool = True
+    create_reminders: bool = True
+
+
+class PrescriptionBundleResponse(BaseModel):
+    prescriptions: List[PrescriptionResponse]
+    medication_ids: List[int] = []
+    reminder_ids: List[int] = []
+    interactions: List[InteractionWarning] = []
+
+
+class InteractionCheckRequest(BaseModel):
+    drugs: List[str] = Field(..., min_length=1, max_length=100)
+    patient_id: Optional[int] = None  # also check the patient's active drugs
+
+
+class InteractionCheckResponse(BaseModel):
+    interactions: List[InteractionWarning]
+    unknown: List[str]  # not in the dataset, so not checked
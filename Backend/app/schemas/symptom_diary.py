@@ -1,6 +1,6 @@
 from pydantic import BaseModel
-from datetime import datetime
-from typing import Optional
+from datetime import date, datetime
+from typing import Dict, List, Optional
 
 
 class SymptomDiaryBase(BaseModel):
@@ -21,3 +21,33 @@ class SymptomDiaryResponse(SymptomDiaryBase):
 
     class Config:
         from_attributes = True
+
+
+class TagCount(BaseModel):
+    tag: str
+    count: int
+
+
+class CoOccurrenceResponse(BaseModel):
+    tag: str
+    entries: int  # entries with the tag
+    co_occurring: List[TagCount]  # most frequent first
+
+
+class TrendPoint(BaseModel):
+    start: date  # first day of the period
+    entries: int
+    counts: Dict[str, int]  # tag -> entries with it
+
+
+class TrendResponse(BaseModel):
+    period: str
+    points: List[TrendPoint]
+
+
+class SeverityCorrelation(BaseModel):
+    tag: str
+    entries: int
+    mean_severity: Optional[float] = None  # of entries with the tag
+    mean_without: Optional[float] = None
+    correlation: Optional[float] = None  # point-biserial, -1..1
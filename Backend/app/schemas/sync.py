@@ -0,0 +1,26 @@
+from pydantic import BaseModel
+from typing import Generic, List, TypeVar
+from app.schemas.appointment import AppointmentResponse
+from app.schemas.medications import MedicationResponse
+from app.schemas.message import MessageResponse
+from app.schemas.prescription import PrescriptionResponse
+from app.schemas.reminder import ReminderResponse
+from app.schemas.symptom_diary import SymptomDiaryResponse
+
+T = TypeVar("T")
+
+
+class Changes(BaseModel, Generic[T]):
+    upserted: List[T] = []
+    deleted: List[int] = []  # ids to remove
+
+
+class SyncResponse(BaseModel):
+    token: str  # pass as ?since= next time
+    reset: bool  # True: replace local data instead of merging
+    medications: Changes[MedicationResponse]
+    reminders: Changes[ReminderResponse]
+    symptom_entries: Changes[SymptomDiaryResponse]
+    appointments: Changes[AppointmentResponse]
+    prescriptions: Changes[PrescriptionResponse]
+    messages: Changes[MessageResponse]
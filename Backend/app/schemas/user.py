@@ -25,6 +25,11 @@ class UserResponse(UserBase):
         from_attributes = True
 
 
+class DoctorSummary(BaseModel):
+    id: int
+    name: str
+
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -0,0 +1,41 @@
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import List
+from app.models.vital import VitalKind
+
+
+class VitalReadingIn(BaseModel):
+    kind: VitalKind
+    value: float
+    measured_at: datetime  # naive times are UTC
+
+
+class VitalBatch(BaseModel):
+    device_id: str = Field(..., min_length=1, max_length=64)
+    readings: List[VitalReadingIn] = Field(..., min_length=1)
+
+
+class RejectedReading(BaseModel):
+    index: int  # position in the batch
+    detail: str
+
+
+class VitalIngestResponse(BaseModel):
+    accepted: int
+    duplicates: int  # already stored from this device
+    rejected: List[RejectedReading]
+
+
+class VitalPoint(BaseModel):
+    start: datetime  # the reading's time, or the start of its hour or day
+    count: int
+    min: float
+    max: float
+    avg: float
+
+
+class VitalSeries(BaseModel):
+    kind: VitalKind
+    resolution: str  # raw, hour or day
+    points: List[VitalPoint]
+    truncated: bool = False  # raw readings beyond VITALS_MAX_POINTS left out
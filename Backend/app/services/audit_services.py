@@ -0,0 +1,225 @@
+import csv
+import io
+import logging
+import os
+import threading
+import time
+from datetime import date, datetime
+from typing import Iterator, List, Optional, Tuple
+from sqlalchemy import text
+from config import settings
+from database import engine
+from app.models.audit import AuditEvent
+from app.utils.metrics import AUDIT_EVENTS, AUDIT_FLUSH_SECONDS
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = (
+    "occurred_at",
+    "actor_id",
+    "actor_role",
+    "patient_id",
+    "action",
+    "resource_id",
+)
+
+
+def _month_ranges(first: date, count: int) -> Iterator[Tuple[date, date]]:
+    """[start, end) of the month containing ``first`` and the ``count`` after it"""
+    year, month = first.year, first.month
+    for _ in range(count + 1):
+        start = date(year, month, 1)
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        yield start, date(year, month, 1)
+
+
+def _copy_value(value) -> str:
+    if value is None:
+        return "\\N"
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    return str(value)
+
+
+class AuditLog:
+    """Buffers audit events and writes them in batches off the request path
+
+    record() only appends to a list. A background thread writes the buffer
+    when ``batch_size`` events are waiting or every ``interval`` seconds,
+    with COPY on PostgreSQL and one executemany INSERT elsewhere. A failed
+    write keeps its events for the next attempt; only beyond ``max_buffer``
+    are the oldest dropped. close() writes whatever is left.
+    """
+
+    def __init__(
+        self,
+        bind,
+        batch_size: int = 500,
+        interval: float = 2.0,
+        max_buffer: int = 100_000,
+        partitions_ahead: int = 2,
+    ):
+        self.bind = bind
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_buffer = max_buffer
+        self.partitions_ahead = partitions_ahead
+        self._buffer: List[tuple] = []
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._closing = False
+        self._partitioned_month: Optional[Tuple[int, int]] = None
+        # The writer thread does not survive fork, and events buffered by the
+        # parent are the parent's to write
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self) -> None:
+        self._buffer = []
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closing = False
+
+    def record(
+        self,
+        actor_id: int,
+        actor_role: str,
+        patient_id: int,
+        action: str,
+        resource_id: Optional[int] = None,
+    ) -> None:
+        row = (datetime.utcnow(), actor_id, actor_role, patient_id, action, resource_id)
+        with self._cond:
+            closing = self._closing
+            if not closing:
+                if self._thread is None:
+                    self._start()
+                self._buffer.append(row)
+                if len(self._buffer) >= self.batch_size:
+                    self._cond.notify()
+        AUDIT_EVENTS.labels("recorded").inc()
+        if closing:
+            # Shutting down: nothing will flush later, so write it now
+            self._flush([row])
+
+    def _start(self) -> None:
+        self._thread = threading.Thread(
+            target=self._run, name="audit-writer", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if len(self._buffer) < self.batch_size and not self._closing:
+                    self._cond.wait(self.interval)
+                batch, self._buffer = self._buffer, []
+                closing = self._closing
+            if batch and not self._flush(batch) and not closing:
+                time.sleep(self.interval)  # the database is struggling; back off
+            if closing:
+                return
+
+    def _flush(self, batch: List[tuple]) -> bool:
+        started = time.perf_counter()
+        try:
+            self._ensure_partitions()
+            self._write(batch)
+        except Exception:
+            logger.warning(
+                "Writing %d audit events failed; will retry", len(batch), exc_info=True
+            )
+            with self._cond:
+                self._buffer[:0] = batch
+                overflow = len(self._buffer) - self.max_buffer
+                if overflow > 0:
+                    del self._buffer[:overflow]
+                    logger.error("Audit buffer full; dropped %d oldest events", overflow)
+                    AUDIT_EVENTS.labels("dropped").inc(overflow)
+            return False
+        AUDIT_FLUSH_SECONDS.observe(time.perf_counter() - started)
+        AUDIT_EVENTS.labels("written").inc(len(batch))
+        return True
+
+    def _write(self, batch: List[tuple]) -> None:
+        if self.bind.dialect.name == "postgresql":
+            buf = io.StringIO()
+            writer = csv.writer(buf, delimiter="\t", quotechar='"', lineterminator="\n")
+            for row in batch:
+                writer.writerow([_copy_value(v) for v in row])
+            buf.seek(0)
+            raw = self.bind.raw_connection()
+            try:
+                with raw.cursor() as cur:
+                    cur.copy_expert(
+                        f"COPY audit_events ({', '.join(COLUMNS)}) FROM STDIN "
+                        "WITH (FORMAT csv, DELIMITER E'\\t', NULL '\\N')",
+                        buf,
+                    )
+                raw.commit()
+            finally:
+                raw.close()
+            return
+
+        with self.bind.begin() as conn:
+            conn.execute(
+                AuditEvent.__table__.insert(), [dict(zip(COLUMNS, row)) for row in batch]
+            )
+
+    def _ensure_partitions(self) -> None:
+        """Create this month's partition and the next few (PostgreSQL only)"""
+        if self.bind.dialect.name != "postgresql":
+            return
+        today = datetime.utcnow().date()
+        month = (today.year, today.month)
+        if self._partitioned_month == month:
+            return
+        # Checked once a month; failures are logged, not retried, because the
+        # default partition still accepts the rows
+        self._partitioned_month = month
+        try:
+            with self.bind.begin() as conn:
+                for start, end in _month_ranges(today, self.partitions_ahead):
+                    conn.execute(
+                        text(
+                            f"CREATE TABLE IF NOT EXISTS audit_events_{start:%Y_%m} "
+                            "PARTITION OF audit_events "
+                            f"FOR VALUES FROM ('{start}') TO ('{end}')"
+                        )
+                    )
+        except Exception:
+            logger.error("Creating audit_events partitions failed", exc_info=True)
+
+    def close(self, timeout: float = 30) -> None:
+        """Write everything buffered and stop the writer thread"""
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        with self._cond:
+            batch, self._buffer = self._buffer, []
+        if batch and not self._flush(batch):
+            with self._cond:
+                lost, self._buffer = len(self._buffer), []
+            logger.error("Lost %d audit events at shutdown", lost)
+            AUDIT_EVENTS.labels("dropped").inc(lost)
+
+
+audit_log = AuditLog(
+    engine,
+    batch_size=settings.AUDIT_BATCH_SIZE,
+    interval=settings.AUDIT_FLUSH_SECONDS,
+    max_buffer=settings.AUDIT_MAX_BUFFER,
+    partitions_ahead=settings.AUDIT_PARTITIONS_AHEAD,
+)
+
+
+def record_access(
+    actor, patient_id: int, action: str, resource_id: Optional[int] = None
+) -> None:
+    """Audit that ``actor`` read ``patient_id``'s records; no database write inline"""
+    if not settings.AUDIT_ENABLED:
+        return
+    role = getattr(actor.role, "value", actor.role)
+    audit_log.record(actor.id, role, patient_id, action, resource_id)
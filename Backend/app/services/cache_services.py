@@ -0,0 +1,510 @@
+import functools
+import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+# Columns that tie a row to a user; their values become "<table>:user:<id>" tags
+OWNER_COLUMNS = ("user_id", "patient_id", "doctor_id", "sender_id", "receiver_id")
+
+
+class LRUCache:
+    """Bounded in-process cache with per-entry expiry (L1)"""
+
+    def __init__(self, max_entries: int = 10_000):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return _MISSING
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return _MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class MemoryBackend:
+    """In-memory stand-in for Redis with the same interface as RedisBackend"""
+
+    def __init__(self):
+        self._data: Dict[str, tuple] = {}
+        self._tags: Dict[str, set] = {}
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[1] < time.monotonic():
+                return None
+            return item[0]
+
+    def versions(self, tags: Iterable[str]) -> tuple:
+        with self._lock:
+            return tuple(self._versions.get(tag, 0) for tag in tags)
+
+    def set(
+        self,
+        key: str,
+        value: bytes,
+        ttl: float,
+        tags: Iterable[str],
+        versions: Optional[tuple] = None,
+    ) -> bool:
+        tags = list(tags)
+        with self._lock:
+            if versions is not None and versions != tuple(
+                self._versions.get(tag, 0) for tag in tags
+            ):
+                return False
+            self._data[key] = (value, time.monotonic() + ttl)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            return True
+
+    def invalidate_tags(self, tags: Iterable[str]) -> List[str]:
+        removed = []
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] = self._versions.get(tag, 0) + 1
+                for key in self._tags.pop(tag, ()):
+                    if self._data.pop(key, None) is not None:
+                        removed.append(key)
+        return removed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._tags.clear()
+            self._versions.clear()
+
+
+class RedisBackend:
+    """Shared L2 cache; tags are Redis sets of the keys they cover
+
+    Each tag also has a version counter, bumped by every invalidation, so a
+    process that computed a value from data read before another process
+    invalidated it can tell, and does not store it.
+    """
+
+    # Versions only need to outlive the slowest computation between reading
+    # and comparing them
+    VERSION_TTL = 86_400
+
+    def __init__(self, url: str, prefix: str = "cache:"):
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+        self._prefix = prefix
+
+    def _version_keys(self, tags: Iterable[str]) -> List[str]:
+        return [f"{self._prefix}ver:{tag}" for tag in tags]
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._redis.get(self._prefix + key)
+
+    def versions(self, tags: Iterable[str]) -> tuple:
+        version_keys = self._version_keys(tags)
+        if not version_keys:
+            return ()
+        return tuple(int(v or 0) for v in self._redis.mget(version_keys))
+
+    def set(
+        self,
+        key: str,
+        value: bytes,
+        ttl: float,
+        tags: Iterable[str],
+        versions: Optional[tuple] = None,
+    ) -> bool:
+        """Store ``value``; with ``versions``, only if no tag was invalidated since
+
+        The comparison and the write happen in one WATCH/MULTI transaction,
+        so an invalidation landing in between aborts the write.
+        """
+        from redis.exceptions import WatchError
+
+        tags = list(tags)
+        version_keys = self._version_keys(tags)
+        with self._redis.pipeline(transaction=True) as pipe:
+            try:
+                if versions is not None and version_keys:
+                    pipe.watch(*version_keys)
+                    current = tuple(int(v or 0) for v in pipe.mget(version_keys))
+                    if current != versions:
+                        pipe.unwatch()
+                        return False
+                pipe.multi()
+                pipe.set(self._prefix + key, value, ex=max(1, int(ttl)))
+                for tag in tags:
+                    tag_key = f"{self._prefix}tag:{tag}"
+                    pipe.sadd(tag_key, key)
+                    pipe.expire(tag_key, max(1, int(ttl)))
+                pipe.execute()
+                return True
+            except WatchError:
+                return False
+
+    def invalidate_tags(self, tags: Iterable[str]) -> List[str]:
+        tags = list(tags)
+        tag_keys = [f"{self._prefix}tag:{tag}" for tag in tags]
+        if not tag_keys:
+            return []
+        # Versions first: a fill that compares after this is refused, and one
+        # that stored before it is in the tag sets read below
+        pipe = self._redis.pipeline(transaction=False)
+        for version_key in self._version_keys(tags):
+            pipe.incr(version_key)
+            pipe.expire(version_key, self.VERSION_TTL)
+        pipe.execute()
+        pipe = self._redis.pipeline(transaction=False)
+        for tag_key in tag_keys:
+            pipe.smembers(tag_key)
+        members = pipe.execute()
+        keys = sorted({m.decode() for group in members for m in group})
+        pipe = self._redis.pipeline(transaction=False)
+        if keys:
+            pipe.delete(*[self._prefix + key for key in keys])
+        pipe.delete(*tag_keys)
+        pipe.execute()
+        return keys
+
+    def clear(self) -> None:
+        for key in self._redis.scan_iter(match=self._prefix + "*"):
+            self._redis.delete(key)
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class TwoLevelCache:
+    """Cache-aside store: in-process LRU in front of an optional shared backend
+
+    Invalidation reaches the local L1 and the shared L2. Other processes'
+    L1 entries are not notified, so the L1 TTL is kept short and bounds how
+    long they can serve a value that was invalidated elsewhere.
+    """
+
+    def __init__(
+        self,
+        l2=None,
+        l1_max_entries: int = 10_000,
+        l1_ttl: float = 30,
+        default_ttl: float = 300,
+    ):
+        self.l1 = LRUCache(l1_max_entries)
+        self.l2 = l2
+        self.l1_ttl = l1_ttl
+        self.default_ttl = default_ttl
+        self._l1_tags: Dict[str, set] = {}
+        self._generations: Dict[str, int] = {}
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            "l1_hits": 0,
+            "l2_hits": 0,
+            "misses": 0,
+            "fills": 0,
+            "stale_fills_skipped": 0,
+            "invalidations": 0,
+            "l2_errors": 0,
+        }
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._stats[name] += amount
+
+    def get(self, key: str) -> Any:
+        value = self.l1.get(key)
+        if value is not _MISSING:
+            self._count("l1_hits")
+            return value
+
+        if self.l2 is not None:
+            try:
+                raw = self.l2.get(key)
+            except Exception:
+                logger.warning("L2 cache read failed", exc_info=True)
+                self._count("l2_errors")
+                raw = None
+            if raw is not None:
+                value = pickle.loads(raw)
+                self.l1.set(key, value, self.l1_ttl)
+                self._count("l2_hits")
+                return value
+
+        self._count("misses")
+        return _MISSING
+
+    def set(
+        self,
+        key: str,
+        value: Any,
+        ttl: Optional[float] = None,
+        tags: Iterable[str] = (),
+        versions: Optional[tuple] = None,
+    ) -> bool:
+        """Store in L1 and L2; False if ``versions`` (from l2_versions()) are outdated
+
+        An outdated value is stored nowhere: another process invalidated one
+        of its tags after it was read.
+        """
+        ttl = ttl or self.default_ttl
+        tags = list(tags)
+        if self.l2 is not None:
+            try:
+                if not self.l2.set(key, pickle.dumps(value), ttl, tags, versions):
+                    return False
+            except Exception:
+                logger.warning("L2 cache write failed", exc_info=True)
+                self._count("l2_errors")
+        self._set_l1(key, value, ttl, tags)
+        return True
+
+    def _set_l1(self, key: str, value: Any, ttl: float, tags: List[str]) -> None:
+        self.l1.set(key, value, min(ttl, self.l1_ttl))
+        with self._lock:
+            for tag in tags:
+                self._l1_tags.setdefault(tag, set()).add(key)
+        self._count("fills")
+
+    def generations(self, tags: Iterable[str]) -> tuple:
+        with self._lock:
+            return tuple(self._generations.get(tag, 0) for tag in tags)
+
+    def l2_versions(self, tags: Iterable[str]) -> Optional[tuple]:
+        """Shared tag versions, or None without a reachable L2"""
+        if self.l2 is None:
+            return None
+        try:
+            return self.l2.versions(tags)
+        except Exception:
+            logger.warning("L2 cache version read failed", exc_info=True)
+            self._count("l2_errors")
+            return None
+
+    def invalidate_tags(self, tags: Iterable[str]) -> None:
+        tags = set(tags)
+        if not tags:
+            return
+        with self._lock:
+            keys = set()
+            for tag in tags:
+                keys.update(self._l1_tags.pop(tag, ()))
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+            self._stats["invalidations"] += len(tags)
+        self.l1.delete(*keys)
+        if self.l2 is not None:
+            try:
+                self.l1.delete(*self.l2.invalidate_tags(tags))
+            except Exception:
+                logger.warning("L2 cache invalidation failed", exc_info=True)
+                self._count("l2_errors")
+
+    def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Any],
+        ttl: Optional[float] = None,
+        tags: Iterable[str] = (),
+    ) -> Any:
+        """Return the cached value, computing it at most once across threads"""
+        value = self.get(key)
+        if value is not _MISSING:
+            return value
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        tags = list(tags)
+        try:
+            # A write committed while we query makes our result stale; skip
+            # storing it rather than caching an outdated value until expiry.
+            # Local generations catch this process's writes; the L2 versions
+            # catch invalidations by other processes, up to the L2 write.
+            before = self.generations(tags)
+            shared_before = self.l2_versions(tags)
+            flight.value = compute()
+            stored = self.generations(tags) == before
+            if stored and self.l2 is not None and shared_before is None:
+                # L2 unreachable: nothing to compare against, keep it local
+                self._set_l1(key, flight.value, ttl or self.default_ttl, tags)
+            elif stored:
+                stored = self.set(key, flight.value, ttl, tags, shared_before)
+            if not stored:
+                self._count("stale_fills_skipped")
+            return flight.value
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def clear(self) -> None:
+        self.l1.clear()
+        with self._lock:
+            self._l1_tags.clear()
+        if self.l2 is not None:
+            self.l2.clear()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["evictions"] = self.l1.evictions
+        stats["l1_entries"] = len(self.l1)
+        lookups = stats["l1_hits"] + stats["l2_hits"] + stats["misses"]
+        stats["hit_ratio"] = (
+            (stats["l1_hits"] + stats["l2_hits"]) / lookups if lookups else 0.0
+        )
+        return stats
+
+
+def _build_cache() -> TwoLevelCache:
+    l2 = RedisBackend(settings.REDIS_URL) if settings.REDIS_URL else None
+    return TwoLevelCache(
+        l2=l2,
+        l1_max_entries=settings.CACHE_L1_MAX_ENTRIES,
+        l1_ttl=settings.CACHE_L1_TTL,
+        default_ttl=settings.CACHE_DEFAULT_TTL,
+    )
+
+
+cache = _build_cache()
+
+
+def cached(
+    namespace: str,
+    tags: Callable[..., Iterable[str]],
+    ttl: Optional[float] = None,
+):
+    """Cache-aside decorator for query functions taking a Session first
+
+    The session is not part of the key; the remaining arguments are. ``tags``
+    receives the same arguments as the function and names the tags whose
+    invalidation must drop the entry. Cached values are shared between
+    callers and must be treated as read-only.
+    """
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(db: Session, *args, **kwargs):
+            if not settings.CACHE_ENABLED:
+                return fn(db, *args, **kwargs)
+            key = f"{namespace}:{args!r}:{sorted(kwargs.items())!r}"
+            return cache.get_or_compute(
+                key,
+                lambda: fn(db, *args, **kwargs),
+                ttl=ttl,
+                tags=tags(*args, **kwargs),
+            )
+
+        wrapper.uncached = fn
+        return wrapper
+
+    return decorator
+
+
+def _values(obj, state, name: str) -> list:
+    """An attribute's value and, if a flush changed it, the value it replaced"""
+    values = [getattr(obj, name, None)]
+    if name in state.attrs:
+        values += state.attrs[name].history.deleted
+    return [value for value in dict.fromkeys(values) if value is not None]
+
+
+def tags_for_instance(obj) -> List[str]:
+    """Tags touched by inserting, updating or deleting an ORM instance
+
+    An update that moves a row to another owner, or makes a doctor a
+    patient, touches the previous owner's and the doctors' tags too.
+    """
+    table = getattr(obj, "__tablename__", None)
+    if table is None:
+        return []
+    state = inspect(obj)
+    tags = [f"{table}:{obj.id}"]
+    for column in OWNER_COLUMNS:
+        for value in _values(obj, state, column):
+            tags.append(f"{table}:user:{value}")
+    if table == "users" and "doctor" in _values(obj, state, "role"):
+        tags.append("users:doctors")
+    return tags
+
+
+def mark_dirty(db: Session, *tags: str) -> None:
+    """Queue tags for invalidation when ``db`` commits (e.g. after bulk inserts)"""
+    db.info.setdefault("cache_tags", set()).update(tags)
+
+
+def _after_flush(db: Session, flush_context) -> None:
+    tags = db.info.setdefault("cache_tags", set())
+    for obj in (*db.new, *db.dirty, *db.deleted):
+        tags.update(tags_for_instance(obj))
+
+
+def _after_commit(db: Session) -> None:
+    tags = db.info.pop("cache_tags", None)
+    if tags:
+        cache.invalidate_tags(tags)
+
+
+def _after_rollback(db: Session, previous_transaction) -> None:
+    db.info.pop("cache_tags", None)
+
+
+def install_session_hooks(session_factory) -> None:
+    """Invalidate cache tags for every model row changed by a committed session"""
+    event.listen(session_factory, "after_flush", _after_flush)
+    event.listen(session_factory, "after_commit", _after_commit)
+    event.listen(session_factory, "after_soft_rollback", _after_rollback)
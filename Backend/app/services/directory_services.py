@@ -0,0 +1,206 @@
+import bisect
+import threading
+import time
+import unicodedata
+from typing import Dict, Iterable, List, Optional
+from config import settings
+from database import SessionLocal
+from app.models.user import User
+from app.services.user_services import get_doctors
+
+# Up to this many ``only_ids`` are checked one by one rather than by scanning
+SMALL_FILTER = 1000
+
+
+def normalize(text: str) -> str:
+    """Lowercase and strip accents so "José" is found by "jose" """
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(stripped.lower().split())
+
+
+class DoctorDirectory:
+    """Sorted-array prefix index over doctor names
+
+    Every doctor contributes one key per name token ("alice smith" is found
+    by "ali" and by "smi"). Lookups bisect to the first key with the prefix
+    and scan forward only as far as the requested page, so the cost does not
+    depend on how many doctors exist.
+    """
+
+    def __init__(self):
+        self._keys: List[tuple] = []  # (token, normalized name, doctor id)
+        self._by_name: List[tuple] = []  # (normalized name, doctor id)
+        self._doctors: Dict[int, dict] = {}
+        self._max_id = 0
+        self._loaded = False
+        self._refreshed_at = 0.0
+        self._built_at = 0.0
+        # Doctors added in-process since the last build started
+        self._recent: Dict[int, str] = {}
+        self._lock = threading.RLock()
+        # Serializes refreshes without blocking searches while one queries
+        self._refresh_lock = threading.Lock()
+
+    def add(self, doctor_id: int, name: str) -> None:
+        """Index a doctor (idempotent)"""
+        with self._lock:
+            self._recent[doctor_id] = name
+            if doctor_id in self._doctors:
+                return
+            norm = normalize(name)
+            self._doctors[doctor_id] = {"id": doctor_id, "name": name}
+            bisect.insort(self._by_name, (norm, doctor_id))
+            for token in set(norm.split()):
+                bisect.insort(self._keys, (token, norm, doctor_id))
+            self._max_id = max(self._max_id, doctor_id)
+
+    def add_many(self, doctors: Iterable[tuple]) -> None:
+        """Index (id, name) pairs, sorting once instead of inserting one by one"""
+        doctors = [(doctor_id, name) for doctor_id, name in doctors]
+        with self._lock:
+            new = [(i, n) for i, n in doctors if i not in self._doctors]
+            if not new:
+                return
+            for doctor_id, name in new:
+                norm = normalize(name)
+                self._doctors[doctor_id] = {"id": doctor_id, "name": name}
+                self._by_name.append((norm, doctor_id))
+                self._keys.extend((token, norm, doctor_id) for token in set(norm.split()))
+                self._max_id = max(self._max_id, doctor_id)
+            self._by_name.sort()
+            self._keys.sort()
+
+    def _build(self, doctors: Iterable[tuple]) -> None:
+        """Replace the index with (id, name) pairs, built without holding the lock"""
+        entries: Dict[int, dict] = {}
+        keys: List[tuple] = []
+        by_name: List[tuple] = []
+        for doctor_id, name in doctors:
+            if doctor_id in entries:
+                continue
+            norm = normalize(name)
+            entries[doctor_id] = {"id": doctor_id, "name": name}
+            by_name.append((norm, doctor_id))
+            keys.extend((token, norm, doctor_id) for token in set(norm.split()))
+        keys.sort()
+        by_name.sort()
+        with self._lock:
+            # Doctors added (e.g. by registration) while this was built
+            late = [item for item in self._recent.items() if item[0] not in entries]
+            self._keys, self._by_name, self._doctors = keys, by_name, entries
+            self._max_id = max(entries, default=0)
+            self._loaded = True
+            self.add_many(late)
+
+    def refresh(self) -> None:
+        """Load doctors registered since the last refresh (e.g. by other workers)
+
+        The first call, and one every DIRECTORY_REBUILD_SECONDS, builds the
+        whole index, so renamed doctors and changed roles are picked up too.
+        It queries in a session of its own and belongs in a thread, not on
+        the event loop.
+        """
+        now = time.monotonic()
+        if self._loaded and now - self._refreshed_at < settings.DIRECTORY_REFRESH_SECONDS:
+            return
+
+        with self._refresh_lock:
+            if self._loaded and now - self._refreshed_at < settings.DIRECTORY_REFRESH_SECONDS:
+                return
+            rebuild = (
+                not self._loaded or now - self._built_at >= settings.DIRECTORY_REBUILD_SECONDS
+            )
+            with SessionLocal() as db:
+                if rebuild:
+                    with self._lock:
+                        self._recent = {}
+                    self._build((d["id"], d["name"]) for d in get_doctors(db))
+                    self._built_at = now
+                else:
+                    rows = (
+                        db.query(User.id, User.name)
+                        .filter(User.role == "doctor", User.id > self._max_id)
+                        .all()
+                    )
+                    self.add_many((row.id, row.name) for row in rows)
+            self._refreshed_at = now
+
+    def search(
+        self,
+        query: str = "",
+        limit: int = 20,
+        offset: int = 0,
+        only_ids: Optional[Iterable[int]] = None,
+    ) -> List[dict]:
+        """Doctors whose name tokens start with every word of ``query``"""
+        words = normalize(query).split()
+        only_ids = set(only_ids) if only_ids is not None else None
+        wanted = offset + limit
+        results: List[dict] = []
+        seen = set()
+
+        with self._lock:
+            if only_ids is not None and len(only_ids) <= SMALL_FILTER:
+                # A few known doctors: check each instead of scanning the range
+                return self._search_ids(words, only_ids)[offset:wanted]
+            if not words:
+                candidates = (doctor_id for _, doctor_id in self._by_name)
+            else:
+                first = words[0]
+                start = bisect.bisect_left(self._keys, (first,))
+                candidates = self._scan(start, first)
+
+            for doctor_id in candidates:
+                if doctor_id in seen:
+                    continue
+                seen.add(doctor_id)
+                if only_ids is not None and doctor_id not in only_ids:
+                    continue
+                doctor = self._doctors[doctor_id]
+                if len(words) > 1 and not _matches_all(doctor["name"], words[1:]):
+                    continue
+                results.append(doctor)
+                if len(results) >= wanted:
+                    break
+
+        return results[offset:wanted]
+
+    def _search_ids(self, words: List[str], only_ids: set) -> List[dict]:
+        """The doctors among ``only_ids`` matching ``words``, in name order"""
+        matches = []
+        for doctor_id in only_ids:
+            doctor = self._doctors.get(doctor_id)
+            if doctor is not None and _matches_all(doctor["name"], words):
+                matches.append((normalize(doctor["name"]), doctor_id, doctor))
+        if words:
+            # Same order as a prefix scan: by the first matching token
+            matches = [
+                (_first_token(norm, words[0]), norm, doctor_id, doctor)
+                for norm, doctor_id, doctor in matches
+            ]
+        matches.sort(key=lambda match: match[:-1])
+        return [match[-1] for match in matches]
+
+    def _scan(self, start: int, prefix: str):
+        keys = self._keys
+        for i in range(start, len(keys)):
+            token, _, doctor_id = keys[i]
+            if not token.startswith(prefix):
+                return
+            yield doctor_id
+
+    def __len__(self) -> int:
+        return len(self._doctors)
+
+
+def _first_token(norm: str, prefix: str) -> str:
+    return min(token for token in norm.split() if token.startswith(prefix))
+
+
+def _matches_all(name: str, words: List[str]) -> bool:
+    tokens = normalize(name).split()
+    return all(any(token.startswith(word) for token in tokens) for word in words)
+
+
+doctor_directory = DoctorDirectory()
@@ -0,0 +1,132 @@
+import logging
+import os
+import threading
+from typing import Dict, List, Optional
+from sqlalchemy import bindparam, select, update
+from config import settings
+from database import table_binds
+from app.models.medications import Medication
+from app.models.prescription import Prescription
+from app.services.queue_services import PRIORITY_LOW, task
+from app.utils.drug_dictionary import DrugDictionary
+from app.utils.metrics import DRUG_NAMES_NORMALIZED
+
+logger = logging.getLogger(__name__)
+
+# Free-text drug name columns that get a canonical drug_id
+NORMALIZED_COLUMNS = {
+    "prescriptions": (Prescription.__table__, "medicine"),
+    "medications": (Medication.__table__, "name"),
+}
+
+_lock = threading.Lock()
+_dictionary: List[Optional[DrugDictionary]] = []  # filled on first use
+
+
+def get_dictionary() -> Optional[DrugDictionary]:
+    """The DRUG_DICTIONARY_PATH dictionary, loaded once per process; None if unset"""
+    if not _dictionary:
+        with _lock:
+            if not _dictionary:
+                _dictionary.append(_load())
+    return _dictionary[0]
+
+
+def _load() -> Optional[DrugDictionary]:
+    if not settings.DRUG_DICTIONARY_PATH:
+        return None
+    try:
+        dictionary = DrugDictionary.from_csv(settings.DRUG_DICTIONARY_PATH)
+    except Exception:
+        logger.exception("Loading the drug dictionary failed")
+        return None
+    logger.info("Loaded %d drugs (%d names)", len(dictionary), len(dictionary.keys))
+    return dictionary
+
+
+def search_drugs(query: str, limit: int) -> List[dict]:
+    dictionary = get_dictionary()
+    if dictionary is None:
+        return []
+    return [
+        {"id": dictionary.ids[drug], "name": dictionary.names[drug], "matched": matched}
+        for drug, matched in dictionary.search(query, limit)
+    ]
+
+
+def drug_id_for(name: str) -> Optional[str]:
+    """Canonical id of a free-text drug name, or None if it is not recognised"""
+    dictionary = get_dictionary()
+    if dictionary is None:
+        return None
+    drug = dictionary.match(name)
+    return None if drug is None else dictionary.ids[drug]
+
+
+def normalize_column(
+    bind, table, column: str, rematch: bool = False, batch_size: int = 1000
+) -> Dict[str, int]:
+    """Set drug_id from the name column, one batch of rows per transaction
+
+    Only rows without a drug_id are read unless ``rematch``, which also
+    corrects rows matched against an older dictionary. updated_at is left
+    alone: the rows did not change for their owners.
+    """
+    dictionary = get_dictionary()
+    counts = {"matched": 0, "unmatched": 0, "updated": 0}
+    set_drug_id = (
+        update(table)
+        .where(table.c.id == bindparam("row_id"))
+        .values(drug_id=bindparam("new_drug_id"), updated_at=table.c.updated_at)
+    )
+    last_id = 0
+    while True:
+        query = select(table.c.id, table.c[column], table.c.drug_id).where(
+            table.c.id > last_id
+        )
+        if not rematch:
+            query = query.where(table.c.drug_id.is_(None))
+        with bind.begin() as conn:
+            rows = conn.execute(query.order_by(table.c.id).limit(batch_size)).all()
+            changes = []
+            for row_id, name, current in rows:
+                drug = dictionary.match(name or "")
+                new_drug_id = None if drug is None else dictionary.ids[drug]
+                counts["matched" if new_drug_id else "unmatched"] += 1
+                if new_drug_id != current:
+                    changes.append({"row_id": row_id, "new_drug_id": new_drug_id})
+            if changes:
+                conn.execute(set_drug_id, changes)
+        counts["updated"] += len(changes)
+        if len(rows) < batch_size:
+            return counts
+        last_id = rows[-1][0]
+
+
+@task("drugs.normalize_names", priority=PRIORITY_LOW)
+def normalize_names(rematch: bool = False) -> None:
+    """Backfill drug_id on every table in NORMALIZED_COLUMNS, shards included"""
+    if get_dictionary() is None:
+        return
+    for name, (table, column) in NORMALIZED_COLUMNS.items():
+        for bind in table_binds(table.name):
+            counts = normalize_column(
+                bind, table, column, rematch, settings.DRUG_NORMALIZE_BATCH_SIZE
+            )
+            DRUG_NAMES_NORMALIZED.labels(name, "matched").inc(counts["matched"])
+            DRUG_NAMES_NORMALIZED.labels(name, "unmatched").inc(counts["unmatched"])
+            logger.info("Normalized %s drug names on %s: %s", name, bind.url, counts)
+
+
+def schedule_normalization() -> None:
+    """Queue a backfill for the current dictionary file; a no-op if already queued"""
+    if not settings.DRUG_DICTIONARY_PATH:
+        return
+    try:
+        stat = os.stat(settings.DRUG_DICTIONARY_PATH)
+    except OSError:
+        return
+    normalize_names.enqueue(
+        kwargs={"rematch": True},
+        key=f"drugs.normalize_names:{stat.st_size}:{stat.st_mtime_ns}",
+    )
@@ -0,0 +1,110 @@
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.models.medications import Medication
+from app.models.prescription import Prescription
+from app.models.symptom_diary import SymptomDiary
+from app.models.vital import VitalReading
+from app.utils.metrics import EXPORT_ROWS
+from app.utils.replicas import RoutingSession
+from app.utils.sharding import SHARDED_TABLES
+
+# Dataset -> (table, owning patient column, column the date range applies to)
+EXPORTS = {
+    "symptoms": (SymptomDiary.__table__, "user_id", "date"),
+    "medications": (Medication.__table__, "user_id", "created_at"),
+    "prescriptions": (Prescription.__table__, "patient_id", "created_at"),
+    "vitals": (VitalReading.__table__, "user_id", "measured_at"),
+}
+
+# Arrow IPC streaming format and Parquet: (media type, file extension)
+FORMATS = {
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+# Deleted rows are not exported, so their tombstone column is not either
+HIDDEN_COLUMNS = frozenset({"deleted_at"})
+
+
+def export_columns(dataset: str) -> List[str]:
+    table = EXPORTS[dataset][0]
+    return [column.name for column in table.columns if column.name not in HIDDEN_COLUMNS]
+
+
+def unknown_columns(dataset: str, names: List[str]) -> List[str]:
+    known = export_columns(dataset)
+    return [name for name in names if name not in known]
+
+
+def export_binds(
+    db: Session, dataset: str, patient_ids: List[int]
+) -> List[Tuple[object, List[int]]]:
+    """(engine, patients whose rows it holds) for each database to read from
+
+    Sharded tables are read shard by shard, each for its own patients;
+    otherwise the session picks the engine, a replica when it may.
+    """
+    table = EXPORTS[dataset][0]
+    shards = RoutingSession.shards
+    if shards is None or table.name not in SHARDED_TABLES:
+        return [(db.get_bind(clause=select(table)), patient_ids)]
+    by_shard = {}
+    for patient_id in patient_ids:
+        by_shard.setdefault(shards.locate(patient_id)[0], []).append(patient_id)
+    return [(shards.engines[name], ids) for name, ids in by_shard.items()]
+
+
+def export_query(
+    dataset: str,
+    columns: List[str],
+    patient_ids: List[int],
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+):
+    """Only the requested columns of the patients' rows within the date range"""
+    table, owner, date_column = EXPORTS[dataset]
+    query = select(*[table.c[name] for name in columns]).where(
+        table.c[owner].in_(patient_ids)
+    )
+    if "deleted_at" in table.c:
+        query = query.where(table.c.deleted_at.is_(None))
+    if since is not None:
+        query = query.where(table.c[date_column] >= since)
+    if until is not None:
+        query = query.where(table.c[date_column] < until)
+    return query
+
+
+def export_stream(
+    dataset: str,
+    fmt: str,
+    binds: List[Tuple[object, List[int]]],
+    columns: List[str],
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    batch_size: int = 10_000,
+) -> Iterator[bytes]:
+    """Encoded export, read through server-side cursors ``batch_size`` rows at a time
+
+    Raises ImportError up front, before anything is streamed, without pyarrow.
+    """
+    from app.utils.columnar import arrow_schema, record_batches, stream_batches
+
+    table = EXPORTS[dataset][0]
+    schema = arrow_schema([table.c[name] for name in columns])
+
+    def batches():
+        for bind, patient_ids in binds:
+            if not patient_ids:
+                continue
+            with bind.connect() as conn:
+                result = conn.execution_options(
+                    stream_results=True, yield_per=batch_size
+                ).execute(export_query(dataset, columns, patient_ids, since, until))
+                for batch in record_batches(schema, result.partitions()):
+                    EXPORT_ROWS.labels(dataset, fmt).inc(batch.num_rows)
+                    yield batch
+
+    return stream_batches(schema, batches(), fmt)
@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+from typing import List
+from sqlalchemy import DateTime, String, literal, select, union_all
+from sqlalchemy.orm import Session
+from config import settings
+from app.models.medications import Medication
+from app.models.prescription import Prescription
+from app.services.medication_services import parse_duration_days
+from app.utils.interactions import InteractionChecker
+from app.utils.metrics import INTERACTION_WARNINGS
+from app.utils.replicas import RoutingSession
+from app.utils.sharding import use_shard
+
+interactions = InteractionChecker(settings.INTERACTIONS_PATH)
+
+
+def active_drugs(db: Session, patient_id: int) -> List[str]:
+    """Names of the patient's current medications and unexpired prescriptions
+
+    One UNION query; two when medications are on the patient's shard.
+    Prescriptions without a readable duration count as active for
+    INTERACTIONS_OPEN_ENDED_DAYS.
+    """
+    medications = select(
+        Medication.name,
+        literal(None, String).label("duration"),
+        literal(None, DateTime).label("created_at"),
+    ).where(
+        Medication.user_id == patient_id,
+        Medication.deleted_at.is_(None),
+        Medication.remaining_tablets > 0,
+    )
+    prescriptions = select(
+        Prescription.medicine, Prescription.duration, Prescription.created_at
+    ).where(Prescription.patient_id == patient_id, Prescription.deleted_at.is_(None))
+
+    if RoutingSession.shards is None:
+        rows = db.execute(union_all(medications, prescriptions)).all()
+    else:
+        use_shard(db, patient_id)
+        rows = db.execute(medications).all() + db.execute(prescriptions).all()
+
+    now = datetime.utcnow()
+    names = []
+    for name, duration, created_at in rows:
+        if created_at is not None:
+            days = parse_duration_days(duration)
+            if days is None:
+                days = settings.INTERACTIONS_OPEN_ENDED_DAYS
+            if created_at + timedelta(days=days) < now:
+                continue
+        if name not in names:
+            names.append(name)
+    return names
+
+
+def check_interactions(new: List[str], existing: List[str] = ()) -> List[dict]:
+    """Warnings for ``new`` drugs, as InteractionWarning fields"""
+    warnings = []
+    for drug, other, severity, description in interactions.check(new, existing):
+        INTERACTION_WARNINGS.labels(severity).inc()
+        warnings.append(
+            {
+                "drug": drug,
+                "interacts_with": other,
+                "severity": severity,
+                "description": description or None,
+            }
+        )
+    return warnings
@@ -0,0 +1,74 @@
+import re
+from typing import List, Optional
+
+# Clock time used for each named dose slot in a prescription's timing
+TIMING_SLOTS = {
+    "morning": "08:00",
+    "breakfast": "08:00",
+    "noon": "12:00",
+    "lunch": "13:00",
+    "afternoon": "14:00",
+    "evening": "18:00",
+    "dinner": "20:00",
+    "night": "21:00",
+    "bedtime": "22:00",
+}
+
+DURATION_UNITS = {"day": 1, "week": 7, "month": 30}
+
+_TIME_RE = re.compile(r"^([01]?\d|2[0-3])[:.]([0-5]\d)$")
+_DURATION_RE = re.compile(r"(\d+)\s*(day|week|month)s?", re.IGNORECASE)
+
+
+def parse_timing(timing: str) -> List[str]:
+    """Turn "Morning, Evening" or "08:00 / 20:30" into sorted HH:MM times
+
+    Words without a known slot (e.g. "after meals") are ignored.
+    """
+    times = set()
+    for part in re.split(r"[,;/&+]|\band\b", timing.lower()):
+        part = part.strip()
+        match = _TIME_RE.match(part)
+        if match:
+            times.add(f"{int(match.group(1)):02d}:{match.group(2)}")
+            continue
+        for word in part.split():
+            if word in TIMING_SLOTS:
+                times.add(TIMING_SLOTS[word])
+    return sorted(times)
+
+
+def parse_duration_days(duration: Optional[str]) -> Optional[int]:
+    """Number of days in "7 days", "2 weeks" or "1 month"; None if unknown"""
+    if not duration:
+        return None
+    match = _DURATION_RE.search(duration)
+    if not match:
+        return None
+    return int(match.group(1)) * DURATION_UNITS[match.group(2).lower()]
+
+
+def medication_row(
+    user_id: int,
+    name: str,
+    dosage: str,
+    times: List[str],
+    duration: Optional[str],
+    total_tablets: Optional[int] = None,
+) -> Optional[dict]:
+    """Medication values for a prescribed drug, or None if the supply is unknown"""
+    if not times:
+        return None
+    if total_tablets is None:
+        days = parse_duration_days(duration)
+        if days is None:
+            return None
+        total_tablets = days * len(times)
+    return {
+        "user_id": user_id,
+        "name": name,
+        "dosage": dosage,
+        "time": times[0],
+        "total_tablets": total_tablets,
+        "remaining_tablets": total_tablets,
+    }
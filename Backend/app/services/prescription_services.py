@@ -0,0 +1,31 @@
+from typing import List
+from sqlalchemy.orm import Session
+from app.models.prescription import Prescription
+from app.services.cache_services import cached
+from app.services.user_services import get_user_name
+
+
+@cached(
+    "patient_prescriptions",
+    tags=lambda patient_id: [f"prescriptions:user:{patient_id}"],
+)
+def get_patient_prescriptions(db: Session, patient_id: int) -> List[dict]:
+    """A patient's prescriptions serialized for PrescriptionResponse"""
+    prescriptions = (
+        db.query(Prescription).filter(Prescription.patient_id == patient_id).all()
+    )
+    return [
+        {
+            "id": rx.id,
+            "patient_id": rx.patient_id,
+            "doctor_id": rx.doctor_id,
+            "medicine": rx.medicine,
+            "dosage": rx.dosage,
+            "timing": rx.timing,
+            "duration": rx.duration,
+            "notes": rx.notes,
+            "created_at": rx.created_at,
+            "doctor_name": get_user_name(db, rx.doctor_id),
+        }
+        for rx in prescriptions
+    ]
@@ -0,0 +1,522 @@
+import asyncio
+import functools
+import heapq
+import inspect
+import itertools
+import json
+import logging
+import multiprocessing
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, Iterable, Optional
+from config import settings
+from app.utils.metrics import JOB_SECONDS, JOB_WAIT_SECONDS, JOBS, QUEUE_DEPTH
+
+logger = logging.getLogger(__name__)
+
+# Lower runs first
+PRIORITY_HIGH = 0
+PRIORITY_DEFAULT = 5
+PRIORITY_LOW = 9
+
+EXECUTORS = ("async", "thread", "process")
+POLL_SECONDS = 1.0
+# Longest pause between claim attempts on an empty Redis queue
+CLAIM_POLL_SECONDS = 0.25
+
+
+@dataclass
+class Task:
+    """A registered job function and how it is run"""
+
+    fn: Callable
+    name: str
+    executor: str
+    priority: int
+    max_attempts: int
+
+
+TASKS: Dict[str, Task] = {}
+
+
+@dataclass
+class Job:
+    """One queued call of a task; stored as JSON so any backend can hold it"""
+
+    task: str
+    args: list = field(default_factory=list)
+    kwargs: dict = field(default_factory=dict)
+    priority: int = PRIORITY_DEFAULT
+    key: Optional[str] = None
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    attempts: int = 0
+    max_attempts: int = 3
+    enqueued_at: float = field(default_factory=time.time)
+    run_at: float = field(default_factory=time.time)  # runnable from
+    error: Optional[str] = None
+
+    def dumps(self) -> str:
+        return json.dumps(asdict(self))
+
+    @classmethod
+    def loads(cls, raw) -> "Job":
+        return cls(**json.loads(raw))
+
+
+class MemoryBackend:
+    """In-process queue; jobs still queued when the process exits are lost"""
+
+    def __init__(self, max_dead: int = 1_000):
+        self._ready: list = []  # (priority, seq, job)
+        self._delayed: list = []  # (run_at, seq, job)
+        self._keys: Dict[str, float] = {}  # job key -> expiry
+        self._running = 0
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self.dead: deque = deque(maxlen=max_dead)
+
+    def push(self, job: Job, key_ttl: float) -> bool:
+        # Round-trip through JSON: same contract as Redis, and the queued job
+        # does not share mutable arguments with the caller
+        job = Job.loads(job.dumps())
+        with self._cond:
+            now = time.time()
+            if job.key is not None:
+                if self._keys.get(job.key, 0) > now:
+                    return False
+                self._keys[job.key] = now + key_ttl
+            self._schedule(job)
+            self._cond.notify()
+        return True
+
+    def _schedule(self, job: Job) -> None:
+        if job.run_at > time.time():
+            heapq.heappush(self._delayed, (job.run_at, next(self._seq), job))
+        else:
+            heapq.heappush(self._ready, (job.priority, next(self._seq), job))
+
+    def _promote(self) -> None:
+        now = time.time()
+        while self._delayed and self._delayed[0][0] <= now:
+            job = heapq.heappop(self._delayed)[2]
+            heapq.heappush(self._ready, (job.priority, next(self._seq), job))
+
+    def pop(self, timeout: float) -> Optional[Job]:
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                self._promote()
+                if self._ready:
+                    self._running += 1
+                    return heapq.heappop(self._ready)[2]
+                wait = deadline - time.monotonic()
+                if wait <= 0:
+                    return None
+                if self._delayed:
+                    wait = min(wait, self._delayed[0][0] - time.time())
+                self._cond.wait(max(wait, 0.001))
+
+    def complete(self, job: Job) -> None:
+        with self._cond:
+            self._running -= 1
+
+    def retry(self, job: Job) -> None:
+        with self._cond:
+            self._running -= 1
+            self._schedule(job)
+            self._cond.notify()
+
+    def fail(self, job: Job) -> None:
+        with self._cond:
+            self._running -= 1
+            self.dead.append(job)
+            # A job that gave up can be enqueued again under its key
+            if job.key is not None:
+                self._keys.pop(job.key, None)
+
+    def depth(self) -> Dict[str, int]:
+        with self._cond:
+            return {
+                "ready": len(self._ready),
+                "delayed": len(self._delayed),
+                "running": self._running,
+            }
+
+
+class RedisBackend:
+    """Queue shared by every process through Redis
+
+    Ready jobs are a sorted set scored by (priority, enqueue time); jobs
+    waiting for a retry are scored by when they become runnable. A job is
+    claimed by moving it from ready to running in one transaction and is
+    leased for ``visibility_timeout`` seconds: if its worker dies, it
+    is queued again once the lease expires, so tasks must tolerate running
+    more than once.
+    """
+
+    def __init__(
+        self, url: str, prefix: str = "queue:", visibility_timeout: float = 600
+    ):
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+        self._prefix = prefix
+        self.visibility_timeout = visibility_timeout
+        self._next_sweep = 0.0
+
+    def _key(self, name: str) -> str:
+        return self._prefix + name
+
+    @staticmethod
+    def _ready_score(job: Job) -> float:
+        # Milliseconds need 41 bits; priorities stay exact below 2**53
+        return job.priority * 10**13 + int(job.run_at * 1000)
+
+    def push(self, job: Job, key_ttl: float) -> bool:
+        if job.key is not None:
+            claimed = self._redis.set(
+                self._key(f"key:{job.key}"), job.id, nx=True, ex=max(1, int(key_ttl))
+            )
+            if not claimed:
+                return False
+        pipe = self._redis.pipeline(transaction=True)
+        pipe.hset(self._key("jobs"), job.id, job.dumps())
+        self._schedule(pipe, job)
+        pipe.execute()
+        return True
+
+    def _schedule(self, pipe, job: Job) -> None:
+        if job.run_at > time.time():
+            pipe.zadd(self._key("delayed"), {job.id: job.run_at})
+        else:
+            pipe.zadd(self._key("ready"), {job.id: self._ready_score(job)})
+
+    def _move_due(self, source: str, now: float) -> None:
+        import redis
+
+        key = self._key(source)
+        for raw_id in self._redis.zrangebyscore(key, "-inf", now):
+            with self._redis.pipeline(transaction=True) as pipe:
+                try:
+                    # Only one process moves the job, and only if it is still
+                    # due: another may have moved it and a worker claimed it
+                    pipe.watch(key)
+                    score = pipe.zscore(key, raw_id)
+                    if score is None or score > now:
+                        continue
+                    raw = pipe.hget(self._key("jobs"), raw_id)
+                    pipe.multi()
+                    pipe.zrem(key, raw_id)
+                    if raw is not None:
+                        job = Job.loads(raw)
+                        pipe.zadd(self._key("ready"), {job.id: self._ready_score(job)})
+                    pipe.execute()
+                except redis.WatchError:
+                    continue
+
+    def _claim(self) -> Optional[Job]:
+        """Move the first ready job to running, in one transaction
+
+        A worker dying between taking a job off ``ready`` and leasing it
+        would otherwise lose the job. WATCH makes concurrent claims of the
+        same job retry instead of both succeeding.
+        """
+        import redis
+
+        ready, running = self._key("ready"), self._key("running")
+        with self._redis.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    pipe.watch(ready)
+                    first = pipe.zrange(ready, 0, 0)
+                    if not first:
+                        return None
+                    job_id = first[0]
+                    pipe.multi()
+                    pipe.zrem(ready, job_id)
+                    pipe.zadd(running, {job_id: time.time() + self.visibility_timeout})
+                    pipe.hget(self._key("jobs"), job_id)
+                    raw = pipe.execute()[2]
+                except redis.WatchError:
+                    continue
+                if raw is None:  # completed by a worker whose lease had expired
+                    self._redis.zrem(running, job_id)
+                    continue
+                return Job.loads(raw)
+
+    def pop(self, timeout: float) -> Optional[Job]:
+        deadline = time.monotonic() + timeout
+        wait = 0.01
+        while True:
+            now = time.time()
+            if now >= self._next_sweep:
+                self._next_sweep = now + POLL_SECONDS
+                self._move_due("delayed", now)
+                self._move_due("running", now)  # leases of workers that died
+
+            job = self._claim()
+            if job is not None:
+                return job
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            # Polling backs off while the queue stays empty
+            time.sleep(min(wait, remaining))
+            wait = min(wait * 2, CLAIM_POLL_SECONDS)
+
+    def complete(self, job: Job) -> None:
+        pipe = self._redis.pipeline(transaction=True)
+        pipe.zrem(self._key("running"), job.id)
+        pipe.hdel(self._key("jobs"), job.id)
+        pipe.execute()
+
+    def retry(self, job: Job) -> None:
+        pipe = self._redis.pipeline(transaction=True)
+        pipe.zrem(self._key("running"), job.id)
+        pipe.hset(self._key("jobs"), job.id, job.dumps())
+        self._schedule(pipe, job)
+        pipe.execute()
+
+    def fail(self, job: Job, max_dead: int = 1_000) -> None:
+        pipe = self._redis.pipeline(transaction=True)
+        pipe.zrem(self._key("running"), job.id)
+        pipe.hdel(self._key("jobs"), job.id)
+        pipe.lpush(self._key("dead"), job.dumps())
+        pipe.ltrim(self._key("dead"), 0, max_dead - 1)
+        if job.key is not None:
+            pipe.delete(self._key(f"key:{job.key}"))
+        pipe.execute()
+
+    def depth(self) -> Dict[str, int]:
+        pipe = self._redis.pipeline(transaction=False)
+        for name in ("ready", "delayed", "running"):
+            pipe.zcard(self._key(name))
+        ready, delayed, running = pipe.execute()
+        return {"ready": ready, "delayed": delayed, "running": running}
+
+
+def _build_backend():
+    if settings.QUEUE_BACKEND == "redis":
+        return RedisBackend(
+            settings.REDIS_URL, visibility_timeout=settings.QUEUE_VISIBILITY_TIMEOUT
+        )
+    return MemoryBackend()
+
+
+queue = _build_backend()
+
+
+def task(
+    name: Optional[str] = None,
+    executor: str = "thread",
+    priority: int = PRIORITY_DEFAULT,
+    max_attempts: Optional[int] = None,
+):
+    """Register a function as a background task and give it ``fn.enqueue``
+
+    Coroutine functions run on the worker's event loop. Other functions run
+    in a thread pool, or with ``executor="process"`` in a process pool for
+    CPU-bound work (the function must be defined at module level).
+    Arguments must be JSON-serializable.
+    """
+
+    def decorator(fn):
+        kind = "async" if inspect.iscoroutinefunction(fn) else executor
+        if kind not in EXECUTORS:
+            raise ValueError(f"Unknown executor {executor!r}")
+        task_name = name or f"{fn.__module__}.{fn.__qualname__}"
+        TASKS[task_name] = Task(
+            fn=fn,
+            name=task_name,
+            executor=kind,
+            priority=priority,
+            max_attempts=max_attempts or settings.QUEUE_MAX_ATTEMPTS,
+        )
+        fn.enqueue = functools.partial(enqueue, task_name)
+        return fn
+
+    return decorator
+
+
+def enqueue(
+    task_name: str,
+    args: Iterable = (),
+    kwargs: Optional[dict] = None,
+    key: Optional[str] = None,
+    priority: Optional[int] = None,
+    delay: float = 0,
+) -> Optional[str]:
+    """Queue a task call; returns the job id, or None if ``key`` is already queued
+
+    A job key makes enqueueing idempotent: further jobs with the same key
+    are dropped for QUEUE_KEY_TTL seconds, or until the job finally fails.
+    """
+    registered = TASKS[task_name]
+    now = time.time()
+    job = Job(
+        task=task_name,
+        args=list(args),
+        kwargs=dict(kwargs or {}),
+        priority=registered.priority if priority is None else priority,
+        key=key,
+        max_attempts=registered.max_attempts,
+        enqueued_at=now,
+        run_at=now + delay,
+    )
+    if not queue.push(job, settings.QUEUE_KEY_TTL):
+        JOBS.labels(task_name, "duplicate").inc()
+        return None
+    JOBS.labels(task_name, "enqueued").inc()
+    return job.id
+
+
+class Worker:
+    """Pulls jobs from a backend and runs up to ``concurrency`` at a time"""
+
+    def __init__(
+        self,
+        backend=None,
+        concurrency: int = 4,
+        threads: int = 4,
+        processes: int = 0,
+    ):
+        self.backend = backend or queue
+        self.concurrency = concurrency
+        self.processes = processes or None  # None: one per CPU
+        self._threads = ThreadPoolExecutor(threads, thread_name_prefix="job")
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        # Blocking pops get their own thread so they never hold up a job
+        self._poller = ThreadPoolExecutor(1, thread_name_prefix="job-poll")
+        self._running: set = set()
+        self._loop_task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._next_depth_report = 0.0
+
+    def _processes(self) -> ProcessPoolExecutor:
+        if self._process_pool is None:
+            # Spawned, not forked: children must not inherit the parent's
+            # event loop, pooled database connections or threads
+            self._process_pool = ProcessPoolExecutor(
+                self.processes, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._process_pool
+
+    def start(self) -> None:
+        self._loop_task = asyncio.get_running_loop().create_task(self.run())
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(self.concurrency)
+        while not self._stopping:
+            await slots.acquire()
+            try:
+                job = await loop.run_in_executor(self._poller, self._poll)
+            except Exception:
+                logger.exception("Failed to fetch a job")
+                job = None
+                await asyncio.sleep(POLL_SECONDS)
+            if job is None:
+                slots.release()
+                continue
+            running = loop.create_task(self._execute(job))
+            self._running.add(running)
+            running.add_done_callback(self._running.discard)
+            running.add_done_callback(lambda _: slots.release())
+
+    def _poll(self) -> Optional[Job]:
+        job = self.backend.pop(POLL_SECONDS)
+        self._report_depth()
+        return job
+
+    def _report_depth(self) -> None:
+        now = time.monotonic()
+        if now < self._next_depth_report:
+            return
+        self._next_depth_report = now + POLL_SECONDS
+        try:
+            for state, count in self.backend.depth().items():
+                QUEUE_DEPTH.labels(state).set(count)
+        except Exception:
+            logger.warning("Failed to read queue depth", exc_info=True)
+
+    async def _execute(self, job: Job) -> None:
+        loop = asyncio.get_running_loop()
+        registered = TASKS.get(job.task)
+        if registered is None:
+            job.error = "unknown task"
+            logger.error("Dropping job %s for unknown task %s", job.id, job.task)
+            JOBS.labels(job.task, "failed").inc()
+            await asyncio.to_thread(self.backend.fail, job)
+            return
+
+        JOB_WAIT_SECONDS.labels(job.task).observe(max(0.0, time.time() - job.run_at))
+        job.attempts += 1
+        call = functools.partial(registered.fn, *job.args, **job.kwargs)
+        started = time.perf_counter()
+        try:
+            if registered.executor == "async":
+                await call()
+            elif registered.executor == "process":
+                await loop.run_in_executor(self._processes(), call)
+            else:
+                await loop.run_in_executor(self._threads, call)
+        except Exception as exc:
+            JOB_SECONDS.labels(job.task).observe(time.perf_counter() - started)
+            job.error = f"{type(exc).__name__}: {exc}"
+            if job.attempts < job.max_attempts:
+                # Exponential backoff with jitter so failed jobs do not retry
+                # in lockstep against a struggling dependency
+                delay = settings.QUEUE_RETRY_BACKOFF * 2 ** (job.attempts - 1)
+                job.run_at = time.time() + delay * random.uniform(0.5, 1.5)
+                logger.warning(
+                    "Job %s (%s) failed, retrying in %.1fs: %s",
+                    job.id, job.task, job.run_at - time.time(), job.error,
+                )
+                JOBS.labels(job.task, "retried").inc()
+                await asyncio.to_thread(self.backend.retry, job)
+            else:
+                logger.error(
+                    "Job %s (%s) failed after %d attempts",
+                    job.id, job.task, job.attempts, exc_info=True,
+                )
+                JOBS.labels(job.task, "failed").inc()
+                await asyncio.to_thread(self.backend.fail, job)
+            return
+
+        JOB_SECONDS.labels(job.task).observe(time.perf_counter() - started)
+        JOBS.labels(job.task, "succeeded").inc()
+        await asyncio.to_thread(self.backend.complete, job)
+
+    async def stop(self, timeout: float = 30) -> None:
+        """Stop taking jobs and give running ones ``timeout`` seconds to finish"""
+        self._stopping = True
+        if self._loop_task is not None:
+            # Finishes within one poll unless every slot is busy
+            done, _ = await asyncio.wait([self._loop_task], timeout=POLL_SECONDS * 2)
+            if not done:
+                self._loop_task.cancel()
+        if self._running:
+            _, pending = await asyncio.wait(self._running, timeout=timeout)
+            if pending:
+                logger.warning("%d jobs still running at shutdown", len(pending))
+        self._poller.shutdown(wait=False)
+        self._threads.shutdown(wait=False, cancel_futures=True)
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+
+
+def start_worker() -> Worker:
+    """Run jobs on the current event loop (the in-process memory queue)"""
+    worker = Worker(
+        queue,
+        concurrency=settings.QUEUE_CONCURRENCY,
+        threads=settings.QUEUE_THREADS,
+        processes=settings.QUEUE_PROCESSES,
+    )
+    worker.start()
+    return worker
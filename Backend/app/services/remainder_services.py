@@ -0,0 +1,18 @@
+from typing import List
+from app.models.reminder import ReminderType
+
+
+def medicine_reminder_rows(
+    user_id: int, medicine: str, dosage: str, times: List[str]
+) -> List[dict]:
+    """One active medicine reminder per dose time"""
+    return [
+        {
+            "user_id": user_id,
+            "type": ReminderType.MEDICINE,
+            "title": f"Take {medicine} ({dosage})"[:100],
+            "time": time,
+            "is_active": 1,
+        }
+        for time in times
+    ]
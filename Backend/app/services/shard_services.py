@@ -0,0 +1,187 @@
+import logging
+import time
+from datetime import datetime
+from typing import Dict, Iterator, Optional, Tuple
+from sqlalchemy import delete, func, insert, or_, select, update
+from database import Base
+from app.models.shard import ShardAssignment
+from app.services.cache_services import cache
+from app.utils import etag
+from app.utils.sharding import OWNER_COLUMNS, SHARDED_TABLES, HashRing, ShardRouter
+
+logger = logging.getLogger(__name__)
+
+directory = ShardAssignment.__table__
+
+
+def _owned(table, patient_id: int):
+    return or_(*(table.c[column] == patient_id for column in OWNER_COLUMNS[table.name]))
+
+
+def _tables() -> Iterator:
+    for name in sorted(SHARDED_TABLES):
+        yield Base.metadata.tables[name]
+
+
+def set_assignment(
+    router: ShardRouter,
+    patient_id: int,
+    shard: str,
+    moving_to: Optional[str] = None,
+    ring: Optional[HashRing] = None,
+) -> None:
+    """Record where a patient's rows are; no row when ``ring`` already says so"""
+    ring = ring or router.ring
+    with router.directory_bind.begin() as conn:
+        conn.execute(delete(directory).where(directory.c.patient_id == patient_id))
+        if moving_to is not None or shard != ring.shard_for(patient_id):
+            conn.execute(
+                insert(directory).values(
+                    patient_id=patient_id,
+                    shard=shard,
+                    moving_to=moving_to,
+                    updated_at=datetime.utcnow(),
+                )
+            )
+    router.invalidate()
+
+
+def count_rows(engine, patient_id: int) -> Dict[str, int]:
+    """Live rows the patient owns on one shard, per table"""
+    counts = {}
+    with engine.connect() as conn:
+        for table in _tables():
+            query = select(func.count()).select_from(table)
+            query = query.where(_owned(table, patient_id))
+            if "deleted_at" in table.c:
+                query = query.where(table.c.deleted_at.is_(None))
+            counts[table.name] = conn.execute(query).scalar()
+    return counts
+
+
+def _copy_rows(source, target, patient_id: int, moved_at: datetime) -> Dict[str, int]:
+    """Copy the patient's rows into ``target`` in one transaction
+
+    Rows keep their ids, which are unique across shards (IdAllocator), and
+    count as changed at ``moved_at`` so delta syncs send them again.
+    Anything left on the target by an earlier move is replaced.
+    """
+    copied = {}
+    with source.connect() as src, target.begin() as dst:
+        for table in _tables():
+            owned = _owned(table, patient_id)
+            rows = [dict(row._mapping) for row in src.execute(select(table).where(owned))]
+            if "updated_at" in table.c:
+                for row in rows:
+                    row["updated_at"] = moved_at
+            dst.execute(delete(table).where(owned))
+            if rows:
+                dst.execute(insert(table), rows)
+            copied[table.name] = len(rows)
+    return copied
+
+
+def _retire_rows(engine, patient_id: int, moved_at: datetime) -> None:
+    """Tombstone the source copy; tables without tombstones are emptied
+
+    The tombstones carry the copies' ``moved_at``, so a delta sync that
+    sees one also sees the live row with its id and keeps that.
+    """
+    with engine.begin() as conn:
+        for table in _tables():
+            owned = _owned(table, patient_id)
+            if "deleted_at" not in table.c:
+                conn.execute(delete(table).where(owned))
+                continue
+            conn.execute(
+                update(table)
+                .where(owned, table.c.deleted_at.is_(None))
+                .values(deleted_at=moved_at, updated_at=moved_at)
+            )
+
+
+def move_patient(
+    router: ShardRouter,
+    patient_id: int,
+    target: str,
+    settle: Optional[float] = None,
+) -> Tuple[str, Dict[str, int]]:
+    """Move a patient's rows to another shard while the application runs
+
+    1. The directory marks the patient as moving; once every process has
+       seen that (``settle`` seconds, by default a directory refresh plus a
+       second for requests already past the check), their writes get 503s.
+       Reads carry on against the source.
+    2. The rows are copied to the target in one transaction.
+    3. The directory points at the target; after another ``settle`` no
+       process reads the source copy any more and it is tombstoned.
+       Processes drop ETags of the patient's lists when they see the new
+       directory entry (ShardRouter.on_change).
+
+    A failure before step 3 clears the mark and leaves the source intact.
+    Returns the source shard and the rows copied per table.
+    """
+    if target not in router.engines:
+        raise ValueError(f"Unknown shard {target!r}")
+    if settle is None:
+        settle = router.refresh_seconds + 1.0
+
+    router.invalidate()
+    source, moving_to = router.locate(patient_id)
+    if moving_to is not None:
+        raise RuntimeError(f"Patient {patient_id} is already moving to {moving_to}")
+    if source == target:
+        return source, {}
+    source_engine, target_engine = router.engines[source], router.engines[target]
+    if source_engine is target_engine:
+        # Two names for one database: only the directory changes
+        set_assignment(router, patient_id, target)
+        return source, {}
+
+    set_assignment(router, patient_id, source, moving_to=target)
+    try:
+        time.sleep(settle)
+        moved_at = datetime.utcnow()
+        copied = _copy_rows(source_engine, target_engine, patient_id, moved_at)
+        set_assignment(router, patient_id, target)
+    except BaseException:
+        set_assignment(router, patient_id, source)
+        raise
+    cache.invalidate_tags(f"{table.name}:user:{patient_id}" for table in _tables())
+    etag.bump_patients([patient_id])
+
+    time.sleep(settle)
+    _retire_rows(source_engine, patient_id, moved_at)
+    logger.info("Moved patient %d from %s to %s: %s", patient_id, source, target, copied)
+    return source, copied
+
+
+def pin_patients(router: ShardRouter, ring: HashRing, patient_ids) -> int:
+    """Record the current shard of every patient ``ring`` would place elsewhere
+
+    Run before deploying a new set of shards, so patients stay where their
+    rows are until rebalancing moves them.
+    """
+    pinned = []
+    for patient_id in patient_ids:
+        shard, moving_to = router.locate(patient_id)
+        if moving_to is None and ring.shard_for(patient_id) != shard:
+            pinned.append(
+                {
+                    "patient_id": patient_id,
+                    "shard": shard,
+                    "moving_to": None,
+                    "updated_at": datetime.utcnow(),
+                }
+            )
+    for start in range(0, len(pinned), 1000):
+        chunk = pinned[start : start + 1000]
+        with router.directory_bind.begin() as conn:
+            conn.execute(
+                delete(directory).where(
+                    directory.c.patient_id.in_([row["patient_id"] for row in chunk])
+                )
+            )
+            conn.execute(insert(directory), chunk)
+    router.invalidate()
+    return len(pinned)
@@ -0,0 +1,209 @@
+import logging
+import threading
+from datetime import date, datetime
+from typing import Dict, List, Optional
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from config import settings
+from database import engine, table_binds
+from app.models.symptom_diary import SymptomDiary
+from app.models.symptom_tag import SymptomTag
+from app.services.queue_services import PRIORITY_LOW, task
+from app.utils.replicas import RoutingSession
+from app.utils.sharding import use_shard
+from app.utils.symptom_matrix import TagMatrix
+from app.utils.symptom_tags import symptom_tags
+
+logger = logging.getLogger(__name__)
+
+tags_table = SymptomTag.__table__
+diary_table = SymptomDiary.__table__
+
+
+class SymptomTagRegistry:
+    """In-process copy of the symptom_tags table, which only ever grows
+
+    Names or ids this process has not seen are looked up on the primary,
+    only those; unknown names are inserted there first (ON CONFLICT DO
+    NOTHING, so a name another process is adding is simply read back).
+    """
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._names: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def _merge(self, condition) -> None:
+        with engine.connect() as conn:
+            rows = conn.execute(
+                select(tags_table.c.id, tags_table.c.name).where(condition)
+            ).all()
+        for tag_id, name in rows:
+            self._ids[name] = tag_id
+            self._names[tag_id] = name
+
+    def ids(self, names: List[str], create: bool = True) -> List[int]:
+        """Tag ids for ``names``, in order; unknown names are created or skipped"""
+        if any(name not in self._ids for name in names):
+            with self._lock:
+                missing = [name for name in dict.fromkeys(names) if name not in self._ids]
+                if missing and create:
+                    if engine.dialect.name == "postgresql":
+                        statement = postgresql.insert(tags_table)
+                    else:
+                        statement = sqlite.insert(tags_table)
+                    now = datetime.utcnow()
+                    # In name order, so concurrent inserts lock index entries alike
+                    with engine.begin() as conn:
+                        conn.execute(
+                            statement.on_conflict_do_nothing(index_elements=["name"]),
+                            [{"name": name, "created_at": now} for name in sorted(missing)],
+                        )
+                if missing:
+                    self._merge(tags_table.c.name.in_(missing))
+        return [self._ids[name] for name in names if name in self._ids]
+
+    def names(self, tag_ids) -> Dict[int, str]:
+        if any(tag_id not in self._names for tag_id in tag_ids):
+            with self._lock:
+                missing = {tag_id for tag_id in tag_ids if tag_id not in self._names}
+                if missing:
+                    self._merge(tags_table.c.id.in_(missing))
+        return {tag_id: self._names.get(tag_id, str(tag_id)) for tag_id in tag_ids}
+
+
+tag_registry = SymptomTagRegistry()
+
+
+def tag_ids_for(symptoms: str) -> List[int]:
+    return tag_registry.ids(symptom_tags(symptoms))
+
+
+def load_matrix(db: Session, patient_ids: List[int], since: datetime) -> TagMatrix:
+    """Tag matrix of the patients' diary entries dated ``since`` or later
+
+    Entries not tagged yet (before the backfill reached them) are tagged
+    from their text on the fly, without creating new tags.
+    """
+
+    def entries(session: Session) -> list:
+        return session.execute(
+            select(
+                SymptomDiary.date,
+                SymptomDiary.severity,
+                SymptomDiary.tag_ids,
+                SymptomDiary.symptoms,
+            ).where(
+                SymptomDiary.user_id.in_(patient_ids),
+                SymptomDiary.date >= since,
+                SymptomDiary.deleted_at.is_(None),
+            )
+        ).all()
+
+    shards = RoutingSession.shards
+    if shards is not None and len(patient_ids) > 1:
+        rows = shards.scatter(entries)
+    else:
+        if patient_ids:
+            use_shard(db, patient_ids[0])
+        rows = entries(db) if patient_ids else []
+
+    matrix_rows = []
+    for moment, severity, tag_ids, symptoms in rows:
+        if tag_ids is None:
+            tag_ids = tag_registry.ids(symptom_tags(symptoms), create=False)
+        matrix_rows.append((moment, severity, tag_ids))
+    matrix_rows.sort(key=lambda row: row[0])
+    return TagMatrix(matrix_rows)
+
+
+def co_occurrence(matrix: TagMatrix, tag: str, limit: int) -> dict:
+    tag_id = next(iter(tag_registry.ids(symptom_tags(tag)[:1], create=False)), None)
+    if tag_id is None:
+        return {"tag": tag, "entries": 0, "co_occurring": []}
+    counts = sorted(matrix.co_occurrence(tag_id).items(), key=lambda item: -item[1])[:limit]
+    names = tag_registry.names([tag_id] + [other for other, _ in counts])
+    return {
+        "tag": names[tag_id],
+        "entries": matrix.count(tag_id),
+        "co_occurring": [{"tag": names[other], "count": count} for other, count in counts],
+    }
+
+
+def top_tags(matrix: TagMatrix, limit: int) -> List[int]:
+    return sorted(matrix.tags, key=lambda tag_id: -matrix.count(tag_id))[:limit]
+
+
+def trends(matrix: TagMatrix, tags: Optional[List[str]], period: str, limit: int) -> dict:
+    """Entries per period for each tag (the most frequent ones by default)"""
+    if tags:
+        tag_ids = tag_registry.ids(symptom_tags(", ".join(tags)), create=False)
+    else:
+        tag_ids = top_tags(matrix, limit)
+    names = tag_registry.names(tag_ids)
+    return {
+        "period": period,
+        "points": [
+            {
+                "start": start,
+                "entries": mask.bit_count(),
+                "counts": {names[tag_id]: matrix.count(tag_id, mask) for tag_id in tag_ids},
+            }
+            for start, mask in matrix.periods(period)
+        ],
+    }
+
+
+def severity_correlations(matrix: TagMatrix, limit: int) -> List[dict]:
+    tag_ids = top_tags(matrix, limit)
+    names = tag_registry.names(tag_ids)
+    return [dict(matrix.severity_stats(tag_id), tag=names[tag_id]) for tag_id in tag_ids]
+
+
+def tag_column(bind, batch_size: int = 1000) -> int:
+    """Set tag_ids on untagged diary entries, one batch per transaction
+
+    updated_at is left alone: the entries did not change for their owners.
+    """
+    set_tags = (
+        update(diary_table)
+        .where(diary_table.c.id == bindparam("row_id"))
+        .values(tag_ids=bindparam("new_tag_ids"), updated_at=diary_table.c.updated_at)
+    )
+    tagged = 0
+    last_id = 0
+    while True:
+        with bind.connect() as conn:
+            rows = conn.execute(
+                select(diary_table.c.id, diary_table.c.symptoms)
+                .where(diary_table.c.id > last_id, diary_table.c.tag_ids.is_(None))
+                .order_by(diary_table.c.id)
+                .limit(batch_size)
+            ).all()
+        # New tags are created on the primary before this batch is written
+        changes = [
+            {"row_id": row_id, "new_tag_ids": tag_ids_for(symptoms or "")}
+            for row_id, symptoms in rows
+        ]
+        if changes:
+            with bind.begin() as conn:
+                conn.execute(set_tags, changes)
+        tagged += len(rows)
+        if len(rows) < batch_size:
+            return tagged
+        last_id = rows[-1][0]
+
+
+@task("symptoms.tag_entries", priority=PRIORITY_LOW)
+def tag_entries() -> None:
+    """Backfill tag_ids on diary entries written before tagging, shards included"""
+    for bind in table_binds(diary_table.name):
+        tagged = tag_column(bind, settings.SYMPTOM_TAG_BATCH_SIZE)
+        if tagged:
+            logger.info("Tagged %d symptom diary entries on %s", tagged, bind.url)
+
+
+def schedule_tagging() -> None:
+    """Queue today's backfill; a no-op if it is already queued"""
+    tag_entries.enqueue(key=f"symptoms.tag_entries:{date.today()}")
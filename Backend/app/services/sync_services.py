@@ -0,0 +1,142 @@
+import logging
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional
+from sqlalchemy import delete, or_, select
+from sqlalchemy.orm import Session
+from config import settings
+from database import table_binds
+from app.models.appointment import Appointment
+from app.models.medications import Medication
+from app.models.message import Message
+from app.models.prescription import Prescription
+from app.models.reminder import Reminder
+from app.models.symptom_diary import SymptomDiary
+from app.services.queue_services import PRIORITY_LOW, task
+from app.utils.metrics import SYNC_ROWS
+from app.utils.replicas import RoutingSession
+
+logger = logging.getLogger(__name__)
+
+# Response field -> (model, columns naming the rows a user may sync)
+COLLECTIONS = {
+    "medications": (Medication, ("user_id",)),
+    "reminders": (Reminder, ("user_id",)),
+    "symptom_entries": (SymptomDiary, ("user_id",)),
+    "appointments": (Appointment, ("patient_id", "doctor_id")),
+    "prescriptions": (Prescription, ("patient_id", "doctor_id")),
+    "messages": (Message, ("sender_id", "receiver_id")),
+}
+
+EPOCH = datetime(1970, 1, 1)
+
+
+class InvalidSyncToken(ValueError):
+    pass
+
+
+def encode_token(moment: datetime) -> str:
+    return str((moment - EPOCH) // timedelta(microseconds=1))
+
+
+def decode_token(token: str) -> datetime:
+    try:
+        moment = EPOCH + timedelta(microseconds=int(token))
+    except (ValueError, OverflowError):
+        raise InvalidSyncToken(token)
+    if moment > datetime.utcnow():
+        raise InvalidSyncToken(token)
+    return moment
+
+
+def _changed_rows(db: Session, model, owners, user_id: int, since: Optional[datetime]):
+    query = (
+        db.query(model)
+        .execution_options(include_deleted=True)
+        .filter(or_(*(getattr(model, owner) == user_id for owner in owners)))
+    )
+    if since is None:
+        query = query.filter(model.deleted_at.is_(None))
+    else:
+        query = query.filter(model.updated_at > since)
+    return query.order_by(model.updated_at, model.id).all()
+
+
+def collect_changes(db: Session, user, since: Optional[datetime]) -> dict:
+    """Rows of every synced collection changed after ``since`` (all rows if None)
+
+    The token returned lags the server clock by SYNC_SAFETY_SECONDS, so a
+    write whose transaction was still open during this read is sent next
+    time; clients apply changes by id, so a row sent twice is harmless.
+    """
+    token = datetime.utcnow() - timedelta(seconds=settings.SYNC_SAFETY_SECONDS)
+    result = {"token": encode_token(token), "reset": since is None}
+    shards = RoutingSession.shards
+    for name, (model, owners) in COLLECTIONS.items():
+        if shards is not None and model is Message and user.role != "patient":
+            # A doctor's messages are on the shards of their patients
+            rows = shards.scatter(
+                lambda shard_db: _changed_rows(shard_db, model, owners, user.id, since)
+            )
+        else:
+            rows = _changed_rows(db, model, owners, user.id, since)
+
+        # Shards can both hold a row while it is moved, or after, as the
+        # source's tombstone; ids are unique across shards and the live copy wins
+        live = {}
+        for row in rows:
+            if row.deleted_at is None:
+                live.setdefault(row.id, row)
+        upserted = list(live.values())
+        tombstones = [row.id for row in rows if row.deleted_at is not None]
+        deleted = [row_id for row_id in dict.fromkeys(tombstones) if row_id not in live]
+        SYNC_ROWS.labels(name, "upserted").inc(len(upserted))
+        SYNC_ROWS.labels(name, "deleted").inc(len(deleted))
+        result[name] = {"upserted": upserted, "deleted": deleted}
+    return result
+
+
+def tombstone_cutoff() -> datetime:
+    """Tombstones older than this are purged; older tokens need a full sync"""
+    return datetime.utcnow() - timedelta(days=settings.SYNC_TOMBSTONE_DAYS)
+
+
+def purge_tombstones(before: datetime, batch_size: int = 5000) -> Dict[str, int]:
+    """Delete rows soft-deleted before ``before``, in batches"""
+    purged = {}
+    for name, (model, _) in COLLECTIONS.items():
+        table = model.__table__
+        purged[name] = 0
+        for bind in table_binds(table.name):
+            while True:
+                batch = (
+                    select(table.c.id)
+                    .where(table.c.deleted_at < before)
+                    .limit(batch_size)
+                    .scalar_subquery()
+                )
+                with bind.begin() as conn:
+                    count = conn.execute(delete(table).where(table.c.id.in_(batch))).rowcount
+                purged[name] += count
+                if count < batch_size:
+                    break
+        SYNC_ROWS.labels(name, "purged").inc(purged[name])
+    return purged
+
+
+@task("sync.compact_tombstones", priority=PRIORITY_LOW)
+def compact_tombstones() -> None:
+    purged = purge_tombstones(tombstone_cutoff())
+    logger.info("Purged tombstones: %s", purged)
+    schedule_compaction()
+
+
+def schedule_compaction() -> None:
+    """Queue tomorrow's compaction; a no-op if it is already queued"""
+    tomorrow = date.today() + timedelta(days=1)
+    run_at = datetime.combine(tomorrow, datetime.min.time()) + timedelta(
+        hours=settings.SYNC_COMPACT_HOUR
+    )
+    compact_tombstones.enqueue(
+        key=f"sync.compact_tombstones:{tomorrow}",
+        delay=max(0.0, (run_at - datetime.now()).total_seconds()),
+    )
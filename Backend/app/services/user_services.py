@@ -0,0 +1,26 @@
+from typing import List, Optional
+from sqlalchemy.orm import Session
+from app.models.user import User
+from app.services.cache_services import cached
+
+
+@cached("user_name", tags=lambda user_id: [f"users:{user_id}"])
+def get_user_name(db: Session, user_id: int) -> Optional[str]:
+    """Display name of a user"""
+    row = db.query(User.name).filter(User.id == user_id).first()
+    return row[0] if row else None
+
+
+@cached("doctors", tags=lambda: ["users:doctors"])
+def get_doctors(db: Session) -> List[dict]:
+    """All doctors as plain dicts, ordered by name"""
+    rows = (
+        db.query(User.id, User.name, User.email, User.created_at)
+        .filter(User.role == "doctor")
+        .order_by(User.name)
+        .all()
+    )
+    return [
+        {"id": r.id, "name": r.name, "email": r.email, "created_at": r.created_at}
+        for r in rows
+    ]
@@ -0,0 +1,272 @@
+import csv
+import io
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Tuple
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from config import settings
+from database import global_id
+from app.models.vital import VitalKind, VitalReading, VitalRollup
+from app.utils.metrics import VITAL_READINGS
+
+readings_table = VitalReading.__table__
+rollups_table = VitalRollup.__table__
+new_reading_id = global_id(readings_table.name)  # None without shards
+
+# Plausible values per kind; anything outside is a device or entry error
+VITAL_RANGES = {
+    VitalKind.HEART_RATE: (20, 250),
+    VitalKind.SYSTOLIC_BP: (50, 260),
+    VitalKind.DIASTOLIC_BP: (30, 160),
+    VitalKind.GLUCOSE: (10, 800),
+    VitalKind.SPO2: (50, 100),
+    VitalKind.TEMPERATURE: (30, 45),
+    VitalKind.RESPIRATORY_RATE: (4, 60),
+    VitalKind.WEIGHT: (1, 400),
+}
+
+BUCKETS = ("hour", "day")
+RESOLUTIONS = ("auto", "raw") + BUCKETS
+
+READING_KEY = ("user_id", "device_id", "kind", "measured_at")
+ROLLUP_KEY = ("user_id", "kind", "bucket", "bucket_start")
+
+# Readings are staged with COPY on PostgreSQL, then inserted unless stored
+# already. With shards their ids are allocated up front, as for every
+# sharded table; otherwise the table's own sequence numbers them.
+COPY_STAGING_SQL = (
+    "CREATE TEMP TABLE vital_staging (id bigint, kind varchar(32), "
+    "measured_at timestamp, value double precision) ON COMMIT DROP"
+)
+INSERT_STAGED_SQL = text(
+    "INSERT INTO vital_readings "
+    "(id, user_id, device_id, kind, measured_at, value, created_at) "
+    "SELECT COALESCE(id, nextval(pg_get_serial_sequence('vital_readings', 'id'))), "
+    ":user_id, :device_id, kind, measured_at, value, :now FROM vital_staging "
+    "ON CONFLICT (user_id, device_id, kind, measured_at) DO NOTHING "
+    "RETURNING kind, measured_at, value"
+)
+
+
+def bucket_start(moment: datetime, bucket: str) -> datetime:
+    """Start of the UTC hour or day holding ``moment``"""
+    if bucket == "day":
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def to_utc(moment: datetime) -> datetime:
+    """Naive UTC, as stored"""
+    if moment.tzinfo is None:
+        return moment
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def validate_readings(readings, now: datetime) -> Tuple[List[dict], List[dict]]:
+    """(rows to store, rejections) for a batch; repeats within it are stored once"""
+    latest = now + timedelta(seconds=settings.VITALS_MAX_CLOCK_SKEW_SECONDS)
+    rows = []
+    rejected = []
+    seen = set()
+    for index, reading in enumerate(readings):
+        low, high = VITAL_RANGES[reading.kind]
+        measured_at = to_utc(reading.measured_at)
+        # NaN fails the comparison too
+        if not low <= reading.value <= high:
+            rejected.append(
+                {"index": index, "detail": f"{reading.kind.value} must be {low}-{high}"}
+            )
+        elif measured_at > latest:
+            rejected.append({"index": index, "detail": "measured_at is in the future"})
+        elif (reading.kind, measured_at) not in seen:
+            seen.add((reading.kind, measured_at))
+            rows.append(
+                {"kind": reading.kind.value, "measured_at": measured_at, "value": reading.value}
+            )
+    return rows, rejected
+
+
+def _copy_new(conn, user_id: int, device_id: str, rows: List[dict], now: datetime) -> list:
+    buf = io.StringIO()
+    writer = csv.writer(buf, delimiter="\t", lineterminator="\n")
+    for row in rows:
+        writer.writerow(
+            [
+                new_reading_id() if new_reading_id else "",
+                row["kind"],
+                row["measured_at"].isoformat(),
+                repr(row["value"]),
+            ]
+        )
+    buf.seek(0)
+    conn.exec_driver_sql(COPY_STAGING_SQL)
+    with conn.connection.cursor() as cur:
+        cur.copy_expert(
+            "COPY vital_staging (id, kind, measured_at, value) FROM STDIN "
+            "WITH (FORMAT csv, DELIMITER E'\\t')",
+            buf,
+        )
+    return conn.execute(
+        INSERT_STAGED_SQL, {"user_id": user_id, "device_id": device_id, "now": now}
+    ).all()
+
+
+def insert_new(conn, user_id: int, device_id: str, rows: List[dict], now: datetime) -> list:
+    """Store readings the device has not sent before; (kind, measured_at, value) of each
+
+    PostgreSQL gets them through COPY; elsewhere one multi-row INSERT per
+    page of rows. Either way readings already stored are skipped by the
+    unique index, so concurrent or retried uploads are counted once.
+    """
+    if conn.dialect.name == "postgresql":
+        return _copy_new(conn, user_id, device_id, rows, now)
+    statement = (
+        sqlite.insert(readings_table)
+        .on_conflict_do_nothing(index_elements=READING_KEY)
+        .returning(readings_table.c.kind, readings_table.c.measured_at, readings_table.c.value)
+    )
+    values = [dict(row, user_id=user_id, device_id=device_id, created_at=now) for row in rows]
+    return conn.execute(statement, values).all()
+
+
+def rollup_rows(user_id: int, readings) -> List[dict]:
+    """Hourly and daily count/sum/min/max of new readings, in key order"""
+    buckets: Dict[tuple, list] = {}
+    for kind, measured_at, value in readings:
+        for bucket in BUCKETS:
+            key = (kind, bucket, bucket_start(measured_at, bucket))
+            stats = buckets.get(key)
+            if stats is None:
+                buckets[key] = [1, value, value, value]
+            else:
+                stats[0] += 1
+                stats[1] += value
+                stats[2] = min(stats[2], value)
+                stats[3] = max(stats[3], value)
+    return [
+        {
+            "user_id": user_id,
+            "kind": kind,
+            "bucket": bucket,
+            "bucket_start": start,
+            "count": count,
+            "total": total,
+            "min_value": low,
+            "max_value": high,
+        }
+        for (kind, bucket, start), (count, total, low, high) in sorted(buckets.items())
+    ]
+
+
+def merge_rollups(conn, rows: List[dict]) -> None:
+    """Add new readings' stats into the stored rollups
+
+    Rows come sorted by key so concurrent uploads lock buckets in the same
+    order instead of deadlocking.
+    """
+    if conn.dialect.name == "postgresql":
+        dialect_insert, least, greatest = postgresql.insert, func.least, func.greatest
+    else:
+        dialect_insert, least, greatest = sqlite.insert, func.min, func.max
+    statement = dialect_insert(rollups_table)
+    current, new = rollups_table.c, statement.excluded
+    statement = statement.on_conflict_do_update(
+        index_elements=ROLLUP_KEY,
+        set_={
+            "count": current["count"] + new["count"],
+            "total": current.total + new.total,
+            "min_value": least(current.min_value, new.min_value),
+            "max_value": greatest(current.max_value, new.max_value),
+        },
+    )
+    conn.execute(statement, rows)
+
+
+def ingest_readings(db: Session, user_id: int, device_id: str, readings) -> dict:
+    """Validate and store a device's batch, updating rollups in the same transaction"""
+    now = datetime.utcnow()
+    rows, rejected = validate_readings(readings, now)
+    inserted = []
+    if rows:
+        conn = db.connection(
+            bind_arguments={"mapper": VitalReading.__mapper__, "clause": insert(readings_table)}
+        )
+        inserted = insert_new(conn, user_id, device_id, rows, now)
+        if inserted:
+            merge_rollups(conn, rollup_rows(user_id, inserted))
+        db.commit()
+
+    duplicates = len(readings) - len(rejected) - len(inserted)
+    VITAL_READINGS.labels("accepted").inc(len(inserted))
+    VITAL_READINGS.labels("duplicate").inc(duplicates)
+    VITAL_READINGS.labels("rejected").inc(len(rejected))
+    return {"accepted": len(inserted), "duplicates": duplicates, "rejected": rejected}
+
+
+def choose_resolution(start: datetime, end: datetime) -> str:
+    window = end - start
+    if window <= timedelta(hours=settings.VITALS_RAW_MAX_HOURS):
+        return "raw"
+    if window <= timedelta(days=settings.VITALS_HOURLY_MAX_DAYS):
+        return "hour"
+    return "day"
+
+
+def vital_series(
+    db: Session,
+    user_id: int,
+    kind: VitalKind,
+    start: datetime,
+    end: datetime,
+    resolution: str = "auto",
+) -> dict:
+    """Readings of one kind from ``start`` until ``end`` (naive UTC)
+
+    Long windows are answered from the rollups ("auto" picks by window
+    length); buckets are included from the one holding ``start``.
+    """
+    if resolution == "auto":
+        resolution = choose_resolution(start, end)
+
+    truncated = False
+    if resolution == "raw":
+        rows = db.execute(
+            select(VitalReading.measured_at, VitalReading.value)
+            .where(
+                VitalReading.user_id == user_id,
+                VitalReading.kind == kind.value,
+                VitalReading.measured_at >= start,
+                VitalReading.measured_at < end,
+            )
+            .order_by(VitalReading.measured_at)
+            .limit(settings.VITALS_MAX_POINTS + 1)
+        ).all()
+        truncated = len(rows) > settings.VITALS_MAX_POINTS
+        points = [
+            {"start": moment, "count": 1, "min": value, "max": value, "avg": value}
+            for moment, value in rows[: settings.VITALS_MAX_POINTS]
+        ]
+    else:
+        rows = db.execute(
+            select(
+                VitalRollup.bucket_start,
+                VitalRollup.count,
+                VitalRollup.total,
+                VitalRollup.min_value,
+                VitalRollup.max_value,
+            )
+            .where(
+                VitalRollup.user_id == user_id,
+                VitalRollup.kind == kind.value,
+                VitalRollup.bucket == resolution,
+                VitalRollup.bucket_start >= bucket_start(start, resolution),
+                VitalRollup.bucket_start < end,
+            )
+            .order_by(VitalRollup.bucket_start)
+        ).all()
+        points = [
+            {"start": moment, "count": count, "min": low, "max": high, "avg": total / count}
+            for moment, count, total, low, high in rows
+        ]
+    return {"kind": kind, "resolution": resolution, "points": points, "truncated": truncated}
@@ -0,0 +1,121 @@
+import json
+from typing import Callable, Dict, Optional
+from fastapi.responses import JSONResponse
+from config import settings
+from app.utils.metrics import ADMISSION_IN_FLIGHT, SHED_REQUESTS
+
+CRITICAL = "critical"
+DEFAULT = "default"
+BULK = "bulk"
+
+# (method or None for any, path prefix, priority); first match wins
+ROUTE_PRIORITIES = (
+    (None, "/health", CRITICAL),
+    (None, "/metrics", CRITICAL),
+    ("POST", "/api/auth/login", CRITICAL),
+    ("POST", "/api/health-records", BULK),  # file uploads
+    ("GET", "/api/doctors/export", BULK),  # cohort exports
+)
+
+# Fraction of ADMISSION_MAX_POOL_WAITERS at which each priority is shed, so
+# bulk work is turned away before interactive requests are
+POOL_WAITER_SHARE = {DEFAULT: 1.0, BULK: 0.5}
+
+BUSY_BODY = json.dumps({"detail": "Server is busy, please retry"}).encode()
+
+
+def _matches(path: str, prefix: str) -> bool:
+    return path == prefix or path.startswith(prefix.rstrip("/") + "/")
+
+
+def route_priority(method: str, path: str) -> str:
+    for rule_method, prefix, priority in ROUTE_PRIORITIES:
+        if (rule_method is None or rule_method == method) and _matches(path, prefix):
+            return priority
+    return DEFAULT
+
+
+def busy_headers() -> Dict[str, str]:
+    return {"Retry-After": str(settings.ADMISSION_RETRY_AFTER)}
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware that fails fast with 503 instead of queueing
+
+    A request is rejected when its priority already has its limit of
+    requests in flight, or when the database pool has too many threads
+    waiting for a connection; waiting longer would only make every request
+    slow. Critical routes (health, metrics, login) are always admitted.
+    Counters are per process and only touched on the event loop.
+    """
+
+    def __init__(
+        self,
+        app,
+        pool_waiters: Callable[[], int],
+        limits: Optional[Dict[str, int]] = None,
+        max_pool_waiters: Optional[int] = None,
+    ):
+        self.app = app
+        self.pool_waiters = pool_waiters
+        self.limits = limits or {
+            DEFAULT: settings.ADMISSION_MAX_IN_FLIGHT,
+            BULK: settings.ADMISSION_BULK_MAX_IN_FLIGHT,
+        }
+        if max_pool_waiters is None:
+            max_pool_waiters = settings.ADMISSION_MAX_POOL_WAITERS
+        self.max_pool_waiters = max_pool_waiters
+        self.in_flight = {priority: 0 for priority in self.limits}
+
+    def _shed_reason(self, priority: str) -> Optional[str]:
+        if self.in_flight[priority] >= self.limits[priority]:
+            return "in_flight"
+        threshold = self.max_pool_waiters * POOL_WAITER_SHARE.get(priority, 1.0)
+        if self.max_pool_waiters and self.pool_waiters() >= threshold:
+            return "pool_waiters"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        priority = route_priority(scope["method"], scope["path"])
+        if priority == CRITICAL:
+            await self.app(scope, receive, send)
+            return
+
+        reason = self._shed_reason(priority)
+        if reason is not None:
+            SHED_REQUESTS.labels(priority, reason).inc()
+            await _send_busy(send)
+            return
+
+        self.in_flight[priority] += 1
+        ADMISSION_IN_FLIGHT.labels(priority).inc()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight[priority] -= 1
+            ADMISSION_IN_FLIGHT.labels(priority).dec()
+
+
+async def _send_busy(send) -> None:
+    headers = [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(BUSY_BODY)).encode()),
+    ]
+    for name, value in busy_headers().items():
+        headers.append((name.lower().encode(), value.encode()))
+    await send({"type": "http.response.start", "status": 503, "headers": headers})
+    await send({"type": "http.response.body", "body": BUSY_BODY})
+
+
+async def pool_timeout_handler(request, exc):
+    """Pool checkout timed out (DB_POOL_TIMEOUT): 503 rather than a 500"""
+    priority = route_priority(request.method, request.url.path)
+    SHED_REQUESTS.labels(priority, "pool_timeout").inc()
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server is busy, please retry"},
+        headers=busy_headers(),
+    )
@@ -0,0 +1,86 @@
+from typing import Iterable, Iterator, List, Sequence
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import JSON, Boolean, Date, DateTime, Float, Integer, Numeric
+
+def arrow_type(column) -> pa.DataType:
+    """Arrow type of a table column; JSON columns are lists of ids (tag_ids)"""
+    kind = column.type
+    if isinstance(kind, Boolean):
+        return pa.bool_()
+    if isinstance(kind, Integer):
+        return pa.int64()
+    if isinstance(kind, (Float, Numeric)):
+        return pa.float64()
+    if isinstance(kind, DateTime):
+        return pa.timestamp("us")
+    if isinstance(kind, Date):
+        return pa.date32()
+    if isinstance(kind, JSON):
+        return pa.list_(pa.int64())
+    return pa.string()
+
+
+def arrow_schema(columns: Sequence) -> pa.Schema:
+    return pa.schema([pa.field(column.name, arrow_type(column)) for column in columns])
+
+
+def record_batches(schema: pa.Schema, partitions: Iterable[Sequence]) -> Iterator[pa.RecordBatch]:
+    """One record batch per partition of result rows, built column by column"""
+    for rows in partitions:
+        values = list(zip(*rows)) if rows else [()] * len(schema)
+        yield pa.RecordBatch.from_arrays(
+            [pa.array(column, type=field.type) for column, field in zip(values, schema)],
+            schema=schema,
+        )
+
+
+class _ChunkSink:
+    """Write-only file object whose contents are taken as they are written"""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def take(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def stream_batches(
+    schema: pa.Schema, batches: Iterable[pa.RecordBatch], fmt: str
+) -> Iterator[bytes]:
+    """Encode batches as an Arrow IPC stream or a Parquet file, chunk by chunk
+
+    Each batch is sent as soon as it is encoded (one Parquet row group per
+    batch), so memory holds one batch whatever the export's size.
+    """
+    sink = _ChunkSink()
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+    for batch in batches:
+        writer.write_batch(batch)
+        chunk = sink.take()
+        if chunk:
+            yield chunk
+    writer.close()
+    yield sink.take()
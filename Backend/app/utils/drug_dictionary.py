@@ -0,0 +1,164 @@
+import bisect
+import csv
+import re
+from array import array
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+# Strengths and dosage forms are not part of a drug's identity
+_STRENGTH_RE = re.compile(r"\b\d+(?:\.\d+)?\s*(?:mg|mcg|µg|g|ml|iu|units?|%)(?=\W|$)")
+_FORM_WORDS = frozenset(
+    {"tab", "tabs", "tablet", "tablets", "cap", "caps", "capsule", "capsules",
+     "syrup", "injection", "inj", "cream", "ointment", "gel", "drops", "spray",
+     "patch", "inhaler", "solution", "suspension"}
+)
+_NON_WORD_RE = re.compile(r"[^a-z0-9]+")
+
+# Queries shorter than this only match as typed
+FUZZY_MIN_LENGTH = 4
+# Names shorter than this are only normalized on an exact match
+FUZZY_MATCH_MIN_LENGTH = 5
+
+_LAST_CHAR = "\uffff"
+
+
+def normalize_drug_name(name: str) -> str:
+    """"Amoxicillin 500mg Capsules" -> "amoxicillin" """
+    name = _STRENGTH_RE.sub(" ", name.lower())
+    words = _NON_WORD_RE.sub(" ", name).split()
+    return " ".join(word for word in words if word not in _FORM_WORDS)
+
+
+class DrugDictionary:
+    """Canonical drugs and the names they go by, for typeahead and matching
+
+    Every normalized name and synonym is one entry of a sorted list, with
+    the drug it belongs to in a parallel array; the entries starting with a
+    prefix are a contiguous run found by bisection, so the list doubles as
+    a prefix tree without a node per character. Fuzzy matching walks that
+    tree, so it only tries edits that lead to an existing name.
+    """
+
+    def __init__(self, ids: List[str], names: List[str], keys: List[str], drugs: array):
+        self.ids = ids
+        self.names = names
+        self.keys = keys
+        self.drugs = drugs
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, rows: Iterable[Tuple[str, str, List[str]]]) -> "DrugDictionary":
+        """Index (id, name, synonyms) rows"""
+        ids, names, entries = [], [], set()
+        for drug_id, name, synonyms in rows:
+            index = len(ids)
+            ids.append(drug_id)
+            names.append(name)
+            for alias in [name, *synonyms]:
+                key = normalize_drug_name(alias)
+                if key:
+                    entries.add((key, index))
+        entries = sorted(entries)
+        return cls(ids, names, [key for key, _ in entries], array("I", (d for _, d in entries)))
+
+    @classmethod
+    def from_csv(cls, path: str) -> "DrugDictionary":
+        """Columns id, name and optionally synonyms separated by "|" """
+        with open(path, newline="", encoding="utf-8") as f:
+            return cls.build(
+                (
+                    row["id"].strip(),
+                    row["name"].strip(),
+                    [s for s in (row.get("synonyms") or "").split("|") if s.strip()],
+                )
+                for row in csv.DictReader(f)
+            )
+
+    def _range(self, prefix: str) -> Tuple[int, int]:
+        keys = self.keys
+        lo = bisect.bisect_left(keys, prefix)
+        return lo, bisect.bisect_left(keys, prefix + _LAST_CHAR, lo)
+
+    def _next_chars(self, prefix: str, lo: int, hi: int) -> Iterator[str]:
+        """Characters that follow ``prefix`` in keys[lo:hi]: the node's children"""
+        keys, n = self.keys, len(prefix)
+        if lo < hi and len(keys[lo]) == n:
+            lo += 1
+        while lo < hi:
+            char = keys[lo][n]
+            yield char
+            lo = bisect.bisect_left(keys, prefix + chr(ord(char) + 1), lo, hi)
+
+    def _edits(self, word: str) -> Iterator[str]:
+        """Strings one deletion, transposition, substitution or insertion from
+        ``word``, skipping edits after a prefix no key starts with"""
+        for i in range(len(word) + 1):
+            left, right = word[:i], word[i:]
+            lo, hi = self._range(left)
+            if lo == hi:
+                return
+            if right:
+                yield left + right[1:]
+            if len(right) > 1:
+                yield left + right[1] + right[0] + right[2:]
+            for char in self._next_chars(left, lo, hi):
+                if right and char != right[0]:
+                    yield left + char + right[1:]
+                yield left + char + right
+
+    def _collect(self, prefix: str, limit: int, seen: set, found: list) -> None:
+        keys, i = self.keys, bisect.bisect_left(self.keys, prefix)
+        while i < len(keys) and len(found) < limit and keys[i].startswith(prefix):
+            drug = self.drugs[i]
+            if drug not in seen:
+                seen.add(drug)
+                found.append((drug, keys[i]))
+            i += 1
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[int, str]]:
+        """(drug index, matched name) for names starting with ``query``
+
+        Exact prefix matches come first, then names whose prefix is one edit
+        away from the query (a typo, missing or swapped letter).
+        """
+        prefix = normalize_drug_name(query)
+        if not prefix:
+            return []
+        seen: set = set()
+        found: list = []
+        self._collect(prefix, limit, seen, found)
+        if len(found) < limit and len(prefix) >= FUZZY_MIN_LENGTH:
+            tried = {prefix}
+            for variant in self._edits(prefix):
+                if variant and variant not in tried:
+                    tried.add(variant)
+                    self._collect(variant, limit, seen, found)
+                    if len(found) >= limit:
+                        break
+        return found
+
+    def _exact(self, key: str) -> Optional[int]:
+        i = bisect.bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            return self.drugs[i]
+        return None
+
+    def match(self, text: str) -> Optional[int]:
+        """The drug a free-text name refers to, or None if unsure
+
+        Tries the whole normalized name, then its leading words
+        ("paracetamol extra" -> "paracetamol"), then names one edit away
+        when they all belong to the same drug.
+        """
+        words = normalize_drug_name(text).split()
+        for end in range(len(words), 0, -1):
+            drug = self._exact(" ".join(words[:end]))
+            if drug is not None:
+                return drug
+        key = " ".join(words)
+        if len(key) < FUZZY_MATCH_MIN_LENGTH:
+            return None
+        candidates = {self._exact(variant) for variant in set(self._edits(key))}
+        candidates.discard(None)
+        return candidates.pop() if len(candidates) == 1 else None
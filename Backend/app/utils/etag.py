@@ -0,0 +1,141 @@
+import os
+import threading
+import time
+from typing import Optional, Tuple
+from fastapi import Request, Response
+from sqlalchemy.orm import Session
+from config import settings
+from app.utils.replicas import read_primary_if_newer
+from app.utils.streaming import wants_ndjson
+
+# Versions live in process memory. The epoch is part of every ETag so that
+# tags issued by a previous process (or another worker) never match.
+_EPOCH = format(int(time.time() * 1000) ^ os.getpid(), "x")
+
+# Collections versioned per patient whose rows live on the patient's shard
+PATIENT_COLLECTIONS = ("medications", "symptom_diary", "health_records", "messages")
+
+_versions: dict = {}
+# When each version was last advanced (monotonic), to tell whether replicas
+# can already have the rows behind it
+_bumped_at: dict = {}
+_lock = threading.Lock()
+_stats = {"conditional_gets": 0, "not_modified": 0}
+
+
+def bump(collection: str, *user_ids: int) -> None:
+    """Advance the version of a collection for each given user"""
+    now = time.monotonic()
+    with _lock:
+        for user_id in user_ids:
+            key = (collection, user_id)
+            _versions[key] = _versions.get(key, 0) + 1
+            _bumped_at[key] = now
+
+
+def bump_pair(collection: str, user_a: int, user_b: int) -> None:
+    """Advance the version of a collection shared by two users (e.g. a chat)"""
+    key = (collection, min(user_a, user_b), max(user_a, user_b))
+    with _lock:
+        _versions[key] = _versions.get(key, 0) + 1
+        _bumped_at[key] = time.monotonic()
+
+
+def bump_patients(patient_ids) -> None:
+    """Advance every version covering these patients' rows (e.g. moved to a shard)"""
+    patient_ids = set(patient_ids)
+    now = time.monotonic()
+    with _lock:
+        keys = {key for key in _versions if patient_ids.intersection(key[1:])}
+        keys.update(
+            (collection, patient_id)
+            for collection in PATIENT_COLLECTIONS
+            for patient_id in patient_ids
+        )
+        for key in keys:
+            _versions[key] = _versions.get(key, 0) + 1
+            _bumped_at[key] = now
+
+
+def pair_key(collection: str, user_a: int, user_b: int) -> Tuple:
+    """Version key for a collection shared by two users"""
+    return (collection, min(user_a, user_b), max(user_a, user_b))
+
+
+def make_etag(*keys: Tuple, variant: str = "") -> str:
+    """Build a weak ETag from the current versions of the given keys"""
+    parts = [str(_versions.get(key, 0)) for key in keys]
+    tag = f"{_EPOCH}-{'.'.join(parts)}"
+    if variant:
+        tag = f"{tag}-{variant}"
+    return f'W/"{tag}"'
+
+
+def _matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison: ignore the W/ prefix on both sides
+    wanted = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == wanted:
+            return True
+    return False
+
+
+def not_modified(
+    request: Request,
+    response: Response,
+    *keys: Tuple,
+    variant: str = "",
+    db: Optional[Session] = None,
+) -> Optional[Response]:
+    """Return a 304 response if the client's copy is current, else tag the response
+
+    Must be called before the list query runs: the ETag is taken from the
+    versions at that moment, so a write racing with the query can only make
+    the client re-fetch once more, never serve stale data.
+
+    Pass the session of a get_read_db endpoint as ``db``: a replica may not
+    have the rows of a version advanced moments ago (by another user, so the
+    sticky window does not apply), and the body tagged with that version
+    must not be older than it. Such reads are sent to the primary.
+    """
+    if not settings.ETAG_ENABLED:
+        return None
+
+    if wants_ndjson(request):
+        # A different representation of the same list
+        variant += "-ndjson"
+    etag = make_etag(*keys, variant=variant)
+    with _lock:
+        _stats["conditional_gets"] += 1
+    if _matches(request, etag):
+        with _lock:
+            _stats["not_modified"] += 1
+        return Response(
+            status_code=304,
+            headers={"ETag": etag, "Cache-Control": "private, no-cache"},
+        )
+
+    if db is not None:
+        with _lock:
+            times = [_bumped_at[key] for key in keys if key in _bumped_at]
+        read_primary_if_newer(db, max(times, default=None))
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+    return None
+
+
+def get_stats() -> dict:
+    """Counters of conditional GETs and how many were answered with 304"""
+    with _lock:
+        stats = dict(_stats)
+    total = stats["conditional_gets"]
+    stats["not_modified_ratio"] = stats["not_modified"] / total if total else 0.0
+    return stats
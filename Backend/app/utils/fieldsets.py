@@ -0,0 +1,83 @@
+import zlib
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Sequence, Tuple, Type
+from fastapi import HTTPException, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, ConfigDict, create_model
+from sqlalchemy.orm import load_only
+
+FIELDS_DESCRIPTION = "Comma separated list of fields to return (default: all)"
+
+
+def parse_fields(
+    fields: Optional[str], schema: Type[BaseModel], always: Sequence[str] = ("id",)
+) -> Optional[Tuple[str, ...]]:
+    """Validate a ``fields=`` query parameter against a response schema"""
+    if not fields:
+        return None
+
+    requested = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in requested if name not in schema.model_fields]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown)}",
+        )
+
+    names = list(always)
+    for name in requested:
+        if name not in names:
+            names.append(name)
+    return tuple(names)
+
+
+def fields_variant(names: Optional[Tuple[str, ...]]) -> str:
+    """Short token distinguishing ETags of different field selections"""
+    if not names:
+        return ""
+    return format(zlib.crc32(",".join(names).encode()), "x")
+
+
+def project_fields(
+    query,
+    model,
+    names: Iterable[str],
+    depends: Optional[Dict[str, Sequence[str]]] = None,
+):
+    """Load only the columns needed to produce ``names``
+
+    ``depends`` maps derived response fields (properties, joined names) to
+    the columns they are computed from.
+    """
+    depends = depends or {}
+    table_columns = model.__table__.columns
+    columns = []
+    for name in names:
+        for column in depends.get(name, (name,)):
+            if column in table_columns and column not in columns:
+                columns.append(column)
+    return query.options(load_only(*[getattr(model, column) for column in columns]))
+
+
+@lru_cache(maxsize=256)
+def trimmed_model(schema: Type[BaseModel], names: Tuple[str, ...]) -> Type[BaseModel]:
+    """Response model containing only the selected fields of ``schema``"""
+    definitions = {
+        name: (schema.model_fields[name].annotation, schema.model_fields[name])
+        for name in names
+    }
+    return create_model(
+        f"{schema.__name__}Fields",
+        __config__=ConfigDict(from_attributes=True),
+        **definitions,
+    )
+
+
+def render_fields(
+    items, schema: Type[BaseModel], names: Tuple[str, ...], response: Response
+) -> JSONResponse:
+    """Serialize items with the trimmed model, keeping headers set on ``response``"""
+    model = trimmed_model(schema, names)
+    content = jsonable_encoder([model.model_validate(item) for item in items])
+    return JSONResponse(content=content, headers=dict(response.headers))
@@ -0,0 +1,392 @@
+import asyncio
+import base64
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from config import settings
+from app.utils.metrics import IDEMPOTENCY_REQUESTS
+from app.utils.security import token_subject
+
+HEADER = b"idempotency-key"
+MUTATING_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+MAX_KEY_LENGTH = 255
+
+# Responses that should not be replayed: the retry deserves a fresh attempt
+UNSTORED_STATUSES = (408, 409, 425, 429)
+
+IN_FLIGHT = "in_flight"
+DONE = "done"
+
+
+class MemoryStore:
+    """Per-process records, bounded by entry count and bytes
+
+    Expired records are swept at most every ``sweep_interval`` seconds when a
+    record is written; beyond the bounds the least recently used completed
+    records are evicted. Duplicates sent to another process are not seen.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10_000,
+        max_bytes: int = 64 * 1024 * 1024,
+        sweep_interval: float = 60.0,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self._records: "OrderedDict[str, Tuple[float, dict, int]]" = OrderedDict()
+        self._events: Dict[str, asyncio.Event] = {}
+        self._bytes = 0
+        self._swept_at = time.monotonic()
+
+    def _get(self, key: str) -> Optional[dict]:
+        entry = self._records.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            self._drop(key)
+            return None
+        self._records.move_to_end(key)
+        return entry[1]
+
+    def _drop(self, key: str) -> None:
+        self._drop_entry_only(key)
+        # Wake retries waiting on a claim that is gone
+        event = self._events.pop(key, None)
+        if event is not None:
+            event.set()
+
+    def _put(self, key: str, record: dict, ttl: float) -> None:
+        size = len(record.get("body", b"")) + len(key) + 200
+        self._drop_entry_only(key)
+        self._records[key] = (time.monotonic() + ttl, record, size)
+        self._bytes += size
+        now = time.monotonic()
+        if now - self._swept_at >= self.sweep_interval:
+            self._swept_at = now
+            for expired in [k for k, (at, _, _) in self._records.items() if at <= now]:
+                self._drop(expired)
+        while len(self._records) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(
+                (k for k, (_, r, _) in self._records.items() if r["state"] == DONE), None
+            )
+            if oldest is None:
+                break
+            self._drop(oldest)
+
+    def _drop_entry_only(self, key: str) -> None:
+        entry = self._records.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    async def begin(self, key: str) -> Optional[dict]:
+        """Claim ``key``; returns None if claimed, else the existing record"""
+        record = self._get(key)
+        if record is not None:
+            return record
+        self._put(key, {"state": IN_FLIGHT}, settings.IDEMPOTENCY_LOCK_SECONDS)
+        self._events[key] = asyncio.Event()
+        return None
+
+    async def wait(self, key: str, timeout: float) -> Optional[dict]:
+        """The record once no longer in flight; None if it was released"""
+        event = self._events.get(key)
+        if event is not None:
+            await asyncio.wait_for(event.wait(), timeout)
+        return self._get(key)
+
+    async def complete(self, key: str, record: dict) -> None:
+        event = self._events.pop(key, None)
+        self._put(key, record, settings.IDEMPOTENCY_TTL)
+        if event is not None:
+            event.set()
+
+    async def release(self, key: str) -> None:
+        self._drop(key)
+
+
+class RedisStore:
+    """Records in Redis, shared by every process; expiry is Redis's TTL"""
+
+    def __init__(self, url: str, prefix: str = "idempotency:", poll: float = 0.05):
+        import redis.asyncio
+
+        self._redis = redis.asyncio.Redis.from_url(url)
+        self._prefix = prefix
+        self._poll = poll
+
+    @staticmethod
+    def _dumps(record: dict) -> str:
+        record = dict(record)
+        if "body" in record:
+            record["body"] = base64.b64encode(record["body"]).decode()
+        return json.dumps(record)
+
+    @staticmethod
+    def _loads(raw) -> Optional[dict]:
+        if raw is None:
+            return None
+        record = json.loads(raw)
+        if "body" in record:
+            record["body"] = base64.b64decode(record["body"])
+        return record
+
+    async def begin(self, key: str) -> Optional[dict]:
+        claimed = await self._redis.set(
+            self._prefix + key,
+            json.dumps({"state": IN_FLIGHT}),
+            nx=True,
+            px=settings.IDEMPOTENCY_LOCK_SECONDS * 1000,
+        )
+        if claimed:
+            return None
+        return self._loads(await self._redis.get(self._prefix + key))
+
+    async def wait(self, key: str, timeout: float) -> Optional[dict]:
+        deadline = time.monotonic() + timeout
+        while True:
+            record = self._loads(await self._redis.get(self._prefix + key))
+            if record is None or record["state"] != IN_FLIGHT:
+                return record
+            if time.monotonic() >= deadline:
+                raise asyncio.TimeoutError
+            await asyncio.sleep(self._poll)
+
+    async def complete(self, key: str, record: dict) -> None:
+        await self._redis.set(
+            self._prefix + key, self._dumps(record), px=settings.IDEMPOTENCY_TTL * 1000
+        )
+
+    async def release(self, key: str) -> None:
+        await self._redis.delete(self._prefix + key)
+
+
+def _build_store():
+    if settings.REDIS_URL:
+        return RedisStore(settings.REDIS_URL)
+    return MemoryStore(
+        max_entries=settings.IDEMPOTENCY_MAX_ENTRIES,
+        max_bytes=settings.IDEMPOTENCY_MAX_BYTES,
+    )
+
+
+async def _send_json(send, status: int, detail: str) -> None:
+    body = json.dumps({"detail": detail}).encode()
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+class _Fingerprint:
+    """Hash of the request line and body, to spot a key reused for another request
+
+    Multipart bodies are left out: clients pick a new boundary on every
+    retry, so the bytes differ even when the upload is the same.
+    """
+
+    def __init__(self, scope):
+        self._hash = hashlib.sha256(
+            f"{scope['method']} {scope['path']}?".encode() + scope.get("query_string", b"")
+        )
+        content_type = dict(scope["headers"]).get(b"content-type", b"")
+        self._with_body = not content_type.startswith(b"multipart/")
+
+    def update(self, body: bytes) -> None:
+        if self._with_body:
+            self._hash.update(body)
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+
+def _replay_body(body: bytes, receive):
+    sent = False
+
+    async def replay():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+
+    return replay
+
+
+class IdempotencyMiddleware:
+    """Pure ASGI middleware honouring the ``Idempotency-Key`` request header
+
+    For mutating requests that carry the header, the first response is
+    stored for IDEMPOTENCY_TTL seconds under the key, scoped to the user the
+    bearer token names, so a retry with a refreshed token still matches. A
+    retry gets the stored response without reaching the handler
+    (``Idempotent-Replayed: true``); a retry arriving while the first is
+    still running waits for it. Reusing a key for a different request is a
+    422. 5xx responses and errors release the key so the retry runs again.
+
+    Requests without a token (login, registration) or with an invalid one
+    are passed on untouched: there is no user to scope their keys to, and
+    unrelated clients picking the same key must not get each other's
+    responses.
+    """
+
+    def __init__(self, app, store=None):
+        self.app = app
+        self.store = store or _build_store()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in MUTATING_METHODS:
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        raw_key = headers.get(HEADER)
+        if raw_key is None:
+            await self.app(scope, receive, send)
+            return
+        if not raw_key or len(raw_key) > MAX_KEY_LENGTH:
+            await _send_json(send, 400, "Invalid Idempotency-Key header")
+            return
+
+        authorization = headers.get(b"authorization")
+        subject = None
+        if authorization is not None:
+            subject = token_subject(authorization.decode("latin-1"))
+        if subject is None:
+            await self.app(scope, receive, send)
+            return
+        key = f"user:{subject}:{raw_key.decode('latin-1')}"
+        record = await self.store.begin(key)
+        if record is not None:
+            await self._duplicate(key, record, _Fingerprint(scope), scope, receive, send)
+            return
+
+        IDEMPOTENCY_REQUESTS.labels("executed").inc()
+        await self._execute(key, _Fingerprint(scope), scope, receive, send)
+
+    async def _execute(self, key, fingerprint, scope, receive, send) -> None:
+        more_body = True
+        started: dict = {}
+        chunks = []
+        size = 0
+
+        async def hashing_receive():
+            nonlocal more_body
+            message = await receive()
+            if message["type"] == "http.request":
+                fingerprint.update(message.get("body", b""))
+                more_body = message.get("more_body", False)
+            return message
+
+        async def capturing_send(message):
+            nonlocal size
+            if message["type"] == "http.response.start":
+                started.update(message)
+            elif message["type"] == "http.response.body" and size >= 0:
+                size += len(message.get("body", b""))
+                if size > settings.IDEMPOTENCY_MAX_RESPONSE_BYTES:
+                    size = -1  # too big to keep; the retry runs again
+                    chunks.clear()
+                else:
+                    chunks.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, hashing_receive, capturing_send)
+            # The fingerprint covers the whole body, read or not
+            while more_body:
+                message = await receive()
+                if message["type"] != "http.request":
+                    break
+                fingerprint.update(message.get("body", b""))
+                more_body = message.get("more_body", False)
+        except BaseException:
+            await self.store.release(key)
+            raise
+
+        status = started.get("status", 500)
+        if status >= 500 or status in UNSTORED_STATUSES or size < 0 or more_body:
+            await self.store.release(key)
+            return
+        await self.store.complete(
+            key,
+            {
+                "state": DONE,
+                "fingerprint": fingerprint.hexdigest(),
+                "status": status,
+                "headers": [
+                    [name.decode("latin-1"), value.decode("latin-1")]
+                    for name, value in started.get("headers", [])
+                ],
+                "body": b"".join(chunks),
+            },
+        )
+
+    async def _duplicate(self, key, record, fingerprint, scope, receive, send) -> None:
+        # Read the retry's body: it must match the original request's, and
+        # is needed again if the original fails and this one takes over
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                return  # the client went away
+            chunks.append(message.get("body", b""))
+            fingerprint.update(chunks[-1])
+            if not message.get("more_body", False):
+                break
+
+        if record["state"] == IN_FLIGHT:
+            try:
+                record = await self.store.wait(key, settings.IDEMPOTENCY_WAIT_SECONDS)
+            except asyncio.TimeoutError:
+                IDEMPOTENCY_REQUESTS.labels("conflict").inc()
+                await _send_json(
+                    send, 409, "A request with this Idempotency-Key is still in progress"
+                )
+                return
+            if record is None:
+                # The original failed and released the key: run this one
+                record = await self.store.begin(key)
+            if record is None:
+                IDEMPOTENCY_REQUESTS.labels("executed").inc()
+                await self._execute(
+                    key,
+                    _Fingerprint(scope),
+                    scope,
+                    _replay_body(b"".join(chunks), receive),
+                    send,
+                )
+                return
+            if record["state"] != DONE:
+                IDEMPOTENCY_REQUESTS.labels("conflict").inc()
+                await _send_json(
+                    send, 409, "A request with this Idempotency-Key is still in progress"
+                )
+                return
+
+        if record["fingerprint"] != fingerprint.hexdigest():
+            IDEMPOTENCY_REQUESTS.labels("mismatch").inc()
+            await _send_json(
+                send, 422, "Idempotency-Key was already used for a different request"
+            )
+            return
+
+        IDEMPOTENCY_REQUESTS.labels("replayed").inc()
+        headers = [
+            (name.encode("latin-1"), value.encode("latin-1"))
+            for name, value in record["headers"]
+        ]
+        headers.append((b"idempotent-replayed", b"true"))
+        await send(
+            {"type": "http.response.start", "status": record["status"], "headers": headers}
+        )
+        await send({"type": "http.response.body", "body": record["body"]})
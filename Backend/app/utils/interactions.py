@@ -0,0 +1,228 @@
+import bisect
+import csv
+import json
+import logging
+import os
+import sys
+import threading
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+from app.utils.drug_dictionary import normalize_drug_name
+
+logger = logging.getLogger(__name__)
+
+SEVERITIES = ("minor", "moderate", "major", "contraindicated")
+
+# Each interaction is one int64: drug a (21 bits), drug b (21 bits, a < b),
+# severity (3 bits) and description index (18 bits). Sorted, a pair's
+# entries are adjacent with the most severe last, so a lookup is one bisect.
+ID_BITS = 21
+SEVERITY_BITS = 3
+NOTE_BITS = 18
+ATTR_BITS = SEVERITY_BITS + NOTE_BITS
+MAX_DRUGS = 1 << ID_BITS
+MAX_NOTES = 1 << NOTE_BITS
+ATTR_MASK = (1 << ATTR_BITS) - 1
+NOTE_MASK = MAX_NOTES - 1
+
+CACHE_VERSION = 1
+
+
+def pack(a: int, b: int, severity: int, note: int = 0) -> int:
+    if a > b:
+        a, b = b, a
+    return (((a << ID_BITS) | b) << ATTR_BITS) | (severity << NOTE_BITS) | note
+
+
+class InteractionIndex:
+    """Known interactions between pairs of drugs, kept as one sorted array
+
+    Drug names are normalized and mapped to small integer ids; the pairs
+    take 8 bytes each, so 10M interactions fit in 80 MB and checking one
+    pair costs a binary search, without any per-pair Python objects.
+    """
+
+    def __init__(self, names: List[str], entries: array, notes: List[str]):
+        self.names = names
+        self.ids: Dict[str, int] = {name: i for i, name in enumerate(names)}
+        self.entries = entries
+        self.notes = notes
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @property
+    def nbytes(self) -> int:
+        return self.entries.itemsize * len(self.entries)
+
+    def drug_id(self, name: str) -> Optional[int]:
+        return self.ids.get(normalize_drug_name(name))
+
+    def lookup(self, a: int, b: int) -> Optional[Tuple[str, str]]:
+        """(severity, description) of the most severe interaction of a and b"""
+        if a > b:
+            a, b = b, a
+        key = (a << ID_BITS) | b
+        i = bisect.bisect_right(self.entries, (key << ATTR_BITS) | ATTR_MASK) - 1
+        if i < 0 or self.entries[i] >> ATTR_BITS != key:
+            return None
+        attr = self.entries[i] & ATTR_MASK
+        return SEVERITIES[(attr >> NOTE_BITS) - 1], self.notes[attr & NOTE_MASK]
+
+    @classmethod
+    def build(cls, rows: Iterable[Tuple[str, str, str, str]]) -> "InteractionIndex":
+        """Index (drug_a, drug_b, severity, description) rows"""
+        ids: Dict[str, int] = {}
+        note_ids: Dict[str, int] = {"": 0}
+        packed = array("q")
+        skipped = 0
+        for drug_a, drug_b, severity, description in rows:
+            a, b = normalize_drug_name(drug_a), normalize_drug_name(drug_b)
+            level = severity.strip().lower()
+            if not a or not b or a == b or level not in SEVERITIES:
+                skipped += 1
+                continue
+            a_id = ids.setdefault(a, len(ids))
+            b_id = ids.setdefault(b, len(ids))
+            note = note_ids.setdefault(description.strip(), len(note_ids))
+            if len(ids) > MAX_DRUGS or len(note_ids) > MAX_NOTES:
+                raise ValueError("Interaction dataset has too many drugs or descriptions")
+            packed.append(pack(a_id, b_id, SEVERITIES.index(level) + 1, note))
+        if skipped:
+            logger.warning("Skipped %d unusable interaction rows", skipped)
+        return cls(list(ids), array("q", sorted(packed)), list(note_ids))
+
+    @classmethod
+    def from_csv(cls, path: str) -> "InteractionIndex":
+        """Columns drug_a, drug_b, severity and optionally description"""
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = csv.DictReader(f)
+            return cls.build(
+                (row["drug_a"], row["drug_b"], row["severity"], row.get("description") or "")
+                for row in rows
+            )
+
+    def save(self, path: str, source: dict) -> None:
+        """Write the index so later starts skip parsing the dataset"""
+        header = json.dumps(
+            {
+                "version": CACHE_VERSION,
+                "byteorder": sys.byteorder,
+                "source": source,
+                "count": len(self.entries),
+                "names": self.names,
+                "notes": self.notes,
+            }
+        ).encode()
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(len(header).to_bytes(8, "little"))
+            f.write(header)
+            self.entries.tofile(f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str, source: dict) -> Optional["InteractionIndex"]:
+        """The index saved at ``path``; None if missing or built from other data"""
+        try:
+            with open(path, "rb") as f:
+                header = json.loads(f.read(int.from_bytes(f.read(8), "little")))
+                if (
+                    header.get("version") != CACHE_VERSION
+                    or header.get("byteorder") != sys.byteorder
+                    or header.get("source") != source
+                ):
+                    return None
+                entries = array("q")
+                entries.fromfile(f, header["count"])
+        except (OSError, EOFError, ValueError):
+            return None
+        return cls(header["names"], entries, header["notes"])
+
+
+def _source_stamp(path: str) -> dict:
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+class InteractionChecker:
+    """Loads the dataset at ``path`` once per process, on first use
+
+    The parsed index is cached next to the dataset as ``<path>.idx`` and
+    reused while the dataset is unchanged. Without a path (or if loading
+    fails) every check finds nothing.
+    """
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self._index: Optional[InteractionIndex] = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def get(self) -> Optional[InteractionIndex]:
+        if self._loaded:
+            return self._index
+        with self._lock:
+            if not self._loaded:
+                self._index = self._load()
+                self._loaded = True
+        return self._index
+
+    def _load(self) -> Optional[InteractionIndex]:
+        if not self.path:
+            return None
+        try:
+            source = _source_stamp(self.path)
+            cache_path = self.path + ".idx"
+            index = InteractionIndex.load(cache_path, source)
+            if index is None:
+                index = InteractionIndex.from_csv(self.path)
+                try:
+                    index.save(cache_path, source)
+                except OSError:
+                    logger.warning("Could not cache the interaction index", exc_info=True)
+        except Exception:
+            logger.exception("Loading drug interactions from %s failed", self.path)
+            return None
+        logger.info(
+            "Loaded %d drug interactions between %d drugs", len(index), len(index.names)
+        )
+        return index
+
+    def check(
+        self, new: List[str], existing: List[str] = ()
+    ) -> List[Tuple[str, str, str, str]]:
+        """(drug, interacts_with, severity, description) per interacting pair, most severe first
+
+        Every drug in ``new`` is checked against the others in ``new`` and
+        against every drug in ``existing``; names are reported as given.
+        """
+        index = self.get()
+        if index is None:
+            return []
+        known_new = [(name, index.drug_id(name)) for name in new]
+        known_existing = [(name, index.drug_id(name)) for name in existing]
+        found = []
+        seen = set()
+        for i, (name, drug) in enumerate(known_new):
+            if drug is None:
+                continue
+            for other, other_drug in known_new[i + 1 :] + known_existing:
+                if other_drug is None or other_drug == drug:
+                    continue
+                pair = (min(drug, other_drug), max(drug, other_drug))
+                if pair in seen:
+                    continue
+                hit = index.lookup(drug, other_drug)
+                if hit is not None:
+                    seen.add(pair)
+                    found.append((name, other, hit[0], hit[1]))
+        found.sort(key=lambda hit: -SEVERITIES.index(hit[2]))
+        return found
+
+    def unknown(self, names: List[str]) -> List[str]:
+        """Names not in the dataset, so their interactions cannot be checked"""
+        index = self.get()
+        if index is None:
+            return list(names)
+        return [name for name in names if index.drug_id(name) is None]
@@ -0,0 +1,368 @@
+import contextvars
+import functools
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+from fastapi import Response
+from fastapi.routing import APIRoute
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+from app.utils.tracing import record_span, set_route, span
+
+LABELS = ("method", "route")
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144)
+WAIT_BUCKETS = (
+    0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30
+)
+
+REQUESTS = Counter(
+    "http_requests_total", "HTTP requests handled", (*LABELS, "status")
+)
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Time spent handling a request", LABELS
+)
+HANDLER_SECONDS = Histogram(
+    "http_request_handler_seconds", "Time spent in the endpoint function", LABELS
+)
+SERIALIZATION_SECONDS = Histogram(
+    "http_request_serialization_seconds",
+    "Time spent validating and rendering the response body",
+    LABELS,
+)
+DB_STATEMENTS = Histogram(
+    "http_request_db_statements",
+    "SQL statements executed per request",
+    LABELS,
+    buckets=STATEMENT_BUCKETS,
+)
+DB_SECONDS = Histogram(
+    "http_request_db_seconds", "Time spent executing SQL per request", LABELS
+)
+POOL_WAIT_SECONDS = Histogram(
+    "http_request_pool_wait_seconds",
+    "Time spent waiting for pooled connections per request",
+    LABELS,
+    buckets=WAIT_BUCKETS,
+)
+CHECKOUT_SECONDS = Histogram(
+    "db_pool_checkout_seconds",
+    "Time to obtain a connection from the pool",
+    buckets=WAIT_BUCKETS,
+)
+POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out", "Connections currently in use", multiprocess_mode="livesum"
+)
+POOL_OVERFLOW = Gauge(
+    "db_pool_overflow",
+    "Connections open beyond pool_size (negative while the pool is filling)",
+    multiprocess_mode="livesum",
+)
+POOL_WAITERS = Gauge(
+    "db_pool_waiters",
+    "Threads waiting for a pooled connection",
+    multiprocess_mode="livesum",
+)
+DB_ROUTED = Counter(
+    "db_read_sessions_total",
+    "Read-only sessions by the database their reads went to",
+    ("target", "reason"),
+)
+DB_REPLICA_LAG_SECONDS = Gauge(
+    "db_replica_lag_seconds",
+    "Replication lag last measured per replica (+Inf if unreachable)",
+    ("replica",),
+    multiprocess_mode="livemax",
+)
+SHARD_QUERIES = Counter(
+    "db_shard_queries_total",
+    "Statements on sharded tables by shard, for one patient or scattered to all",
+    ("shard", "kind"),
+)
+SYNC_ROWS = Counter(
+    "sync_rows_total",
+    "Rows sent by /api/sync as upserted or deleted, and tombstones purged",
+    ("collection", "kind"),
+)
+IDEMPOTENCY_REQUESTS = Counter(
+    "idempotency_requests_total",
+    "Requests with an Idempotency-Key by outcome",
+    ("outcome",),
+)
+INTERACTION_WARNINGS = Counter(
+    "interaction_warnings_total",
+    "Drug interaction warnings returned, by severity",
+    ("severity",),
+)
+DRUG_NAMES_NORMALIZED = Counter(
+    "drug_names_normalized_total",
+    "Free-text drug names the backfill matched or not to a dictionary drug",
+    ("table", "outcome"),
+)
+EXPORT_ROWS = Counter(
+    "export_rows_total",
+    "Rows streamed by cohort exports, by dataset and format",
+    ("dataset", "format"),
+)
+VITAL_READINGS = Counter(
+    "vital_readings_total",
+    "Device readings received, by outcome (accepted, duplicate or rejected)",
+    ("outcome",),
+)
+JOB_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900)
+JOBS = Counter("jobs_total", "Background jobs by outcome", ("task", "outcome"))
+JOB_WAIT_SECONDS = Histogram(
+    "job_wait_seconds",
+    "Time from when a job became runnable until a worker started it",
+    ("task",),
+    buckets=JOB_BUCKETS,
+)
+JOB_SECONDS = Histogram(
+    "job_duration_seconds", "Time spent running a job", ("task",), buckets=JOB_BUCKETS
+)
+QUEUE_DEPTH = Gauge(
+    "job_queue_depth",
+    "Jobs waiting in the queue (ready, delayed for retry, or running)",
+    ("state",),
+    multiprocess_mode="livesum",
+)
+
+AUDIT_EVENTS = Counter(
+    "audit_events_total", "Audit events by outcome", ("outcome",)
+)
+AUDIT_FLUSH_SECONDS = Histogram(
+    "audit_flush_seconds", "Time to write one batch of audit events"
+)
+
+ADMISSION_IN_FLIGHT = Gauge(
+    "admission_in_flight",
+    "Requests being handled, by admission class",
+    ("priority",),
+    multiprocess_mode="livesum",
+)
+SHED_REQUESTS = Counter(
+    "admission_shed_total",
+    "Requests rejected with 503 by admission control",
+    ("priority", "reason"),
+)
+
+
+@dataclass
+class RequestStats:
+    """Counters collected while one request is being handled"""
+
+    route: Optional[str] = None
+    statements: int = 0
+    db_seconds: float = 0.0
+    pool_wait_seconds: float = 0.0
+    handler_seconds: float = 0.0
+    serialization_seconds: float = 0.0
+    endpoint_finished: Optional[float] = None
+    # (statement, seconds, rowcount) per statement, when a consumer asks for it
+    queries: Optional[list] = None
+
+
+_current: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar(
+    "request_stats", default=None
+)
+
+
+def current_request_stats() -> Optional[RequestStats]:
+    """Stats of the request being handled, or None outside a request"""
+    return _current.get()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that reports checkout waits, waiters and connections in use"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Read by admission control; the gauge may be shared across workers
+        self.waiters = 0
+        self._waiters_lock = threading.Lock()
+
+    def _do_get(self):
+        POOL_WAITERS.inc()
+        with self._waiters_lock:
+            self.waiters += 1
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - started
+            POOL_WAITERS.dec()
+            with self._waiters_lock:
+                self.waiters -= 1
+            CHECKOUT_SECONDS.observe(waited)
+            self._update_gauges()
+            stats = _current.get()
+            if stats is not None:
+                stats.pool_wait_seconds += waited
+
+    def _do_return_conn(self, record):
+        try:
+            super()._do_return_conn(record)
+        finally:
+            self._update_gauges()
+
+    def _update_gauges(self) -> None:
+        POOL_CHECKED_OUT.set(self.checkedout())
+        POOL_OVERFLOW.set(self.overflow())
+
+
+def instrument_engine(engine) -> None:
+    """Count statements and SQL time per request"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        stats = _current.get()
+        if stats is not None:
+            elapsed = time.perf_counter() - started
+            stats.statements += 1
+            stats.db_seconds += elapsed
+            if stats.queries is not None:
+                # DB-API rowcount: rows returned on PostgreSQL, -1 for SQLite reads
+                rows = cursor.rowcount if cursor.rowcount >= 0 else None
+                stats.queries.append((statement, elapsed, rows))
+
+    @event.listens_for(engine, "handle_error")
+    def _on_error(context):
+        conn = context.connection
+        if conn is not None and conn.info.get("query_started"):
+            conn.info["query_started"].pop()
+
+
+def _timed_endpoint(call, is_coroutine: bool):
+    def finish(stats: Optional[RequestStats], started: float) -> None:
+        if stats is not None:
+            stats.endpoint_finished = time.perf_counter()
+            stats.handler_seconds += stats.endpoint_finished - started
+
+    if is_coroutine:
+
+        @functools.wraps(call)
+        async def endpoint(**values):
+            started = time.perf_counter()
+            with span("endpoint"):
+                result = await call(**values)
+            finish(_current.get(), started)
+            return result
+
+    else:
+
+        @functools.wraps(call)
+        def endpoint(**values):
+            started = time.perf_counter()
+            with span("endpoint"):
+                result = call(**values)
+            finish(_current.get(), started)
+            return result
+
+    endpoint.__instrumented__ = True
+    return endpoint
+
+
+class InstrumentedRoute(APIRoute):
+    """APIRoute that reports its path template, handler and serialization time
+
+    Serialization time is everything FastAPI does between the endpoint
+    returning and the response object being ready: response_model
+    validation, jsonable_encoder and JSON rendering.
+    """
+
+    def get_route_handler(self):
+        call = self.dependant.call
+        if call is not None and not getattr(call, "__instrumented__", False):
+            # Resolve (and cache) the flag from the original function first
+            is_coroutine = self.dependant.is_coroutine_callable
+            self.dependant.call = _timed_endpoint(call, is_coroutine)
+        handler = super().get_route_handler()
+        route = self.path_format
+
+        async def instrumented_handler(request):
+            stats = _current.get()
+            token = None
+            if stats is None:  # MetricsMiddleware not installed
+                stats = RequestStats()
+                token = _current.set(stats)
+            stats.route = route
+            set_route(route)
+            try:
+                return await handler(request)
+            finally:
+                if stats.endpoint_finished is not None:
+                    elapsed = time.perf_counter() - stats.endpoint_finished
+                    stats.serialization_seconds += elapsed
+                    now = time.time_ns()
+                    record_span("serialize", now - int(elapsed * 1e9), now)
+                if token is not None:
+                    _current.reset(token)
+
+        return instrumented_handler
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware that records per-request metrics by route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _current.reset(token)
+            # Unmatched paths share one label to keep cardinality bounded;
+            # mounted apps report their mount point.
+            route = stats.route or scope.get("root_path") or "unmatched"
+            labels = (scope["method"], route)
+            REQUESTS.labels(*labels, str(status_code)).inc()
+            REQUEST_SECONDS.labels(*labels).observe(time.perf_counter() - started)
+            DB_STATEMENTS.labels(*labels).observe(stats.statements)
+            DB_SECONDS.labels(*labels).observe(stats.db_seconds)
+            POOL_WAIT_SECONDS.labels(*labels).observe(stats.pool_wait_seconds)
+            if stats.endpoint_finished is not None:
+                HANDLER_SECONDS.labels(*labels).observe(stats.handler_seconds)
+                SERIALIZATION_SECONDS.labels(*labels).observe(
+                    stats.serialization_seconds
+                )
+
+
+def metrics_response() -> Response:
+    """Prometheus exposition of this process (or all workers in multiprocess mode)"""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
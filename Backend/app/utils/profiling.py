@@ -0,0 +1,172 @@
+import asyncio
+import hmac
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import List, Optional
+from config import settings
+from app.utils.metrics import current_request_stats
+
+logger = logging.getLogger("app.slow_requests")
+
+PROFILE_HEADER = b"x-profile"
+
+
+class SamplingProfiler:
+    """Statistical profiler that samples one thread's stack at a fixed interval
+
+    Samples are aggregated as folded stacks ("a;b;c 12"), the input format of
+    flamegraph.pl and speedscope. Async endpoints run on the event loop
+    thread, so requests handled concurrently on the same loop show up in
+    the samples too.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                filename = os.path.basename(code.co_filename)
+                stack.append(f"{code.co_name} ({filename}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.items())
+
+
+def _wants_profile(scope) -> bool:
+    if settings.PROFILE_SECRET:
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER:
+                return hmac.compare_digest(value, settings.PROFILE_SECRET.encode())
+    rate = settings.PROFILE_SAMPLE_RATE
+    return rate > 0 and random.random() < rate
+
+
+def _write_profile(path: str, content: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as fh:
+        fh.write(content)
+
+
+def _slow_request_entry(
+    scope, route: str, status_code: int, elapsed: float, queries: Optional[List[tuple]]
+) -> dict:
+    top = settings.SLOW_REQUEST_TOP_STATEMENTS
+    queries = queries or []
+
+    def render(items):
+        # Statement text only: bound parameters may contain patient data
+        return [
+            {"sql": sql[:500], "ms": round(seconds * 1000, 2), "rows": rows}
+            for sql, seconds, rows in items
+        ]
+
+    return {
+        "method": scope["method"],
+        "route": route,
+        "status": status_code,
+        "duration_ms": round(elapsed * 1000, 1),
+        "user_role": scope.get("state", {}).get("user_role"),
+        "statements": len(queries),
+        "db_ms": round(sum(q[1] for q in queries) * 1000, 2),
+        "slowest": render(sorted(queries, key=lambda q: q[1], reverse=True)[:top]),
+        "largest": render(
+            sorted(
+                (q for q in queries if q[2] is not None and q[2] > 0),
+                key=lambda q: q[2],
+                reverse=True,
+            )[:top]
+        ),
+    }
+
+
+class ProfilingMiddleware:
+    """Profiles sampled or explicitly requested requests and logs slow ones
+
+    Must run inside MetricsMiddleware, which owns the per-request stats the
+    slow-request log reads. Requests that are neither sampled nor slow pay
+    for one random() call and a clock read.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = current_request_stats()
+        slow_log = settings.SLOW_REQUEST_MS > 0 and stats is not None
+        if slow_log:
+            stats.queries = []
+
+        profiler = None
+        profile_name = None
+        if _wants_profile(scope):
+            profiler = SamplingProfiler(
+                threading.get_ident(), settings.PROFILE_INTERVAL_MS / 1000
+            )
+            profile_name = "{}-{}{}.folded".format(
+                datetime.utcnow().strftime("%Y%m%dT%H%M%S%f"),
+                scope["method"],
+                re.sub(r"[^A-Za-z0-9]+", "_", scope["path"]).rstrip("_"),
+            )
+            profiler.start()
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if profile_name:
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (b"x-profile-id", profile_name.encode()),
+                    ]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            if profiler is not None:
+                profiler.stop()
+                await asyncio.to_thread(
+                    _write_profile,
+                    os.path.join(settings.PROFILE_DIR, profile_name),
+                    profiler.folded(),
+                )
+            if slow_log and elapsed * 1000 >= settings.SLOW_REQUEST_MS:
+                route = stats.route or "unmatched"
+                entry = _slow_request_entry(
+                    scope, route, status_code, elapsed, stats.queries
+                )
+                logger.warning("slow request %s", json.dumps(entry, default=str))
@@ -0,0 +1,205 @@
+import itertools
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+from sqlalchemy import Select, text
+from sqlalchemy.orm import Session
+from app.utils.metrics import DB_REPLICA_LAG_SECONDS, DB_ROUTED, SHARD_QUERIES
+from app.utils.sharding import SHARDED_TABLES, ShardKeyRequired, ShardMoving, ShardRouter
+
+logger = logging.getLogger(__name__)
+
+# Zero while the replica has replayed everything it received, so an idle
+# primary does not look like lag
+POSTGRES_LAG_SQL = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) "
+    "END"
+)
+
+
+class ReplicaSet:
+    """Replica engines with lag-aware round-robin or least-connections choice
+
+    Lag is measured at most every ``check_interval`` seconds per replica, by
+    whichever request needs it first. Replicas that lag more than
+    ``max_lag`` or fail the check are skipped until the next check; with
+    none left, reads go to the primary.
+    """
+
+    def __init__(
+        self,
+        engines: List,
+        strategy: str = "round_robin",
+        max_lag: float = 5.0,
+        check_interval: float = 2.0,
+    ):
+        if strategy not in ("round_robin", "least_connections"):
+            raise ValueError(f"Unknown replica strategy {strategy!r}")
+        self.engines = engines
+        self.strategy = strategy
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._counter = itertools.count()
+        self._lag: Dict[int, float] = {}  # index -> seconds (inf if unreachable)
+        self._checked_at: Dict[int, float] = {}
+        self._lock = threading.Lock()
+
+    def lag(self, index: int) -> float:
+        now = time.monotonic()
+        if now - self._checked_at.get(index, float("-inf")) < self.check_interval:
+            return self._lag[index]
+        # One thread refreshes; the others keep using the previous value
+        if not self._lock.acquire(blocking=False):
+            return self._lag.get(index, 0.0)
+        try:
+            self._lag[index] = self._measure(self.engines[index])
+            self._checked_at[index] = now
+            DB_REPLICA_LAG_SECONDS.labels(str(index)).set(self._lag[index])
+        finally:
+            self._lock.release()
+        return self._lag[index]
+
+    @staticmethod
+    def _measure(engine) -> float:
+        if engine.dialect.name != "postgresql":
+            return 0.0  # local stand-ins are not replicating
+        try:
+            with engine.connect() as conn:
+                return float(conn.execute(POSTGRES_LAG_SQL).scalar() or 0.0)
+        except Exception:
+            logger.warning("Replica lag check failed for %s", engine.url, exc_info=True)
+            return float("inf")
+
+    def may_lack(self, written_at: float) -> bool:
+        """Whether a write at ``written_at`` (monotonic) may not be on every replica yet
+
+        Replicas in use lagged at most ``max_lag`` when last checked, up to
+        ``check_interval`` ago, so older writes have reached them.
+        """
+        return time.monotonic() - written_at <= self.max_lag + self.check_interval
+
+    def choose(self):
+        """A replica engine within the lag bound, or None"""
+        healthy = [
+            engine
+            for index, engine in enumerate(self.engines)
+            if self.lag(index) <= self.max_lag
+        ]
+        if not healthy:
+            return None
+        if self.strategy == "least_connections":
+            return min(healthy, key=lambda engine: engine.pool.checkedout())
+        return healthy[next(self._counter) % len(healthy)]
+
+
+class StickyWindow:
+    """Users who wrote recently; their reads go to the primary for ``seconds``
+
+    Kept in process and, when a Redis URL is given, in Redis so a write
+    handled by one worker is seen by reads handled by another.
+    """
+
+    def __init__(self, seconds: float, redis_url: Optional[str] = None):
+        self.seconds = seconds
+        self._until: Dict[int, float] = {}
+        self._lock = threading.Lock()
+        self._redis = None
+        if redis_url:
+            import redis
+
+            self._redis = redis.Redis.from_url(redis_url)
+
+    def mark(self, user_id: int) -> None:
+        with self._lock:
+            self._until[user_id] = time.monotonic() + self.seconds
+            if len(self._until) > 10_000:
+                now = time.monotonic()
+                self._until = {k: v for k, v in self._until.items() if v > now}
+        if self._redis is not None:
+            try:
+                self._redis.set(
+                    f"replica:sticky:{user_id}", 1, px=max(1, int(self.seconds * 1000))
+                )
+            except Exception:
+                logger.warning("Failed to share read-your-writes window", exc_info=True)
+
+    def active(self, user_id: int) -> bool:
+        if self._until.get(user_id, 0) > time.monotonic():
+            return True
+        if self._redis is not None:
+            try:
+                return bool(self._redis.exists(f"replica:sticky:{user_id}"))
+            except Exception:
+                return True  # unsure: the primary is always correct
+        return False
+
+
+class RoutingSession(Session):
+    """Session that sends reads of read-only sessions to a replica
+
+    ``info["read_only"]`` (set by get_read_db) opts a session in. Writes,
+    flushes and anything after them in the session, and reads by users
+    inside their read-your-writes window, use the primary. One replica is
+    chosen per session so a request uses a single replica connection.
+
+    With shards configured, statements on sharded tables go to the shard of
+    ``info["shard_key"]`` instead (set from the authenticated user, or by
+    use_shard); shards are not replicated.
+    """
+
+    replicas: Optional[ReplicaSet] = None
+    sticky: Optional[StickyWindow] = None
+    shards: Optional[ShardRouter] = None
+
+    def _shard_bind(self, table: str, write: bool):
+        patient_id = self.info.get("shard_key")
+        if patient_id is None:
+            raise ShardKeyRequired(table)
+        shard, moving_to = self.shards.locate(patient_id)
+        if write and moving_to is not None:
+            raise ShardMoving(patient_id)
+        SHARD_QUERIES.labels(shard, "patient").inc()
+        return self.shards.engines[shard]
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        write = self._flushing or not isinstance(clause, Select)
+        if self.shards is not None and mapper is not None:
+            table = getattr(mapper, "local_table", None)
+            if table is not None and table.name in SHARDED_TABLES:
+                return self._shard_bind(table.name, write)
+
+        primary = super().get_bind(mapper, clause=clause, **kw)
+        info = self.info
+        if write:
+            if self._flushing or clause is not None:
+                info["wrote"] = True
+            return primary
+        if not info.get("read_only") or info.get("wrote") or self.replicas is None:
+            return primary
+
+        if "replica" not in info:
+            user_id = info.get("user_id")
+            if user_id is not None and self.sticky is not None:
+                if self.sticky.active(user_id):
+                    DB_ROUTED.labels("primary", "recent_write").inc()
+                    info["replica"] = None
+                    return primary
+            info["replica"] = self.replicas.choose()
+            if info["replica"] is None:
+                DB_ROUTED.labels("primary", "replicas_lagging").inc()
+            else:
+                DB_ROUTED.labels("replica", "read_only").inc()
+        return info["replica"] or primary
+
+
+def read_primary_if_newer(db: Session, written_at: Optional[float]) -> None:
+    """Send a read-only session to the primary if replicas may lack a recent write"""
+    replicas = RoutingSession.replicas
+    if written_at is None or replicas is None or not db.info.get("read_only"):
+        return
+    if db.info.get("replica", False) is None or not replicas.may_lack(written_at):
+        return
+    DB_ROUTED.labels("primary", "recent_version").inc()
+    db.info["replica"] = None
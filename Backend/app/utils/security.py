@@ -1,26 +1,34 @@
+import functools
 from datetime import datetime, timedelta
 from typing import Optional
-from jose import JWTError, jwt
-from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from config import settings
 from database import get_db
 from app.models.user import User
+from app.utils.sharding import shard_key_for
+from app.utils.tracing import span
 
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
 
+# passlib and jose are imported on first use rather than at startup
+@functools.lru_cache(maxsize=None)
+def _pwd_context():
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["argon2"], deprecated="auto")
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    return _pwd_context().verify(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
     """Hash a password"""
-    return pwd_context.hash(password)
+    return _pwd_context().hash(password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -33,6 +41,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
             minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
         )
 
+    from jose import jwt
+
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(
         to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM
@@ -40,10 +50,38 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
+def token_subject(authorization: str) -> Optional[str]:
+    """``sub`` of the valid bearer token in an Authorization header, else None"""
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+
+    from jose import JWTError, jwt
+
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return None
+    subject = payload.get("sub")
+    return str(subject) if subject is not None else None
+
+
 def get_current_user(
-    token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
+    request: Request,
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db),
 ) -> User:
     """Get current authenticated user from JWT token"""
+    # Sub-requests of a batch reuse the user the batch authenticated
+    batch_user = getattr(request.state, "batch_user", None)
+    if batch_user is not None:
+        request.state.user_role = batch_user.role.value
+        db.info["user_id"] = batch_user.id
+        db.info["shard_key"] = shard_key_for(batch_user, request)
+        return batch_user
+
+    from jose import JWTError, jwt
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -51,19 +89,25 @@ def get_current_user(
     )
 
     try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
-        user_id: int = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-    except JWTError:
+        with span("auth.jwt_decode"):
+            payload = jwt.decode(
+                token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
+            )
+        user_id = int(payload.get("sub"))
+    except (JWTError, TypeError, ValueError):
         raise credentials_exception
 
-    user = db.query(User).filter(User.id == user_id).first()
+    with span("auth.user_lookup"):
+        user = db.query(User).filter(User.id == user_id).first()
     if user is None:
         raise credentials_exception
 
+    # Reported by the slow-request log
+    request.state.user_role = user.role.value
+    # Lets the session keep this user's reads on the primary after a write
+    db.info["user_id"] = user.id
+    # Whose shard the request's patient-owned rows are on
+    db.info["shard_key"] = shard_key_for(user, request)
     return user
 
 
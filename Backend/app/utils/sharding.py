@@ -0,0 +1,348 @@
+import bisect
+import hashlib
+import heapq
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from fastapi.responses import JSONResponse
+from sqlalchemy import MetaData, inspect, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.utils.admission import busy_headers
+from app.utils.metrics import SHARD_QUERIES
+
+logger = logging.getLogger(__name__)
+
+# Patient-owned tables; every other table (users, appointments, ...) stays
+# on the primary
+SHARDED_TABLES = frozenset(
+    {
+        "medications",
+        "symptom_diary",
+        "messages",
+        "health_records",
+        "vital_readings",
+        "vital_rollups",
+    }
+)
+
+# Column holding the owning patient, used to copy a patient's rows between
+# shards. Messages belong to the one participant who is a patient.
+OWNER_COLUMNS = {
+    "medications": ("user_id",),
+    "symptom_diary": ("user_id",),
+    "health_records": ("patient_id",),
+    "messages": ("sender_id", "receiver_id"),
+    "vital_readings": ("user_id",),
+    "vital_rollups": ("user_id",),
+}
+
+DIRECTORY_SQL = text("SELECT patient_id, shard, moving_to FROM shard_directory")
+
+RESERVE_IDS_SQL = text(
+    "UPDATE id_blocks SET next_id = next_id + :size WHERE table_name = :table"
+)
+NEXT_ID_SQL = text("SELECT next_id FROM id_blocks WHERE table_name = :table")
+FIRST_BLOCK_SQL = text(
+    "INSERT INTO id_blocks (table_name, next_id) VALUES (:table, :next_id)"
+)
+
+
+class ShardKeyRequired(Exception):
+    """A sharded table was queried without saying whose rows are wanted"""
+
+
+class ShardMoving(Exception):
+    """The patient's rows are being moved to another shard; writes must wait"""
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent hashing of patient ids onto shard names
+
+    Each shard owns ``vnodes`` points on the ring, so adding a shard takes
+    roughly 1/N of the patients from every existing shard instead of
+    reshuffling them all.
+    """
+
+    def __init__(self, names: List[str], vnodes: int = 64):
+        if not names:
+            raise ValueError("A hash ring needs at least one shard")
+        points = sorted((_hash(f"{name}#{i}"), name) for name in names for i in range(vnodes))
+        self._points = [point for point, _ in points]
+        self._names = [name for _, name in points]
+
+    def shard_for(self, patient_id: int) -> str:
+        index = bisect.bisect(self._points, _hash(str(patient_id)))
+        return self._names[index % len(self._names)]
+
+
+class IdAllocator:
+    """Ids for sharded tables that are unique across every shard
+
+    Left to themselves, shards number their rows independently, so rows
+    could not keep their ids when moved, and rows gathered from several
+    shards could share one. Ids come instead from blocks reserved in the
+    primary's ``id_blocks`` table, ``block_size`` at a time per process
+    and in a transaction of their own; the first block of a table starts
+    after the highest id on any of its databases.
+
+    SQLite stand-ins count on from that highest id in process: a second
+    connection could not write while the inserting transaction holds the
+    database lock. They are meant for one process.
+    """
+
+    def __init__(
+        self, bind, table_binds: Callable[[str], list], block_size: int = 1000
+    ):
+        self.bind = bind
+        self.table_binds = table_binds
+        self.block_size = block_size
+        self._blocks: Dict[str, List[int]] = {}  # table -> [next id, end of block]
+        self._lock = threading.Lock()
+
+    def next(self, table: str) -> int:
+        with self._lock:
+            block = self._blocks.get(table)
+            if block is None or block[0] >= block[1]:
+                start = self._reserve(table, self.block_size)
+                block = self._blocks[table] = [start, start + self.block_size]
+            block[0] += 1
+            return block[0] - 1
+
+    def _highest(self, table: str) -> int:
+        highest = 0
+        for bind in self.table_binds(table):
+            with bind.connect() as conn:
+                found = conn.execute(text(f"SELECT MAX(id) FROM {table}")).scalar()
+            highest = max(highest, found or 0)
+        return highest
+
+    def _reserve(self, table: str, size: int) -> int:
+        if self.bind.dialect.name == "sqlite":
+            block = self._blocks.get(table)
+            return block[1] if block is not None else self._highest(table) + 1
+        while True:
+            with self.bind.begin() as conn:
+                reserved = conn.execute(RESERVE_IDS_SQL, {"size": size, "table": table})
+                if reserved.rowcount:
+                    return conn.execute(NEXT_ID_SQL, {"table": table}).scalar() - size
+            start = self._highest(table) + 1
+            try:
+                with self.bind.begin() as conn:
+                    conn.execute(FIRST_BLOCK_SQL, {"table": table, "next_id": start + size})
+                return start
+            except IntegrityError:
+                continue  # another process started the table first
+
+
+class ShardRouter:
+    """Maps a patient id to the engine holding their rows
+
+    The ring decides by default; the ``shard_directory`` table on the
+    primary overrides it for patients that were pinned or moved, and marks
+    patients whose move is in progress. The directory only holds those
+    exceptions, so it is read whole and refreshed at most every
+    ``refresh_seconds`` by whichever request needs it first.
+
+    ``on_change`` is called with the patients whose entry changed since the
+    previous read, e.g. to drop what was cached from their old shard.
+    """
+
+    def __init__(
+        self,
+        engines: Dict[str, object],
+        directory_bind,
+        vnodes: int = 64,
+        refresh_seconds: float = 5.0,
+        on_change: Optional[Callable[[List[int]], None]] = None,
+    ):
+        self.engines = engines
+        self.ring = HashRing(list(engines), vnodes)
+        self.directory_bind = directory_bind
+        self.refresh_seconds = refresh_seconds
+        self.on_change = on_change
+        self._directory: Dict[int, Tuple[str, Optional[str]]] = {}
+        self._loaded_at: Optional[float] = None
+        self._read_once = False
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    def _refresh(self) -> None:
+        loaded_at = self._loaded_at
+        if loaded_at is not None and time.monotonic() - loaded_at < self.refresh_seconds:
+            return
+        # Only the first load blocks; later ones keep serving the old copy
+        if not self._lock.acquire(blocking=loaded_at is None):
+            return
+        try:
+            if self._loaded_at is not loaded_at:
+                return  # another thread refreshed while we waited
+            try:
+                with self.directory_bind.connect() as conn:
+                    rows = conn.execute(DIRECTORY_SQL).all()
+                previous = self._directory
+                self._directory = {row[0]: (row[1], row[2]) for row in rows}
+                if self.on_change is not None and self._read_once:
+                    changed = [
+                        patient_id
+                        for patient_id in previous.keys() | self._directory.keys()
+                        if previous.get(patient_id) != self._directory.get(patient_id)
+                    ]
+                    if changed:
+                        self.on_change(changed)
+                self._read_once = True
+            except Exception:
+                logger.warning("Reading the shard directory failed", exc_info=True)
+            self._loaded_at = time.monotonic()
+        finally:
+            self._lock.release()
+
+    def invalidate(self) -> None:
+        """Read the directory again on the next lookup"""
+        self._loaded_at = None
+
+    def locate(self, patient_id: int) -> Tuple[str, Optional[str]]:
+        """(shard holding the patient's rows, shard they are moving to or None)"""
+        self._refresh()
+        entry = self._directory.get(patient_id)
+        if entry is not None and entry[0] in self.engines:
+            return entry
+        return self.ring.shard_for(patient_id), None
+
+    def scatter(self, fn: Callable[[Session], list]) -> list:
+        """Call ``fn`` with a session on every shard in parallel; results concatenated"""
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=len(self.engines), thread_name_prefix="shard-scatter"
+            )
+
+        def run(name):
+            SHARD_QUERIES.labels(name, "scatter").inc()
+            with Session(bind=self.engines[name]) as db:
+                return fn(db)
+
+        results = []
+        for rows in self._pool.map(run, list(self.engines)):
+            results.extend(rows)
+        return results
+
+    def merge(
+        self, fn: Callable[[Session], Iterable], key: Callable, reverse: bool = False
+    ) -> Iterator:
+        """Stream ``fn``'s rows from every shard as one sequence sorted by ``key``
+
+        ``fn`` must return its rows sorted by ``key`` (a streamed query), so
+        only one row per shard is held at a time. Sessions are opened on the
+        first row and closed when the stream ends.
+        """
+        sessions = []
+        try:
+            for name, engine in self.engines.items():
+                SHARD_QUERIES.labels(name, "scatter").inc()
+                sessions.append(Session(bind=engine))
+            yield from heapq.merge(
+                *(fn(db) for db in sessions), key=key, reverse=reverse
+            )
+        finally:
+            for db in sessions:
+                db.close()
+
+
+def parse_shard_urls(value: str) -> Dict[str, str]:
+    """``"a=postgresql://...,b=postgresql://..."`` -> {"a": ..., "b": ...}"""
+    urls = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        name, sep, url = item.partition("=")
+        if not sep or not name.strip() or not url.strip():
+            raise ValueError(f"SHARD_URLS entries look like name=url, got {item!r}")
+        urls[name.strip()] = url.strip()
+    return urls
+
+
+def use_shard(db: Session, patient_id: int) -> None:
+    """Route the session's queries on sharded tables to this patient's shard"""
+    db.info["shard_key"] = patient_id
+
+
+def shard_key_for(user, request) -> Optional[int]:
+    """The patient whose rows a request works on
+
+    Patients only reach their own rows. Doctors name the patient with a
+    ``patient_id`` path or query parameter; otherwise their own id is used.
+    """
+    if user.role != "patient":
+        value = request.path_params.get("patient_id") or request.query_params.get(
+            "patient_id"
+        )
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            pass
+    return user.id
+
+
+def create_shard_schema(engine, metadata: MetaData) -> List[str]:
+    """Create the sharded tables, and columns and indexes they lack, on a shard
+
+    Foreign keys to users are left out: users live on the primary. Returns
+    the DDL it ran.
+    """
+    shard_metadata = MetaData()
+    for name in SHARDED_TABLES:
+        table = metadata.tables[name].to_metadata(shard_metadata)
+        for constraint in list(table.foreign_key_constraints):
+            table.constraints.discard(constraint)
+        for column in table.columns:
+            column.foreign_keys.clear()
+        table.foreign_keys.clear()
+
+    applied = []
+    existing = inspect(engine).get_table_names()
+    with engine.begin() as conn:
+        for table in shard_metadata.sorted_tables:
+            if table.name not in existing:
+                table.create(conn)
+                applied.append(f"create {table.name}")
+                continue
+            have = {column["name"] for column in inspect(conn).get_columns(table.name)}
+            for column in table.columns:
+                if column.name in have:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} " + (
+                    column.type.compile(conn.dialect)
+                )
+                if column.server_default is not None:
+                    default = column.server_default.arg
+                    ddl += f" DEFAULT {getattr(default, 'text', default)}"
+                conn.execute(text(ddl))
+                applied.append(f"add {table.name}.{column.name}")
+            indexes = {index["name"] for index in inspect(conn).get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    index.create(conn)
+                    applied.append(f"index {index.name}")
+    return applied
+
+
+async def shard_key_required_handler(request, exc):
+    return JSONResponse(
+        status_code=400,
+        content={"detail": "This request needs a patient_id to find the patient's data"},
+    )
+
+
+async def shard_moving_handler(request, exc):
+    """The patient's data is mid-move: retry shortly, like any other 503"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Patient data is being moved, please retry"},
+        headers=busy_headers(),
+    )
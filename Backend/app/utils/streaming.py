@@ -0,0 +1,57 @@
+from typing import Callable, Iterable, Iterator, Optional, Tuple, Type
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from config import settings
+from app.utils.fieldsets import trimmed_model
+
+NDJSON = "application/x-ndjson"
+
+
+def wants_ndjson(request: Request) -> bool:
+    """Whether the client asked for one JSON object per line (opt-in streaming)"""
+    return NDJSON in request.headers.get("accept", "")
+
+
+def streamed(query):
+    """``query`` read through a server-side cursor, STREAM_BATCH_SIZE rows at a time"""
+    return query.yield_per(settings.STREAM_BATCH_SIZE)
+
+
+def _chunks(rows: Iterable, size: int) -> Iterator[list]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def stream_ndjson(
+    rows: Iterable,
+    schema: Type[BaseModel],
+    names: Optional[Tuple[str, ...]],
+    response: Response,
+    prepare: Optional[Callable[[list], None]] = None,
+) -> StreamingResponse:
+    """Serialize rows one per line as they are read, keeping headers set on ``response``
+
+    ``rows`` is a streamed() query (or several merged), so neither the rows
+    nor the body are ever held in full: each batch is serialized and sent
+    before the next is fetched. ``prepare`` fills in derived fields (names)
+    on a batch before it is serialized.
+    """
+    model = trimmed_model(schema, names) if names else schema
+
+    def lines() -> Iterator[bytes]:
+        for chunk in _chunks(rows, settings.STREAM_BATCH_SIZE):
+            if prepare is not None:
+                prepare(chunk)
+            yield b"".join(
+                model.model_validate(row).model_dump_json().encode() + b"\n"
+                for row in chunk
+            )
+
+    return StreamingResponse(lines(), media_type=NDJSON, headers=dict(response.headers))
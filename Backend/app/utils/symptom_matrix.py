@@ -0,0 +1,128 @@
+import bisect
+import math
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+PERIODS = ("day", "week", "month")
+
+
+def _bitset(positions: Iterable[int], size: int) -> int:
+    """An int with the given bits set, built in one pass over a bytearray"""
+    raw = bytearray((size + 7) // 8)
+    for i in positions:
+        raw[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(raw, "little")
+
+
+def _range_mask(start: int, end: int) -> int:
+    """Bits start..end-1"""
+    return ((1 << end) - 1) ^ ((1 << start) - 1)
+
+
+def period_start(moment: datetime, period: str) -> date:
+    day = moment.date()
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    if period == "month":
+        return day.replace(day=1)
+    return day
+
+
+def next_period(start: date, period: str) -> date:
+    if period == "week":
+        return start + timedelta(days=7)
+    if period == "month":
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+class TagMatrix:
+    """Diary entries x symptom tags as one bitset per tag
+
+    Bit i of a tag's bitset is set when entry i has the tag; each bit of
+    the severity is a bitset too. Counting co-occurrences, entries per
+    period or severity totals is then a bitwise AND and a popcount over
+    Python ints, which run in C a machine word at a time instead of once
+    per entry.
+    Entries must be sorted by date, so every period is a contiguous range
+    of bits.
+    """
+
+    def __init__(self, entries: Sequence[Tuple[datetime, int, Sequence[int]]]):
+        self.size = len(entries)
+        self.dates = [entry[0] for entry in entries]
+        positions: Dict[int, List[int]] = {}
+        for i, (_, _, tag_ids) in enumerate(entries):
+            for tag_id in tag_ids:
+                positions.setdefault(tag_id, []).append(i)
+        self.tags = {tag_id: _bitset(rows, self.size) for tag_id, rows in positions.items()}
+        severities = [max(0, entry[1]) for entry in entries]
+        self.severity_planes = [
+            _bitset((i for i, value in enumerate(severities) if value >> k & 1), self.size)
+            for k in range(max(severities, default=0).bit_length())
+        ]
+        self.severity_total = sum(severities)
+        self.severity_squares = sum(value * value for value in severities)
+
+    def count(self, tag_id: int, mask: Optional[int] = None) -> int:
+        bits = self.tags.get(tag_id, 0)
+        return (bits if mask is None else bits & mask).bit_count()
+
+    def co_occurrence(self, tag_id: int) -> Dict[int, int]:
+        """Entries having both ``tag_id`` and each other tag"""
+        bits = self.tags.get(tag_id, 0)
+        counts = {}
+        for other, other_bits in self.tags.items():
+            if other != tag_id:
+                both = (bits & other_bits).bit_count()
+                if both:
+                    counts[other] = both
+        return counts
+
+    def severity_sum(self, bits: int) -> int:
+        return sum(
+            (plane & bits).bit_count() << k for k, plane in enumerate(self.severity_planes)
+        )
+
+    def severity_stats(self, tag_id: int) -> dict:
+        """Mean severity with and without the tag, and their correlation
+
+        The correlation is the point-biserial one between having the tag
+        and severity; None when either group is empty or severity is constant.
+        """
+        bits = self.tags.get(tag_id, 0)
+        with_tag = bits.bit_count()
+        without = self.size - with_tag
+        total_with = self.severity_sum(bits)
+        mean_with = total_with / with_tag if with_tag else None
+        mean_without = (self.severity_total - total_with) / without if without else None
+        correlation = None
+        if with_tag and without:
+            mean = self.severity_total / self.size
+            variance = self.severity_squares / self.size - mean * mean
+            if variance > 1e-12:
+                share = with_tag / self.size
+                correlation = (
+                    (mean_with - mean_without) * math.sqrt(share * (1 - share))
+                    / math.sqrt(variance)
+                )
+        return {
+            "entries": with_tag,
+            "mean_severity": mean_with,
+            "mean_without": mean_without,
+            "correlation": correlation,
+        }
+
+    def periods(self, period: str) -> List[Tuple[date, int]]:
+        """(period start, mask of its entries) for each period with entries"""
+        buckets = []
+        first = 0
+        while first < self.size:
+            start = period_start(self.dates[first], period)
+            # Dates are sorted: the period ends at the first entry of the next
+            end = bisect.bisect_left(
+                self.dates, datetime.combine(next_period(start, period), time.min), first
+            )
+            buckets.append((start, _range_mask(first, end)))
+            first = end
+        return buckets
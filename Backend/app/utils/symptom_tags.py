@@ -0,0 +1,92 @@
+import re
+from typing import List
+
+# Tags come from free text and each new one is a row in symptom_tags, so
+# longer phrases (sentences rather than symptoms) and extra tags are dropped
+MAX_TAG_LENGTH = 100
+MAX_TAG_WORDS = 5
+MAX_TAGS = 20
+
+# Common spellings of the same symptom -> the tag used for it
+SYNONYMS = {
+    "head ache": "headache",
+    "headaches": "headache",
+    "migraine": "headache",
+    "temperature": "fever",
+    "high temperature": "fever",
+    "feverish": "fever",
+    "stomach ache": "abdominal pain",
+    "stomachache": "abdominal pain",
+    "stomach pain": "abdominal pain",
+    "tummy ache": "abdominal pain",
+    "belly pain": "abdominal pain",
+    "vomit": "vomiting",
+    "throwing up": "vomiting",
+    "nauseous": "nausea",
+    "feeling sick": "nausea",
+    "coughing": "cough",
+    "dry cough": "cough",
+    "tired": "fatigue",
+    "tiredness": "fatigue",
+    "exhaustion": "fatigue",
+    "exhausted": "fatigue",
+    "dizzy": "dizziness",
+    "light headed": "dizziness",
+    "lightheaded": "dizziness",
+    "short of breath": "shortness of breath",
+    "short breath": "shortness of breath",
+    "breathlessness": "shortness of breath",
+    "breathless": "shortness of breath",
+    "itch": "itching",
+    "itchy": "itching",
+    "cant sleep": "insomnia",
+    "sleeplessness": "insomnia",
+    "runny nose": "runny nose",
+    "blocked nose": "nasal congestion",
+    "stuffy nose": "nasal congestion",
+    "loose motions": "diarrhea",
+    "diarrhoea": "diarrhea",
+    "body ache": "body pain",
+    "body aches": "body pain",
+    "joint ache": "joint pain",
+    "back ache": "back pain",
+    "backache": "back pain",
+    "chest ache": "chest pain",
+}
+
+# Words that qualify a symptom rather than name it
+MODIFIERS = frozenset(
+    {"a", "an", "the", "some", "bit", "of", "little", "lot", "very", "really",
+     "mild", "slight", "slightly", "moderate", "severe", "bad", "terrible",
+     "constant", "occasional", "sharp", "dull", "minor", "extreme", "feeling",
+     "i", "im", "am", "have", "had", "got", "my"}
+)
+
+_SPLIT_RE = re.compile(r"[,;/+&\n.]|\band\b|\bwith\b|\bplus\b")
+# How long or since when: "for 3 days", "since monday"
+_DURATION_RE = re.compile(r"\b(?:for|since)\b.*$")
+_NON_WORD_RE = re.compile(r"[^a-z]+")
+
+
+def symptom_tags(text: str) -> List[str]:
+    """"Mild headache, fever and a dry cough" -> ["headache", "fever", "cough"]"""
+    tags = []
+    for part in _SPLIT_RE.split(text.lower().replace("'", "")):
+        # Readings like "101F" are not part of the symptom either
+        part = " ".join(
+            word for word in _DURATION_RE.sub("", part).split() if not re.search(r"\d", word)
+        )
+        tag = " ".join(
+            word for word in _NON_WORD_RE.sub(" ", part).split() if word not in MODIFIERS
+        )
+        tag = SYNONYMS.get(tag, tag)
+        if (
+            tag
+            and len(tag) <= MAX_TAG_LENGTH
+            and tag.count(" ") < MAX_TAG_WORDS
+            and tag not in tags
+        ):
+            tags.append(tag)
+            if len(tags) == MAX_TAGS:
+                break
+    return tags
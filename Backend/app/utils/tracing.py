@@ -0,0 +1,418 @@
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+import urllib.request
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from sqlalchemy import event
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "healthcare-prototyper-api"
+TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+# Log line format once tracing is on, so log lines can be joined to spans
+LOG_FORMAT = (
+    "%(asctime)s %(levelname)s %(name)s "
+    "trace=%(trace_id)s span=%(span_id)s %(message)s"
+)
+
+# Span kinds and status codes as numbered in the OTLP protobuf
+KIND_INTERNAL, KIND_SERVER, KIND_CLIENT = 1, 2, 3
+STATUS_UNSET, STATUS_OK, STATUS_ERROR = 0, 1, 2
+
+
+@dataclass
+class Span:
+    """One timed operation; field names follow the OTLP span model"""
+
+    name: str
+    trace_id: str
+    span_id: str
+    parent_span_id: str = ""
+    kind: int = KIND_INTERNAL
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: int = 0
+    attributes: Dict[str, object] = field(default_factory=dict)
+    status: int = STATUS_UNSET
+    sampled: bool = True
+
+    def set_attribute(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    def end(self, end_ns: Optional[int] = None) -> None:
+        self.end_ns = end_ns or time.time_ns()
+        if self.sampled:
+            _processor.enqueue(self)
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def to_otlp(self) -> dict:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [
+                {"key": key, "value": _otlp_value(value)}
+                for key, value in self.attributes.items()
+            ],
+            "status": {"code": self.status},
+        }
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar(
+    "current_span", default=None
+)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def _new_id(nbytes: int) -> str:
+    return format(random.getrandbits(nbytes * 8), f"0{nbytes * 2}x")
+
+
+def start_span(
+    name: str, parent: Optional[Span] = None, kind: int = KIND_INTERNAL, **attributes
+) -> Span:
+    """Start a child of ``parent`` (or of the current span)"""
+    parent = parent or _current_span.get()
+    return Span(
+        name=name,
+        trace_id=parent.trace_id,
+        span_id=_new_id(8),
+        parent_span_id=parent.span_id,
+        kind=kind,
+        attributes=attributes,
+        sampled=parent.sampled,
+    )
+
+
+@contextlib.contextmanager
+def span(name: str, **attributes):
+    """Time a block as a child of the current span; a no-op outside a trace"""
+    parent = _current_span.get()
+    if parent is None or not parent.sampled:
+        yield None
+        return
+    child = start_span(name, parent, **attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as exc:
+        child.status = STATUS_ERROR
+        child.set_attribute("exception.type", type(exc).__name__)
+        raise
+    finally:
+        _current_span.reset(token)
+        child.end()
+
+
+def record_span(name: str, start_ns: int, end_ns: int, **attributes) -> None:
+    """Add an already finished child span to the current trace"""
+    parent = _current_span.get()
+    if parent is not None and parent.sampled:
+        child = start_span(name, parent, **attributes)
+        child.start_ns = start_ns
+        child.end(end_ns)
+
+
+def set_route(route: str) -> None:
+    """Name the request's server span after its route template"""
+    root = _current_span.get()
+    if root is not None and root.kind == KIND_SERVER:
+        root.name = f"{root.attributes['http.method']} {route}"
+        root.set_attribute("http.route", route)
+
+
+class FileExporter:
+    """Appends one OTLP-JSON span per line, for local inspection or replay"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, spans: List[Span]) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a") as fh:
+            for item in spans:
+                fh.write(json.dumps(item.to_otlp()) + "\n")
+
+
+class OTLPHttpExporter:
+    """Posts spans to an OpenTelemetry collector's OTLP/HTTP JSON endpoint"""
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+
+    def export(self, spans: List[Span]) -> None:
+        body = {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [
+                            {
+                                "key": "service.name",
+                                "value": {"stringValue": SERVICE_NAME},
+                            }
+                        ]
+                    },
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": __name__},
+                            "spans": [item.to_otlp() for item in spans],
+                        }
+                    ],
+                }
+            ]
+        }
+        request = urllib.request.Request(
+            self.endpoint,
+            data=json.dumps(body).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=5):
+            pass
+
+
+class BatchSpanProcessor:
+    """Queues finished spans and exports them in batches off the request path"""
+
+    def __init__(
+        self, max_queue: int = 10_000, batch_size: int = 512, delay: float = 1.0
+    ):
+        self.exporter = None
+        self.batch_size = batch_size
+        self.delay = delay
+        self.dropped = 0
+        self._queue: "queue.Queue[Span]" = queue.Queue(max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        # The export thread does not survive fork; start a new one on demand
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self) -> None:
+        self._thread = None
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(self._queue.maxsize)
+
+    def enqueue(self, item: Span) -> None:
+        if self.exporter is None:
+            return
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="span-exporter", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.delay
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._export(batch)
+
+    def _export(self, batch: List[Span]) -> None:
+        try:
+            self.exporter.export(batch)
+        except Exception:
+            logger.warning("Exporting %d spans failed", len(batch), exc_info=True)
+
+    def flush(self) -> None:
+        """Export everything queued so far (used at shutdown)"""
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch and self.exporter is not None:
+            self._export(batch)
+
+
+_processor = BatchSpanProcessor()
+
+
+def configure_tracing() -> None:
+    """Select the exporter from settings and add trace ids to log lines
+
+    Every record gets ``trace_id`` and ``span_id`` attributes, and the root
+    logger's handlers (one is added if there are none) format with
+    LOG_FORMAT to show them.
+    """
+    if settings.TRACING_EXPORTER == "file":
+        _processor.exporter = FileExporter(settings.TRACING_FILE)
+    elif settings.TRACING_EXPORTER == "otlp":
+        _processor.exporter = OTLPHttpExporter(settings.TRACING_OTLP_ENDPOINT)
+    else:
+        raise ValueError(f"Unknown TRACING_EXPORTER: {settings.TRACING_EXPORTER}")
+
+    factory = logging.getLogRecordFactory()
+
+    def record_factory(*args, **kwargs):
+        record = factory(*args, **kwargs)
+        active = _current_span.get()
+        record.trace_id = active.trace_id if active else "0" * 32
+        record.span_id = active.span_id if active else "0" * 16
+        return record
+
+    logging.setLogRecordFactory(record_factory)
+
+    root = logging.getLogger()
+    if not root.handlers:
+        root.addHandler(logging.StreamHandler())
+    # Defaults for records built without the factory (e.g. makeLogRecord)
+    defaults = {"trace_id": "0" * 32, "span_id": "0" * 16}
+    for handler in root.handlers:
+        handler.setFormatter(logging.Formatter(LOG_FORMAT, defaults=defaults))
+
+
+def flush_spans() -> None:
+    _processor.flush()
+
+
+def trace_engine(engine) -> None:
+    """Emit one client span per SQL statement"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        parent = _current_span.get()
+        if parent is not None and parent.sampled:
+            conn.info.setdefault("trace_spans", []).append(
+                start_span(
+                    "db.query",
+                    parent,
+                    kind=KIND_CLIENT,
+                    **{
+                        "db.system": engine.dialect.name,
+                        # Statement text only: parameters may hold patient data
+                        "db.statement": statement[:1000],
+                    },
+                )
+            )
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_execute(conn, cursor, statement, parameters, context, executemany):
+        spans = conn.info.get("trace_spans")
+        if spans:
+            item = spans.pop()
+            if cursor.rowcount >= 0:
+                item.set_attribute("db.rows_affected", cursor.rowcount)
+            item.end()
+
+    @event.listens_for(engine, "handle_error")
+    def _on_error(context):
+        conn = context.connection
+        spans = conn.info.get("trace_spans") if conn is not None else None
+        if spans:
+            item = spans.pop()
+            item.status = STATUS_ERROR
+            item.end()
+
+
+class TracingMiddleware:
+    """Starts a server span per request, continuing an incoming traceparent"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        parent = _current_span.get()  # set for sub-requests of a batch
+        attributes = {"http.method": scope["method"], "http.target": scope["path"]}
+        if parent is not None:
+            root = start_span(scope["method"], parent, kind=KIND_SERVER, **attributes)
+        else:
+            root = self._root_span(scope, attributes)
+
+        token = _current_span.set(root)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                root.set_attribute("http.status_code", message["status"])
+                if message["status"] >= 500:
+                    root.status = STATUS_ERROR
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"traceparent", root.traceparent.encode()),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException:
+            root.status = STATUS_ERROR
+            raise
+        finally:
+            _current_span.reset(token)
+            root.end()
+
+    @staticmethod
+    def _root_span(scope, attributes: dict) -> Span:
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                match = TRACEPARENT.match(value.decode("latin-1").strip().lower())
+                if match:
+                    trace_id, parent_id, flags = match.groups()
+                    return Span(
+                        name=scope["method"],
+                        trace_id=trace_id,
+                        span_id=_new_id(8),
+                        parent_span_id=parent_id,
+                        kind=KIND_SERVER,
+                        attributes=attributes,
+                        sampled=bool(int(flags, 16) & 1),
+                    )
+                break
+        return Span(
+            name=scope["method"],
+            trace_id=_new_id(16),
+            span_id=_new_id(8),
+            kind=KIND_SERVER,
+            attributes=attributes,
+            sampled=random.random() < settings.TRACING_SAMPLE_RATE,
+        )
@@ -0,0 +1,54 @@
+"""Compare two benchmark result files route by route.
+
+Usage:
+    python -m benchmarks.compare baseline.json candidate.json --threshold 0.10
+
+Exits with status 1 when any route's p95 latency grew by more than the
+threshold (relative), so it can gate a CI job.
+"""
+import argparse
+import json
+
+
+def compare(baseline: dict, candidate: dict, threshold: float):
+    rows, regressions = [], []
+    for route, base in sorted(baseline["routes"].items()):
+        cand = candidate["routes"].get(route)
+        if cand is None:
+            continue
+        change = (cand["p95_ms"] - base["p95_ms"]) / base["p95_ms"] if base["p95_ms"] else 0.0
+        rows.append((route, base, cand, change))
+        if change > threshold:
+            regressions.append(route)
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.10)
+    args = parser.parse_args()
+
+    with open(args.baseline) as fh:
+        baseline = json.load(fh)
+    with open(args.candidate) as fh:
+        candidate = json.load(fh)
+
+    rows, regressions = compare(baseline, candidate, args.threshold)
+    print(f"{'route':<50} {'p50 ms':>16} {'p95 ms':>16} {'p99 ms':>16} {'rps':>14}")
+    for route, base, cand, change in rows:
+        print(
+            f"{route:<50} "
+            f"{base['p50_ms']:>7.2f}->{cand['p50_ms']:<7.2f} "
+            f"{base['p95_ms']:>7.2f}->{cand['p95_ms']:<7.2f} "
+            f"{base['p99_ms']:>7.2f}->{cand['p99_ms']:<7.2f} "
+            f"{base['throughput_rps']:>6.0f}->{cand['throughput_rps']:<6.0f}"
+            f"{'  REGRESSION' if route in regressions else ''}"
+        )
+    if regressions:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
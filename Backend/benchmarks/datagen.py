@@ -0,0 +1,297 @@
+"""Bulk-generate a realistic dataset for benchmarks.
+
+Usage:
+    DATABASE_URL=sqlite:///bench.db SECRET_KEY=bench \
+        python -m benchmarks.datagen --patients 1000 --doctors 50
+
+Rows are written with COPY on PostgreSQL and multi-row INSERTs elsewhere,
+with explicit ids so the load generator can address them. The target
+database must be empty. The same --seed always yields the same data.
+With --upload-dir (the API server's working directory), the files the
+health records point at are created too, so downloads find them.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import random
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, text
+from app.models.appointment import AppointmentStatus
+from app.models.health_record import RecordType
+from app.models.reminder import ReminderType
+from app.models.user import UserRole
+
+FIRST_NAMES = [
+    "Aarav", "Aditi", "Arjun", "Divya", "Farhan", "Gauri", "Ishaan", "Kavya",
+    "Lakshmi", "Manish", "Neha", "Pranav", "Rahul", "Riya", "Sanjay", "Sneha",
+    "Tanvi", "Varun", "Vikram", "Zoya",
+]
+LAST_NAMES = [
+    "Agarwal", "Bose", "Chowdhury", "Das", "Gupta", "Iyer", "Joshi", "Kapoor",
+    "Khan", "Menon", "Nair", "Patel", "Rao", "Reddy", "Shah", "Sharma",
+    "Singh", "Teja", "Varma", "Yadav",
+]
+MEDICINES = [
+    "Paracetamol", "Metformin", "Amlodipine", "Atorvastatin", "Omeprazole",
+    "Amoxicillin", "Losartan", "Levothyroxine", "Cetirizine", "Aspirin",
+    "Pantoprazole", "Azithromycin", "Telmisartan", "Glimepiride", "Montelukast",
+]
+SYMPTOMS = [
+    "headache", "fever", "cough", "fatigue", "nausea", "dizziness",
+    "back pain", "sore throat", "chest tightness", "insomnia", "joint pain",
+]
+TIMES = ["08:00", "13:00", "18:00", "21:00"]
+TIMINGS = ["Morning", "Morning, Evening", "Morning, Afternoon, Night", "Night"]
+
+
+@dataclass
+class Counts:
+    doctors: int = 20
+    patients: int = 500
+    appointments_per_patient: int = 4
+    messages_per_patient: int = 20
+    symptoms_per_patient: int = 30
+    medications_per_patient: int = 5
+    reminders_per_patient: int = 4
+    prescriptions_per_patient: int = 3
+    records_per_patient: int = 2
+
+
+def _text(rng: random.Random, low: int, high: int) -> str:
+    words = []
+    target = rng.randint(low, high)
+    while sum(len(w) + 1 for w in words) < target:
+        words.append(rng.choice(SYMPTOMS + MEDICINES + LAST_NAMES).lower())
+    return " ".join(words)[:high]
+
+
+def generate(counts: Counts, seed: int = 0):
+    """Yield (table, columns, rows) with explicit primary keys"""
+    rng = random.Random(seed)
+    now = datetime.utcnow().replace(microsecond=0)
+
+    from app.utils.security import get_password_hash
+
+    # Hash once: argon2 per row would dominate generation time
+    password = get_password_hash("bench-password")
+
+    user_cols = ["id", "name", "email", "password", "role", "created_at"]
+    users = []
+    doctor_ids = list(range(1, counts.doctors + 1))
+    patient_ids = list(range(counts.doctors + 1, counts.doctors + counts.patients + 1))
+    for uid in doctor_ids + patient_ids:
+        role = UserRole.DOCTOR if uid <= counts.doctors else UserRole.PATIENT
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        users.append(
+            [uid, name, f"{role.value}{uid}@bench.example.com", password, role,
+             now - timedelta(days=365)]
+        )
+    yield "users", user_cols, users
+
+    appt_cols = ["id", "patient_id", "doctor_id", "date", "reason", "status", "created_at"]
+    appts, aid = [], 0
+    pairs = {}
+    for pid in patient_ids:
+        pairs[pid] = rng.sample(doctor_ids, min(2, len(doctor_ids)))
+        for _ in range(counts.appointments_per_patient):
+            aid += 1
+            appts.append(
+                [
+                    aid,
+                    pid,
+                    rng.choice(pairs[pid]),
+                    now + timedelta(days=rng.randint(-120, 60), hours=rng.randint(8, 17)),
+                    _text(rng, 100, 500),
+                    rng.choice(list(AppointmentStatus)),
+                    now - timedelta(days=rng.randint(0, 180)),
+                ]
+            )
+    yield "appointments", appt_cols, appts
+
+    msg_cols = ["id", "sender_id", "receiver_id", "message", "timestamp", "is_read"]
+    msgs, mid = [], 0
+    for pid in patient_ids:
+        for i in range(counts.messages_per_patient):
+            mid += 1
+            doctor = rng.choice(pairs[pid])
+            sender, receiver = (pid, doctor) if i % 2 == 0 else (doctor, pid)
+            msgs.append(
+                [mid, sender, receiver, _text(rng, 20, 400),
+                 now - timedelta(minutes=rng.randint(0, 200_000)), rng.randint(0, 1)]
+            )
+    yield "messages", msg_cols, msgs
+
+    sd_cols = ["id", "user_id", "date", "symptoms", "severity", "notes", "created_at"]
+    entries, sid = [], 0
+    for pid in patient_ids:
+        for _ in range(counts.symptoms_per_patient):
+            sid += 1
+            when = now - timedelta(days=rng.randint(0, 365))
+            symptoms = ", ".join(rng.sample(SYMPTOMS, rng.randint(1, 3)))
+            entries.append(
+                [sid, pid, when, symptoms, rng.randint(1, 10), _text(rng, 0, 800), when]
+            )
+    yield "symptom_diary", sd_cols, entries
+
+    med_cols = ["id", "user_id", "name", "dosage", "time", "total_tablets",
+                "remaining_tablets", "created_at"]
+    meds, med_id = [], 0
+    for pid in patient_ids:
+        for _ in range(counts.medications_per_patient):
+            med_id += 1
+            total = rng.choice([10, 15, 30, 60])
+            meds.append(
+                [med_id, pid, rng.choice(MEDICINES), f"{rng.choice([5, 10, 250, 500])}mg",
+                 rng.choice(TIMES), total, rng.randint(0, total), now]
+            )
+    yield "medications", med_cols, meds
+
+    rem_cols = ["id", "user_id", "type", "title", "time", "is_active", "created_at"]
+    rems, rid = [], 0
+    for pid in patient_ids:
+        for _ in range(counts.reminders_per_patient):
+            rid += 1
+            rems.append(
+                [rid, pid, rng.choice(list(ReminderType)), f"Reminder {rid}",
+                 rng.choice(TIMES), rng.choice([0, 1, 1, 1]), now]
+            )
+    yield "reminders", rem_cols, rems
+
+    rx_cols = ["id", "patient_id", "doctor_id", "medicine", "dosage", "timing",
+               "duration", "notes", "created_at"]
+    rxs, rxid = [], 0
+    for pid in patient_ids:
+        for _ in range(counts.prescriptions_per_patient):
+            rxid += 1
+            rxs.append(
+                [rxid, pid, rng.choice(pairs[pid]), rng.choice(MEDICINES), "500mg",
+                 rng.choice(TIMINGS), f"{rng.choice([5, 7, 14, 30])} days",
+                 _text(rng, 0, 500), now - timedelta(days=rng.randint(0, 90))]
+            )
+    yield "prescriptions", rx_cols, rxs
+
+    hr_cols = ["id", "patient_id", "type", "title", "file_url", "uploaded_at", "notes"]
+    records, hid = [], 0
+    for pid in patient_ids:
+        for _ in range(counts.records_per_patient):
+            hid += 1
+            records.append(
+                [hid, pid, rng.choice(list(RecordType)), f"Report {hid}",
+                 f"/uploads/lab-reports/{pid}_{hid}.pdf", now, _text(rng, 0, 500)]
+            )
+    yield "health_records", hr_cols, records
+
+
+def _copy_value(value):
+    if value is None:
+        return "\\N"
+    if hasattr(value, "name") and hasattr(value, "value"):
+        return value.name  # SQLAlchemy stores Enum members by name
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    return str(value)
+
+
+def _load_postgres(engine, table, columns, rows):
+    buf = io.StringIO()
+    writer = csv.writer(buf, delimiter="\t", quotechar='"', lineterminator="\n")
+    for row in rows:
+        writer.writerow([_copy_value(v) for v in row])
+    buf.seek(0)
+    raw = engine.raw_connection()
+    try:
+        with raw.cursor() as cur:
+            cur.copy_expert(
+                f"COPY {table} ({', '.join(columns)}) FROM STDIN "
+                "WITH (FORMAT csv, DELIMITER E'\\t', NULL '\\N')",
+                buf,
+            )
+            cur.execute(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                f"(SELECT COALESCE(MAX(id), 1) FROM {table}))"
+            )
+        raw.commit()
+    finally:
+        raw.close()
+
+
+def _load_generic(engine, table, columns, rows, chunk=5000):
+    from database import Base
+
+    tbl = Base.metadata.tables[table]
+    with engine.begin() as conn:
+        for start in range(0, len(rows), chunk):
+            conn.execute(
+                tbl.insert(),
+                [dict(zip(columns, row)) for row in rows[start : start + chunk]],
+            )
+
+
+def create_schema(engine) -> None:
+    """Bring an empty database to the latest migration"""
+    from database import upgrade_schema
+
+    upgrade_schema(engine)
+
+
+def load(database_url: str, counts: Counts, seed: int = 0) -> dict:
+    """Create the schema and load a generated dataset; returns row counts"""
+    engine = create_engine(database_url)
+    create_schema(engine)
+    with engine.connect() as conn:
+        if conn.execute(text("SELECT COUNT(*) FROM users")).scalar():
+            raise SystemExit("target database is not empty")
+
+    loaded = {}
+    started = time.perf_counter()
+    for table, columns, rows in generate(counts, seed):
+        if engine.dialect.name == "postgresql":
+            _load_postgres(engine, table, columns, rows)
+        else:
+            _load_generic(engine, table, columns, rows)
+        loaded[table] = len(rows)
+    loaded["seconds"] = round(time.perf_counter() - started, 3)
+    engine.dispose()
+    return loaded
+
+
+def write_record_files(database_url: str, root: str, size: int = 20_000) -> int:
+    """Create every health record's file under ``root``; returns how many"""
+    engine = create_engine(database_url)
+    with engine.connect() as conn:
+        paths = conn.execute(text("SELECT file_url FROM health_records")).scalars().all()
+    engine.dispose()
+    content = b"%PDF-1.4 " + b"x" * size
+    for path in paths:
+        target = os.path.join(root, path.lstrip("/"))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "wb") as f:
+            f.write(content)
+    return len(paths)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", help="defaults to settings.DATABASE_URL")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--upload-dir", help="create health record files under it")
+    for field, default in asdict(Counts()).items():
+        parser.add_argument(f"--{field.replace('_', '-')}", type=int, default=default)
+    args = parser.parse_args()
+
+    from config import settings
+
+    counts = Counts(**{f: getattr(args, f) for f in asdict(Counts())})
+    database_url = args.database_url or settings.DATABASE_URL
+    result = load(database_url, counts, args.seed)
+    if args.upload_dir:
+        result["record_files"] = write_record_files(database_url, args.upload_dir)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
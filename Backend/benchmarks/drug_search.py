@@ -0,0 +1,89 @@
+"""Measure drug name typeahead and matching over a synthetic dictionary.
+
+Usage:
+    python -m benchmarks.drug_search --drugs 100000 --synonyms 2
+
+Queries are prefixes of real names, as typed, and the same prefixes with
+one typo, which take the fuzzy path.
+"""
+import argparse
+import json
+import random
+import statistics
+import string
+import sys
+import time
+
+from app.utils.drug_dictionary import DrugDictionary
+
+PREFIX_LENGTHS = (2, 4, 6, 8)
+
+
+def _word(rng: random.Random) -> str:
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(6, 14)))
+
+
+def _typo(rng: random.Random, word: str) -> str:
+    i = rng.randrange(len(word))
+    return word[:i] + rng.choice(string.ascii_lowercase) + word[i + 1 :]
+
+
+def _timed(fn, inputs) -> dict:
+    times = []
+    for value in inputs:
+        started = time.perf_counter()
+        fn(value)
+        times.append(time.perf_counter() - started)
+    times.sort()
+    return {
+        "p50_us": round(times[len(times) // 2] * 1e6, 1),
+        "p99_us": round(times[int(len(times) * 0.99)] * 1e6, 1),
+        "mean_us": round(statistics.fmean(times) * 1e6, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--drugs", type=int, default=100_000)
+    parser.add_argument("--synonyms", type=int, default=2)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write JSON results here (default: stdout)")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    rows = [
+        (f"D{i}", _word(rng), [_word(rng) for _ in range(args.synonyms)])
+        for i in range(args.drugs)
+    ]
+    started = time.perf_counter()
+    dictionary = DrugDictionary.build(rows)
+    build = time.perf_counter() - started
+
+    names = [rng.choice(rows)[1] for _ in range(args.queries)]
+    search = {}
+    for length in PREFIX_LENGTHS:
+        typed = [name[:length] for name in names]
+        search[str(length)] = {
+            "exact": _timed(dictionary.search, typed),
+            "typo": _timed(dictionary.search, [_typo(rng, prefix) for prefix in typed]),
+        }
+    results = {
+        "drugs": args.drugs,
+        "names": len(dictionary.keys),
+        "build_s": round(build, 2),
+        "search": search,
+        "match_exact": _timed(dictionary.match, names),
+        "match_typo": _timed(dictionary.match, [_typo(rng, name) for name in names]),
+    }
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        sys.stdout.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Replay a traffic trace against a running API and report the 304 ratio.
+
+Usage:
+    python -m benchmarks.etag_replay --base-url http://127.0.0.1:8000
+    python -m benchmarks.etag_replay --trace trace.jsonl
+
+A trace is JSON lines of {"user": <index>, "method": "GET", "path": "...",
+"body": {...}}. Without --trace a synthetic one is generated: users navigate
+between the list pages and occasionally write, like the frontend does.
+"""
+import argparse
+import json
+import random
+import urllib.error
+import urllib.request
+import uuid
+
+LIST_PATHS = [
+    "/api/medications/",
+    "/api/reminders/",
+    "/api/appointments/",
+    "/api/prescriptions/",
+]
+
+
+def _call(base_url, method, path, token=None, body=None, headers=None):
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(base_url + path, data=data, method=method)
+    req.add_header("Content-Type", "application/json")
+    if token:
+        req.add_header("Authorization", f"Bearer {token}")
+    for key, value in (headers or {}).items():
+        req.add_header(key, value)
+    try:
+        with urllib.request.urlopen(req) as resp:
+            return resp.status, dict(resp.headers), resp.read()
+    except urllib.error.HTTPError as exc:
+        return exc.code, dict(exc.headers), exc.read()
+
+
+def _register(base_url, role):
+    body = {
+        "name": f"bench {role}",
+        "email": f"{role}-{uuid.uuid4().hex[:12]}@bench.example.com",
+        "password": "bench-password",
+        "role": role,
+    }
+    status, _, payload = _call(base_url, "POST", "/api/auth/register", body=body)
+    if status != 201:
+        raise SystemExit(f"register failed ({status}): {payload[:200]!r}")
+    data = json.loads(payload)
+    return data["access_token"], data["user"]["id"]
+
+
+def synthetic_trace(users, steps, write_ratio, doctor_id, seed=0):
+    """Generate a navigation-heavy trace with occasional writes"""
+    rng = random.Random(seed)
+    for _ in range(steps):
+        user = rng.randrange(users)
+        if rng.random() < write_ratio:
+            kind = rng.choice(["medication", "reminder", "appointment"])
+            if kind == "medication":
+                body = {
+                    "name": "Paracetamol",
+                    "dosage": "500mg",
+                    "time": "08:00",
+                    "total_tablets": 30,
+                    "remaining_tablets": 30,
+                }
+                yield {"user": user, "method": "POST", "path": "/api/medications/", "body": body}
+            elif kind == "reminder":
+                body = {"type": "medicine", "title": "Take meds", "time": "09:00"}
+                yield {"user": user, "method": "POST", "path": "/api/reminders/", "body": body}
+            else:
+                body = {"doctor_id": doctor_id, "date": "2030-01-01T10:00:00"}
+                yield {"user": user, "method": "POST", "path": "/api/appointments/", "body": body}
+        else:
+            yield {"user": user, "method": "GET", "path": rng.choice(LIST_PATHS)}
+
+
+def replay(base_url, tokens, trace):
+    """Replay a trace, revalidating GETs with the last ETag seen per user and path"""
+    etags = {}
+    gets = not_modified = 0
+    for event in trace:
+        token = tokens[event["user"] % len(tokens)]
+        key = (event["user"], event["path"])
+        headers = {}
+        if event["method"] == "GET" and key in etags:
+            headers["If-None-Match"] = etags[key]
+        status, resp_headers, _ = _call(
+            base_url, event["method"], event["path"], token, event.get("body"), headers
+        )
+        if event["method"] == "GET":
+            gets += 1
+            if status == 304:
+                not_modified += 1
+            tag = resp_headers.get("ETag") or resp_headers.get("etag")
+            if tag:
+                etags[key] = tag
+    return {
+        "get_requests": gets,
+        "not_modified": not_modified,
+        "not_modified_ratio": not_modified / gets if gets else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--trace", help="JSON lines trace file to replay")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--steps", type=int, default=2000)
+    parser.add_argument("--write-ratio", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    _, doctor_id = _register(args.base_url, "doctor")
+    tokens = [_register(args.base_url, "patient")[0] for _ in range(args.users)]
+
+    if args.trace:
+        with open(args.trace) as fh:
+            trace = [json.loads(line) for line in fh if line.strip()]
+    else:
+        trace = synthetic_trace(
+            args.users, args.steps, args.write_ratio, doctor_id, args.seed
+        )
+
+    print(json.dumps(replay(args.base_url, tokens, trace), indent=2))
+
+
+if __name__ == "__main__":
+    main()
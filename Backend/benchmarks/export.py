@@ -0,0 +1,111 @@
+"""Measure cohort exports: throughput and peak memory as the export grows.
+
+Usage:
+    python -m benchmarks.export --rows 1000000 --patients 500
+    python -m benchmarks.export --format parquet --columns user_id,date,severity
+
+Synthetic symptom diary rows are written to a temporary SQLite database,
+then exported the way /api/doctors/export/symptoms does. Peak memory is
+the Python heap high-water mark (tracemalloc) while streaming, which
+should depend on --batch-size, not on --rows.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy import create_engine, insert  # noqa: E402
+
+from app.models.symptom_diary import SymptomDiary  # noqa: E402
+from app.services.export_services import export_columns, export_stream  # noqa: E402
+
+TEXTS = ("headache", "fever and cough", "nausea", "fatigue, dizziness", "back pain")
+
+
+def populate(engine, rows: int, patients: int, seed: int) -> None:
+    table = SymptomDiary.__table__
+    table.create(engine)
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    with engine.begin() as conn:
+        for first in range(0, rows, 10_000):
+            conn.execute(
+                insert(table),
+                [
+                    {
+                        "user_id": rng.randint(1, patients),
+                        "date": start + timedelta(minutes=rng.randrange(525_600)),
+                        "symptoms": rng.choice(TEXTS),
+                        "tag_ids": rng.sample(range(1, 40), rng.randint(1, 3)),
+                        "severity": rng.randint(1, 10),
+                        "created_at": start,
+                        "updated_at": start,
+                    }
+                    for _ in range(min(10_000, rows - first))
+                ],
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--patients", type=int, default=500)
+    parser.add_argument("--format", choices=("arrow", "parquet"), default="arrow")
+    parser.add_argument("--columns", help="comma separated (default: all)")
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write JSON results here (default: stdout)")
+    args = parser.parse_args()
+
+    columns = args.columns.split(",") if args.columns else export_columns("symptoms")
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'export.db')}")
+        started = time.perf_counter()
+        populate(engine, args.rows, args.patients, args.seed)
+        populate_s = time.perf_counter() - started
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        size = chunks = 0
+        binds = [(engine, list(range(1, args.patients + 1)))]
+        for chunk in export_stream(
+            "symptoms", args.format, binds, columns, batch_size=args.batch_size
+        ):
+            size += len(chunk)
+            chunks += 1
+        export_s = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        engine.dispose()
+
+    results = {
+        "rows": args.rows,
+        "format": args.format,
+        "columns": columns,
+        "batch_size": args.batch_size,
+        "populate_s": round(populate_s, 2),
+        "export_s": round(export_s, 2),
+        "rows_per_s": round(args.rows / export_s),
+        "bytes": size,
+        "chunks": chunks,
+        "peak_heap_mb": round(peak / 2**20, 1),
+    }
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        sys.stdout.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
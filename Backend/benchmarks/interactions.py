@@ -0,0 +1,118 @@
+"""Measure the drug interaction index: build, load and check times, and size.
+
+Usage:
+    python -m benchmarks.interactions --drugs 100000 --pairs 10000000
+    python -m benchmarks.interactions --output results/interactions.json
+
+A synthetic dataset is generated in memory: random pairs among --drugs
+drug names with random severities. "load" reads the compiled index the
+way a restarted process does; "check" times checking one new drug
+against a regimen of k active drugs, as create_prescription does.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from array import array
+
+from app.utils.interactions import (
+    SEVERITIES,
+    InteractionChecker,
+    InteractionIndex,
+    pack,
+)
+
+REGIMEN_SIZES = (1, 5, 10, 20, 50)
+
+
+def synthetic_index(drugs: int, pairs: int, seed: int) -> InteractionIndex:
+    rng = random.Random(seed)
+    entries = array("q")
+    for _ in range(pairs):
+        a = rng.randrange(drugs)
+        b = rng.randrange(drugs - 1)
+        if b >= a:
+            b += 1
+        entries.append(pack(a, b, rng.randint(1, len(SEVERITIES))))
+    return InteractionIndex(
+        [f"drug{i:06d}" for i in range(drugs)], array("q", sorted(entries)), [""]
+    )
+
+
+def _percentiles(values) -> dict:
+    values = sorted(values)
+    return {
+        "p50_us": round(values[len(values) // 2] * 1e6, 2),
+        "p99_us": round(values[int(len(values) * 0.99)] * 1e6, 2),
+        "mean_us": round(statistics.fmean(values) * 1e6, 2),
+    }
+
+
+def measure_checks(index: InteractionIndex, runs: int, seed: int) -> dict:
+    rng = random.Random(seed + 1)  # not the sequence that generated the pairs
+    checker = InteractionChecker(None)
+    checker._index, checker._loaded = index, True
+    results = {}
+    for k in REGIMEN_SIZES:
+        times = []
+        hits = 0
+        for _ in range(runs):
+            regimen = rng.sample(index.names, k + 1)
+            started = time.perf_counter()
+            hits += len(checker.check(regimen[:1], regimen[1:]))
+            times.append(time.perf_counter() - started)
+        results[str(k)] = dict(_percentiles(times), warnings=hits)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--drugs", type=int, default=100_000)
+    parser.add_argument("--pairs", type=int, default=10_000_000)
+    parser.add_argument("--runs", type=int, default=2000, help="checks per regimen size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write JSON results here (default: stdout)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    index = synthetic_index(args.drugs, args.pairs, args.seed)
+    build = time.perf_counter() - started
+
+    workdir = tempfile.mkdtemp(prefix="interactions-")
+    path = os.path.join(workdir, "interactions.idx")
+    source = {"synthetic": [args.drugs, args.pairs, args.seed]}
+    started = time.perf_counter()
+    index.save(path, source)
+    save = time.perf_counter() - started
+    del index
+    started = time.perf_counter()
+    index = InteractionIndex.load(path, source)
+    load = time.perf_counter() - started
+
+    results = {
+        "drugs": args.drugs,
+        "pairs": len(index),
+        "index_bytes": index.nbytes,
+        "file_bytes": os.path.getsize(path),
+        "build_s": round(build, 2),
+        "save_s": round(save, 3),
+        "load_s": round(load, 3),
+        "check": measure_checks(index, args.runs, args.seed),
+    }
+    os.remove(path)
+    os.rmdir(workdir)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        sys.stdout.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
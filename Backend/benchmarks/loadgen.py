@@ -0,0 +1,472 @@
+"""Asyncio HTTP load generator driving every API route.
+
+Usage:
+    DATABASE_URL=sqlite:///bench.db SECRET_KEY=bench \
+        python -m benchmarks.loadgen --base-url http://127.0.0.1:8000 \
+        --concurrency 32 --requests 20000
+
+Each worker keeps one keep-alive connection and issues requests drawn from
+a weighted scenario. Latency is recorded per route template (e.g.
+"GET /api/messages/chat/{user_id}"), so results compare across datasets.
+The load generator reads ids from the database and mints tokens with the
+server's SECRET_KEY, so both must match the server's configuration.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+
+SYMPTOM_TAGS = ["headache", "fever", "cough", "fatigue", "nausea", "dizziness"]
+
+# Regimens checked for interactions; several pairs interact in
+# data/drug_interactions.sample.csv
+REGIMEN_DRUGS = [
+    "Warfarin", "Aspirin", "Ibuprofen", "Simvastatin", "Clarithromycin", "Sertraline",
+    "Tramadol", "Lisinopril", "Spironolactone", "Omeprazole", "Metformin", "Paracetamol",
+]
+
+
+@dataclass
+class Route:
+    name: str
+    weight: int
+    build: Callable[["Context", random.Random], Tuple[str, str, Optional[bytes], Dict[str, str]]]
+
+
+@dataclass
+class Context:
+    patients: List[int]
+    doctors: List[int]
+    tokens: Dict[int, str]
+    doctor_of: Dict[int, int]
+    medication_of: Dict[int, int]
+    appointment_of: Dict[int, Tuple[int, int]] = field(default_factory=dict)
+    # Medications other than medication_of's, each deleted at most once
+    spare_medications: Dict[int, List[int]] = field(default_factory=dict)
+    record_of: Dict[int, int] = field(default_factory=dict)
+
+    def auth(self, user_id: int) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.tokens[user_id]}"}
+
+
+def _json(body) -> bytes:
+    return json.dumps(body).encode()
+
+
+def _patient(ctx: Context, rng: random.Random) -> int:
+    return rng.choice(ctx.patients)
+
+
+def _doctor(ctx: Context, rng: random.Random) -> int:
+    return rng.choice(ctx.doctors)
+
+
+def _get(path_fn, role=_patient):
+    def build(ctx, rng):
+        user = role(ctx, rng)
+        return "GET", path_fn(ctx, rng, user), None, ctx.auth(user)
+
+    return build
+
+
+def _multipart(filename: str, content: bytes) -> Tuple[bytes, str]:
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        "Content-Type: application/pdf\r\n\r\n"
+    ).encode() + content + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def _upload(ctx, rng):
+    user = _patient(ctx, rng)
+    body, content_type = _multipart("report.pdf", b"%PDF-1.4 " + b"x" * 20_000)
+    headers = {**ctx.auth(user), "Content-Type": content_type}
+    return "POST", "/api/health-records/?title=Report&record_type=lab_report", body, headers
+
+
+def _post(path: str, body_fn, role=_patient):
+    def build(ctx, rng):
+        user = role(ctx, rng)
+        return "POST", path, _json(body_fn(ctx, rng, user)), ctx.auth(user)
+
+    return build
+
+
+def _medication_body(ctx, rng, user):
+    return {"name": "Paracetamol", "dosage": "500mg", "time": "08:00",
+            "total_tablets": 30, "remaining_tablets": 30}
+
+
+def _update_medication(ctx, rng):
+    user = _patient(ctx, rng)
+    med = ctx.medication_of[user]
+    body = _json({"remaining_tablets": rng.randint(0, 30)})
+    return "PUT", f"/api/medications/{med}", body, ctx.auth(user)
+
+
+def _delete_medication(ctx, rng):
+    user = _patient(ctx, rng)
+    spares = ctx.spare_medications.get(user)
+    # Once a patient's spares are gone, the route measures a 404
+    med = spares.pop() if spares else ctx.medication_of[user]
+    return "DELETE", f"/api/medications/{med}", None, ctx.auth(user)
+
+
+def _download(ctx, rng):
+    # Seeded records only; their files are written by datagen
+    user = _patient(ctx, rng)
+    path = f"/api/health-records/{ctx.record_of[user]}/download"
+    return "GET", path, None, ctx.auth(user)
+
+
+def _sync(ctx, rng):
+    # A device that last synced a few minutes ago
+    from datetime import datetime, timedelta
+    from app.services.sync_services import encode_token
+
+    user = _patient(ctx, rng)
+    since = encode_token(datetime.utcnow() - timedelta(minutes=rng.randint(1, 15)))
+    return "GET", f"/api/sync/?since={since}", None, ctx.auth(user)
+
+
+def _update_appointment(ctx, rng):
+    user = _patient(ctx, rng)
+    appt_id, doctor = ctx.appointment_of[user]
+    body = _json({"status": rng.choice(["approved", "completed"])})
+    return "PUT", f"/api/appointments/{appt_id}", body, ctx.auth(doctor)
+
+
+def _patient_records(ctx, rng):
+    patient = _patient(ctx, rng)
+    doctor = ctx.doctor_of[patient]
+    return "GET", f"/api/doctors/patient/{patient}/records", None, ctx.auth(doctor)
+
+
+def _chat(ctx, rng):
+    patient = _patient(ctx, rng)
+    return "GET", f"/api/messages/chat/{ctx.doctor_of[patient]}", None, ctx.auth(patient)
+
+
+def _login(ctx, rng):
+    patient = _patient(ctx, rng)
+    body = {"email": f"patient{patient}@bench.example.com", "password": "bench-password"}
+    return "POST", "/api/auth/login", _json(body), {}
+
+
+def _register(ctx, rng):
+    body = {"name": "Load Test", "email": f"load-{uuid.uuid4().hex}@bench.example.com",
+            "password": "bench-password", "role": "patient"}
+    return "POST", "/api/auth/register", _json(body), {}
+
+
+def _batch(ctx, rng):
+    user = _patient(ctx, rng)
+    paths = ["/api/auth/me", "/api/patients/dashboard", "/api/messages/",
+             "/api/prescriptions/", "/api/symptom-diary/"]
+    body = {"requests": [{"id": p, "path": p} for p in paths]}
+    return "POST", "/api/batch/", _json(body), ctx.auth(user)
+
+
+def _prescribe(ctx, rng):
+    patient = _patient(ctx, rng)
+    body = {"patient_id": patient, "medicine": "Amoxicillin", "dosage": "500mg",
+            "timing": "Morning, Night", "duration": "5 days"}
+    return "POST", "/api/prescriptions/", _json(body), ctx.auth(ctx.doctor_of[patient])
+
+
+def _bundle(ctx, rng):
+    patient = _patient(ctx, rng)
+    items = [{"medicine": f"Drug {i}", "dosage": "5mg", "timing": "Morning, Night",
+              "duration": "7 days"} for i in range(5)]
+    body = {"patient_id": patient, "items": items}
+    return "POST", "/api/prescriptions/bulk", _json(body), ctx.auth(ctx.doctor_of[patient])
+
+
+def _interactions(ctx, rng):
+    patient = _patient(ctx, rng)
+    body = {"drugs": rng.sample(REGIMEN_DRUGS, 4), "patient_id": patient}
+    path = "/api/prescriptions/interactions"
+    return "POST", path, _json(body), ctx.auth(ctx.doctor_of[patient])
+
+
+def _drug_search(ctx, rng):
+    # What a typeahead sends while the name is typed, now and then mistyped
+    query = rng.choice(REGIMEN_DRUGS)[: rng.randint(2, 8)].lower()
+    if len(query) > 3 and rng.random() < 0.2:
+        i = rng.randrange(len(query))
+        query = query[:i] + rng.choice("aeiourst") + query[i + 1:]
+    user = _doctor(ctx, rng)
+    return "GET", f"/api/drugs/search?q={query}", None, ctx.auth(user)
+
+
+def _symptoms(path_fn):
+    # Doctors look at their whole cohort, or at one patient in it
+    def build(ctx, rng):
+        patient = _patient(ctx, rng)
+        path = path_fn(rng)
+        if rng.random() < 0.5:
+            path += ("&" if "?" in path else "?") + f"patient_id={patient}"
+        return "GET", path, None, ctx.auth(ctx.doctor_of[patient])
+
+    return build
+
+
+def _export(fmt: str):
+    def build(ctx, rng):
+        dataset = rng.choice(["symptoms", "medications", "prescriptions", "vitals"])
+        path = f"/api/doctors/export/{dataset}?format={fmt}"
+        return "GET", path, None, ctx.auth(_doctor(ctx, rng))
+
+    return build
+
+
+def _vitals_upload(ctx, rng):
+    # An hour of minute-level heart rate from one of the patient's devices;
+    # overlapping hours exercise de-duplication
+    user = _patient(ctx, rng)
+    hour = int(time.time() // 3600) - rng.randrange(24 * 30)
+    readings = [
+        {"kind": "heart_rate", "value": rng.randint(55, 110),
+         "measured_at": time.strftime("%Y-%m-%dT%H:%M:00", time.gmtime((hour * 60 + m) * 60))}
+        for m in range(60)
+    ]
+    body = {"device_id": f"watch-{rng.randrange(2)}", "readings": readings}
+    return "POST", "/api/vitals/", _json(body), ctx.auth(user)
+
+
+SCENARIO = [
+    Route("GET /", 1, lambda ctx, rng: ("GET", "/", None, {})),
+    Route("GET /health", 1, lambda ctx, rng: ("GET", "/health", None, {})),
+    Route("GET /api/auth/me", 6, _get(lambda c, r, u: "/api/auth/me")),
+    Route("GET /api/patients/dashboard", 10, _get(lambda c, r, u: "/api/patients/dashboard")),
+    Route("GET /api/medications/", 10, _get(lambda c, r, u: "/api/medications/")),
+    Route("GET /api/reminders/", 6, _get(lambda c, r, u: "/api/reminders/")),
+    Route("GET /api/symptom-diary/", 6, _get(lambda c, r, u: "/api/symptom-diary/")),
+    Route("GET /api/messages/", 8, _get(lambda c, r, u: "/api/messages/")),
+    Route("GET /api/messages/chat/{user_id}", 6, _chat),
+    Route("GET /api/appointments/", 8, _get(lambda c, r, u: "/api/appointments/")),
+    Route("GET /api/appointments/ (doctor)", 3,
+          _get(lambda c, r, u: "/api/appointments/", role=_doctor)),
+    Route("GET /api/health-records/", 4, _get(lambda c, r, u: "/api/health-records/")),
+    Route("GET /api/health-records/{record_id}/download", 2, _download),
+    Route("GET /api/health-records/access-log", 1,
+          _get(lambda c, r, u: "/api/health-records/access-log")),
+    Route("GET /api/prescriptions/", 6, _get(lambda c, r, u: "/api/prescriptions/")),
+    Route("GET /api/doctors/patients", 3,
+          _get(lambda c, r, u: "/api/doctors/patients", role=_doctor)),
+    Route("GET /api/doctors/patient/{patient_id}/records", 3, _patient_records),
+    Route("GET /api/doctors/directory", 4,
+          _get(lambda c, r, u: f"/api/doctors/directory?q={r.choice('abcdgkmnprsv')}")),
+    Route("GET /api/doctors/symptoms/co-occurrence", 2, _symptoms(
+        lambda r: f"/api/doctors/symptoms/co-occurrence?tag={r.choice(SYMPTOM_TAGS)}")),
+    Route("GET /api/doctors/symptoms/trends", 2, _symptoms(
+        lambda r: f"/api/doctors/symptoms/trends?period={r.choice(['day', 'week', 'month'])}")),
+    Route("GET /api/doctors/symptoms/severity", 1,
+          _symptoms(lambda r: "/api/doctors/symptoms/severity")),
+    Route("GET /api/doctors/export/{dataset}", 1, _export("arrow")),
+    Route("GET /api/doctors/export/{dataset} (parquet)", 1, _export("parquet")),
+    Route("POST /api/medications/", 2, _post("/api/medications/", _medication_body)),
+    Route("PUT /api/medications/{medication_id}", 2, _update_medication),
+    Route("DELETE /api/medications/{medication_id}", 1, _delete_medication),
+    Route("POST /api/reminders/", 1, _post(
+        "/api/reminders/", lambda c, r, u: {"type": "medicine", "title": "Meds", "time": "09:00"})),
+    Route("POST /api/symptom-diary/", 2, _post(
+        "/api/symptom-diary/", lambda c, r, u: {"symptoms": "headache, fever", "severity": r.randint(1, 10)})),
+    Route("POST /api/messages/", 3, _post(
+        "/api/messages/", lambda c, r, u: {"receiver_id": c.doctor_of[u], "message": "Hello doctor"})),
+    Route("POST /api/appointments/", 1, _post(
+        "/api/appointments/", lambda c, r, u: {"doctor_id": c.doctor_of[u], "date": "2030-01-01T10:00:00"})),
+    Route("PUT /api/appointments/{appointment_id}", 1, _update_appointment),
+    Route("POST /api/prescriptions/", 1, _prescribe),
+    Route("POST /api/prescriptions/bulk", 1, _bundle),
+    Route("POST /api/prescriptions/interactions", 2, _interactions),
+    Route("GET /api/drugs/search", 4, _drug_search),
+    Route("POST /api/health-records/", 1, _upload),
+    Route("POST /api/batch/", 2, _batch),
+    Route("GET /api/sync/", 4, _sync),
+    Route("GET /api/sync/ (full)", 1, _get(lambda c, r, u: "/api/sync/")),
+    Route("POST /api/vitals/", 2, _vitals_upload),
+    Route("GET /api/vitals/", 2, _get(lambda c, r, u: "/api/vitals/?kind=heart_rate")),
+    Route("GET /api/vitals/ (90 days)", 1, _get(
+        lambda c, r, u: f"/api/vitals/?kind=heart_rate&start={time.strftime('%Y-%m-%d', time.gmtime(time.time() - 90 * 86400))}")),
+    Route("POST /api/auth/login", 1, _login),
+    Route("POST /api/auth/register", 1, _register),
+]
+
+
+def build_context(database_url: str, sample: int = 500, seed: int = 0) -> Context:
+    """Sample users and related ids from the benchmark database"""
+    from sqlalchemy import create_engine, text
+    from app.utils.security import create_access_token
+
+    rng = random.Random(seed)
+    engine = create_engine(database_url)
+    with engine.connect() as conn:
+        doctors = [r[0] for r in conn.execute(
+            text("SELECT id FROM users WHERE role = 'DOCTOR' ORDER BY id"))]
+        pairs = conn.execute(text(
+            "SELECT patient_id, doctor_id, id FROM appointments WHERE id IN "
+            "(SELECT MIN(id) FROM appointments GROUP BY patient_id)"
+        )).all()
+        pairs = rng.sample(pairs, min(sample, len(pairs)))
+        patients = [p for p, _, _ in pairs]
+        meds = dict(conn.execute(text(
+            "SELECT user_id, MIN(id) FROM medications GROUP BY user_id")).all())
+        spares: Dict[int, List[int]] = {}
+        for user_id, med_id in conn.execute(text(
+                "SELECT user_id, id FROM medications ORDER BY id")):
+            if med_id != meds[user_id]:
+                spares.setdefault(user_id, []).append(med_id)
+        records = dict(conn.execute(text(
+            "SELECT patient_id, MIN(id) FROM health_records GROUP BY patient_id")).all())
+    engine.dispose()
+
+    patients = [p for p in patients if p in meds and p in records]
+    tokens = {uid: create_access_token({"sub": str(uid)}) for uid in patients + doctors}
+    doctor_of = {p: d for p, d, _ in pairs}
+    appointment_of = {p: (a, d) for p, d, a in pairs}
+    return Context(
+        patients, doctors, tokens, doctor_of, meds, appointment_of, spares, records
+    )
+
+
+class Connection:
+    """Minimal HTTP/1.1 keep-alive client"""
+
+    def __init__(self, host: str, port: int):
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=None, headers=None) -> int:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        body = body or b""
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}",
+                 f"Content-Length: {len(body)}"]
+        hdrs = {"Content-Type": "application/json", **(headers or {})}
+        lines += [f"{k}: {v}" for k, v in hdrs.items()]
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            await self.close()
+            raise ConnectionError("server closed the connection")
+        status = int(status_line.split()[1])
+        length, chunked, close = 0, False, False
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            key, value = key.strip().lower(), value.strip().lower()
+            if key == "content-length":
+                length = int(value)
+            elif key == "transfer-encoding" and "chunked" in value:
+                chunked = True
+            elif key == "connection" and value == "close":
+                close = True
+        if chunked:
+            while True:
+                size = int((await self.reader.readline()).strip() or b"0", 16)
+                await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        elif length:
+            await self.reader.readexactly(length)
+        if close:
+            await self.close()
+        return status
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = self.reader = None
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def run_load(base_url: str, ctx: Context, concurrency: int, total: int,
+                   seed: int = 0, scenario: List[Route] = SCENARIO) -> dict:
+    """Issue ``total`` requests over ``concurrency`` connections"""
+    parts = urlsplit(base_url)
+    latencies: Dict[str, List[float]] = {r.name: [] for r in scenario}
+    errors: Dict[str, int] = {r.name: 0 for r in scenario}
+    weights = [r.weight for r in scenario]
+    remaining = [total]
+
+    async def worker(index: int):
+        rng = random.Random(seed * 1000 + index)
+        conn = Connection(parts.hostname, parts.port or 80)
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            route = rng.choices(scenario, weights)[0]
+            method, path, body, headers = route.build(ctx, rng)
+            started = time.perf_counter()
+            try:
+                status = await conn.request(method, path, body, headers)
+            except (ConnectionError, asyncio.IncompleteReadError, OSError):
+                await conn.close()
+                status = 599
+            latencies[route.name].append(time.perf_counter() - started)
+            if status >= 400:
+                errors[route.name] += 1
+        await conn.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    routes = {}
+    for name, values in latencies.items():
+        if not values:
+            continue
+        values.sort()
+        routes[name] = {
+            "count": len(values),
+            "errors": errors[name],
+            "throughput_rps": round(len(values) / elapsed, 2),
+            "mean_ms": round(1000 * sum(values) / len(values), 3),
+            "p50_ms": round(1000 * _percentile(values, 0.50), 3),
+            "p95_ms": round(1000 * _percentile(values, 0.95), 3),
+            "p99_ms": round(1000 * _percentile(values, 0.99), 3),
+        }
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "requests": total,
+        "throughput_rps": round(total / elapsed, 2),
+        "routes": routes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--database-url", help="defaults to settings.DATABASE_URL")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from config import settings
+
+    ctx = build_context(args.database_url or settings.DATABASE_URL, seed=args.seed)
+    result = asyncio.run(run_load(args.base_url, ctx, args.concurrency, args.requests, args.seed))
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Run the full benchmark: generate data, start the API, drive load, save results.
+
+Usage:
+    python -m benchmarks.run --output results/sqlite.json
+    python -m benchmarks.run --database-url postgresql://localhost/bench \
+        --output results/postgres.json
+
+Without --database-url a fresh SQLite file in a temporary directory is
+used. A PostgreSQL target must point at an empty database. The server runs
+as a separate uvicorn process from a temporary working directory so
+uploads never land in the source tree.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from dataclasses import asdict
+from datetime import datetime
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _wait_healthy(base_url: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(base_url + "/health", timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise SystemExit("server did not become healthy")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", help="empty database to use (default: SQLite)")
+    parser.add_argument("--output", help="write JSON results here (default: stdout)")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=10_000)
+    parser.add_argument("--warmup", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--patients", type=int, default=500)
+    parser.add_argument("--doctors", type=int, default=20)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    database_url = args.database_url or f"sqlite:///{workdir}/bench.db"
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+    os.environ.setdefault(
+        "INTERACTIONS_PATH", str(BACKEND_DIR / "data" / "drug_interactions.sample.csv")
+    )
+    os.environ.setdefault(
+        "DRUG_DICTIONARY_PATH", str(BACKEND_DIR / "data" / "drug_dictionary.sample.csv")
+    )
+    sys.path.insert(0, str(BACKEND_DIR))
+
+    from benchmarks.datagen import Counts, load, write_record_files
+    from benchmarks.loadgen import build_context, run_load
+
+    counts = Counts(doctors=args.doctors, patients=args.patients)
+    loaded = load(database_url, counts, args.seed)
+    # The server runs from workdir, where downloads look for the files
+    write_record_files(database_url, workdir)
+
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", str(BACKEND_DIR),
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=workdir,
+        env=os.environ.copy(),
+    )
+    try:
+        _wait_healthy(base_url)
+        ctx = build_context(database_url, seed=args.seed)
+        if args.warmup:
+            asyncio.run(run_load(base_url, ctx, args.concurrency, args.warmup, args.seed + 1))
+        result = asyncio.run(
+            run_load(base_url, ctx, args.concurrency, args.requests, args.seed)
+        )
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    report = {
+        "commit": _git_commit(),
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "database": database_url.split(":", 1)[0],
+        "python": platform.python_version(),
+        "config": {
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "seed": args.seed,
+            "counts": asdict(counts),
+        },
+        "dataset": loaded,
+        **result,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Measure application startup: import time and time to first response.
+
+Usage:
+    python -m benchmarks.startup --runs 5 --output results/startup.json
+
+Each run uses a fresh interpreter. "import" is the wall time of
+``import main``; "first_response" is the time from launching uvicorn to
+the first successful /health and the first authenticated request. The
+slowest modules by cumulative import time (from ``-X importtime``) are
+reported from an extra run so regressions can be traced to a dependency.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime
+from pathlib import Path
+
+from benchmarks.run import BACKEND_DIR, _free_port, _git_commit
+
+IMPORT_SNIPPET = """
+import time
+started = time.perf_counter()
+import main
+print(time.perf_counter() - started)
+"""
+
+
+def _env(database_url: str) -> dict:
+    env = os.environ.copy()
+    env["DATABASE_URL"] = database_url
+    env.setdefault("SECRET_KEY", "benchmark-secret")
+    env["PYTHONPATH"] = str(BACKEND_DIR)
+    return env
+
+
+def measure_import(env: dict, workdir: str) -> float:
+    out = subprocess.check_output(
+        [sys.executable, "-c", IMPORT_SNIPPET], cwd=workdir, env=env, text=True
+    )
+    return float(out.strip().splitlines()[-1])
+
+
+def slowest_imports(env: dict, workdir: str, top: int = 15) -> list:
+    """Modules with the highest cumulative import time, in microseconds"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=workdir,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        rows.append(
+            {
+                "module": module.strip(),
+                "self_us": int(self_us),
+                "cumulative_us": int(cumulative_us),
+            }
+        )
+    rows.sort(key=lambda row: row["cumulative_us"], reverse=True)
+    return rows[:top]
+
+
+def _get(url: str, token: str = None) -> int:
+    request = urllib.request.Request(url)
+    if token:
+        request.add_header("Authorization", f"Bearer {token}")
+    with urllib.request.urlopen(request, timeout=1) as response:
+        return response.status
+
+
+def measure_first_response(env: dict, workdir: str, token: str) -> dict:
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=workdir,
+        env=env,
+    )
+    try:
+        deadline = started + 60
+        while True:
+            try:
+                _get(base_url + "/health")
+                break
+            except OSError:
+                if time.perf_counter() > deadline or server.poll() is not None:
+                    raise SystemExit("server did not start")
+                time.sleep(0.01)
+        health = time.perf_counter() - started
+        _get(base_url + "/api/auth/me", token)
+        authenticated = time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    return {"health": health, "authenticated": authenticated}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", help="write JSON results here (default: stdout)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="startup-")
+    database_url = f"sqlite:///{workdir}/startup.db"
+    env = _env(database_url)
+    os.environ.update({k: env[k] for k in ("DATABASE_URL", "SECRET_KEY")})
+    sys.path.insert(0, str(BACKEND_DIR))
+
+    from benchmarks.datagen import Counts, load
+    from app.utils.security import create_access_token
+
+    load(database_url, Counts(doctors=2, patients=5))
+    token = create_access_token({"sub": "1"})
+
+    imports, health, authenticated = [], [], []
+    for _ in range(args.runs):
+        imports.append(measure_import(env, workdir))
+        first = measure_first_response(env, workdir, token)
+        health.append(first["health"])
+        authenticated.append(first["authenticated"])
+
+    def summary(values):
+        return {
+            "median_ms": round(statistics.median(values) * 1000, 1),
+            "min_ms": round(min(values) * 1000, 1),
+            "max_ms": round(max(values) * 1000, 1),
+        }
+
+    report = {
+        "commit": _git_commit(),
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "runs": args.runs,
+        "import": summary(imports),
+        "first_health_response": summary(health),
+        "first_authenticated_response": summary(authenticated),
+        "slowest_imports": slowest_imports(env, workdir),
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
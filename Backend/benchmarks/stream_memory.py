@@ -0,0 +1,169 @@
+"""Check that NDJSON list responses stream in bounded server memory.
+
+Usage:
+    python -m benchmarks.stream_memory --rows 1000000
+    python -m benchmarks.stream_memory --rows 200000 --compare-json
+
+One patient gets --rows symptom diary entries; GET /api/symptom-diary/ is
+then fetched with Accept: application/x-ndjson from a uvicorn process,
+sampling that process's resident memory (Linux /proc) while the body is
+read. The run fails (exit status 1) when RSS grows by more than
+--max-growth-mb, i.e. when memory scales with the result. --compare-json
+repeats the request as plain JSON, which builds the whole list first.
+"""
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from benchmarks.run import BACKEND_DIR, _free_port, _wait_healthy
+
+
+def _rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def populate(database_url: str, rows: int, chunk: int = 50_000) -> int:
+    """One doctor and one patient, the patient with ``rows`` diary entries"""
+    from sqlalchemy import create_engine, text
+    from benchmarks.datagen import Counts, _load_generic, _load_postgres, load
+
+    load(database_url, Counts(doctors=1, patients=1, symptoms_per_patient=0))
+    engine = create_engine(database_url)
+    with engine.connect() as conn:
+        patient = conn.execute(text("SELECT id FROM users WHERE role = 'PATIENT'")).scalar()
+    columns = ["user_id", "date", "symptoms", "severity", "notes", "created_at", "updated_at"]
+    start = datetime(2020, 1, 1)
+    for first in range(0, rows, chunk):
+        batch = []
+        for i in range(first, min(rows, first + chunk)):
+            when = start + timedelta(minutes=i)
+            batch.append([patient, when, "headache, fever", i % 10 + 1, "", when, when])
+        if engine.dialect.name == "postgresql":
+            _load_postgres(engine, "symptom_diary", columns, batch)
+        else:
+            _load_generic(engine, "symptom_diary", columns, batch)
+    engine.dispose()
+    return patient
+
+
+def fetch(port: int, token: str, accept: str, server_pid: int) -> dict:
+    """Read the whole list, sampling the server's RSS every 50 ms"""
+    samples = []
+    done = threading.Event()
+
+    def sample():
+        while not done.is_set():
+            samples.append(_rss_mb(server_pid))
+            time.sleep(0.05)
+
+    before = _rss_mb(server_pid)
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=600)
+    started = time.perf_counter()
+    conn.request(
+        "GET",
+        "/api/symptom-diary/",
+        headers={"Authorization": f"Bearer {token}", "Accept": accept},
+    )
+    response = conn.getresponse()
+    first = response.read(1)
+    ttfb = time.perf_counter() - started
+    size, lines = len(first), first.count(b"\n")
+    while True:
+        data = response.read(1 << 16)
+        if not data:
+            break
+        size += len(data)
+        lines += data.count(b"\n")
+    elapsed = time.perf_counter() - started
+    done.set()
+    sampler.join()
+    conn.close()
+    peak = max(samples + [_rss_mb(server_pid)])
+    return {
+        "status": response.status,
+        "ttfb_s": round(ttfb, 3),
+        "total_s": round(elapsed, 2),
+        "bytes": size,
+        "lines": lines,
+        "rss_before_mb": round(before, 1),
+        "rss_peak_mb": round(peak, 1),
+        "rss_growth_mb": round(peak - before, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", help="empty database to use (default: SQLite)")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--max-growth-mb", type=float, default=100)
+    parser.add_argument("--compare-json", action="store_true")
+    parser.add_argument("--output", help="write JSON results here (default: stdout)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    database_url = args.database_url or f"sqlite:///{workdir}/bench.db"
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+    # Only the list itself is measured, not ETag bookkeeping
+    os.environ["ETAG_ENABLED"] = "false"
+    sys.path.insert(0, str(BACKEND_DIR))
+
+    from app.utils.security import create_access_token
+
+    started = time.perf_counter()
+    patient = populate(database_url, args.rows)
+    populate_s = time.perf_counter() - started
+    token = create_access_token({"sub": str(patient)})
+
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", str(BACKEND_DIR),
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=workdir,
+        env=os.environ.copy(),
+    )
+    try:
+        _wait_healthy(f"http://127.0.0.1:{port}")
+        results = {
+            "rows": args.rows,
+            "populate_s": round(populate_s, 1),
+            "ndjson": fetch(port, token, "application/x-ndjson", server.pid),
+        }
+        if args.compare_json:
+            results["json"] = fetch(port, token, "application/json", server.pid)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    ndjson = results["ndjson"]
+    results["bounded"] = (
+        ndjson["status"] == 200
+        and ndjson["lines"] == args.rows
+        and ndjson["rss_growth_mb"] <= args.max_growth_mb
+    )
+    text = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(text + "\n")
+    else:
+        print(text)
+    if not results["bounded"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
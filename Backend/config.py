@@ -14,6 +14,53 @@ class Settings(BaseSettings):
     CORS_ORIGINS: str = "http://localhost:8080"
     ENVIRONMENT: str = "development"
 
+    # Production server (serve.py); WORKERS=0 means one per CPU
+    WORKERS: int = 0
+    WORKER_MAX_REQUESTS: int = 10_000  # recycle a worker after this many
+    WORKER_MAX_REQUESTS_JITTER: int = 1_000
+    GRACEFUL_TIMEOUT: int = 30  # seconds to drain in-flight requests
+
+    # Startup check that migrations are applied: "error", "warn" or "off"
+    SCHEMA_CHECK: str = "error"
+
+    # Database pool; checkouts fail after DB_POOL_TIMEOUT seconds (503)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 5
+
+    # Read replicas (comma-separated URLs); reads of read-only endpoints go
+    # there unless the replica lags or the user wrote within the window
+    DATABASE_REPLICA_URLS: str = ""
+    REPLICA_STRATEGY: str = "round_robin"  # or "least_connections"
+    REPLICA_MAX_LAG_SECONDS: float = 5.0
+    REPLICA_LAG_CHECK_SECONDS: float = 2.0
+    REPLICA_STICKY_SECONDS: float = 5.0  # read-your-writes window after a write
+
+    # Shards for patient-owned tables, "name=url,..." (empty: everything on
+    # DATABASE_URL). Patients map to shards by consistent hashing unless the
+    # shard_directory table says otherwise; see shards.py
+    SHARD_URLS: str = ""
+    SHARD_VNODES: int = 64  # ring points per shard
+    SHARD_DIRECTORY_REFRESH_SECONDS: float = 5.0
+    ID_BLOCK_SIZE: int = 1000  # ids of sharded tables reserved per process at once
+
+    # Admission control: shed load with 503 + Retry-After instead of queueing
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_MAX_IN_FLIGHT: int = 200  # requests being handled per process
+    ADMISSION_BULK_MAX_IN_FLIGHT: int = 4  # uploads and exports
+    ADMISSION_MAX_POOL_WAITERS: int = 20  # bulk requests are shed at half this
+    ADMISSION_RETRY_AFTER: int = 2  # seconds
+
+    # Idempotency-Key support for mutating requests; stored in Redis when
+    # REDIS_URL is set, otherwise per process
+    IDEMPOTENCY_ENABLED: bool = True
+    IDEMPOTENCY_TTL: int = 24 * 3600  # seconds a response is replayed for
+    IDEMPOTENCY_LOCK_SECONDS: int = 120  # in-flight claim, if its process dies
+    IDEMPOTENCY_WAIT_SECONDS: float = 30.0  # a retry waits this long for the original
+    IDEMPOTENCY_MAX_RESPONSE_BYTES: int = 1024 * 1024  # larger ones are not stored
+    IDEMPOTENCY_MAX_ENTRIES: int = 10_000  # in-process store bounds
+    IDEMPOTENCY_MAX_BYTES: int = 64 * 1024 * 1024
+
     # Uploads
     UPLOAD_DIR: str = "./uploads"
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10 MB
@@ -21,6 +68,96 @@ class Settings(BaseSettings):
     # Redis
     REDIS_URL: str | None = None
 
+    # Background jobs: "memory" runs them inside each web process, "redis"
+    # queues them in REDIS_URL for worker.py
+    QUEUE_BACKEND: str = "memory"
+    QUEUE_CONCURRENCY: int = 4  # jobs running at once per worker
+    QUEUE_THREADS: int = 4
+    QUEUE_PROCESSES: int = 0  # pool for CPU-bound tasks; 0 means one per CPU
+    QUEUE_MAX_ATTEMPTS: int = 3
+    QUEUE_RETRY_BACKOFF: float = 2.0  # seconds before the first retry, doubled after
+    QUEUE_KEY_TTL: int = 24 * 3600  # how long a job key rejects duplicates
+    QUEUE_VISIBILITY_TIMEOUT: int = 600  # requeue Redis jobs whose worker died
+
+    # Audit log of record access, written in batches off the request path
+    AUDIT_ENABLED: bool = True
+    AUDIT_BATCH_SIZE: int = 500  # write as soon as this many are buffered
+    AUDIT_FLUSH_SECONDS: float = 2.0  # otherwise write at least this often
+    AUDIT_MAX_BUFFER: int = 100_000  # while writes fail; oldest dropped beyond
+    AUDIT_PARTITIONS_AHEAD: int = 2  # monthly partitions created in advance (PostgreSQL)
+
+    # Delta sync (/api/sync)
+    SYNC_SAFETY_SECONDS: float = 5.0  # longest a write may stay uncommitted
+    SYNC_TOMBSTONE_DAYS: int = 30  # deleted rows are purged after this
+    SYNC_COMPACT_HOUR: int = 3  # local hour the daily purge is queued for
+
+    # Drug interaction dataset, a CSV of drug_a, drug_b, severity
+    # (minor/moderate/major/contraindicated) and description; unset disables
+    # interaction warnings
+    INTERACTIONS_PATH: str | None = None
+    INTERACTIONS_OPEN_ENDED_DAYS: int = 90  # prescriptions without a duration
+
+    # Drug dictionary for name typeahead and normalization, a CSV of id, name
+    # and synonyms separated by "|"; unset disables both
+    DRUG_DICTIONARY_PATH: str | None = None
+    DRUG_NORMALIZE_BATCH_SIZE: int = 1000  # rows per backfill transaction
+
+    # Symptom tags: backfill batch size for entries written before tagging
+    SYMPTOM_TAG_BATCH_SIZE: int = 1000
+
+    # Cohort exports (/api/doctors/export): rows per record batch, each
+    # fetched through a server-side cursor and sent before the next is read
+    EXPORT_BATCH_SIZE: int = 10_000
+
+    # Vitals from home devices (/api/vitals). Range queries read raw readings
+    # for windows up to VITALS_RAW_MAX_HOURS, hourly rollups up to
+    # VITALS_HOURLY_MAX_DAYS and daily rollups beyond
+    VITALS_MAX_BATCH: int = 10_000  # readings per ingestion request
+    VITALS_MAX_CLOCK_SKEW_SECONDS: int = 300  # readings further ahead are rejected
+    VITALS_RAW_MAX_HOURS: int = 48
+    VITALS_HOURLY_MAX_DAYS: int = 31
+    VITALS_MAX_POINTS: int = 10_000  # raw readings returned per query
+
+    # Query cache (in-process L1, Redis L2 when REDIS_URL is set)
+    CACHE_ENABLED: bool = True
+    CACHE_L1_MAX_ENTRIES: int = 10_000
+    CACHE_L1_TTL: int = 30  # seconds; bounds staleness across workers
+    CACHE_DEFAULT_TTL: int = 300
+
+    # Doctor directory: how often workers pick up doctors registered elsewhere,
+    # and rebuild it whole (renamed doctors, changed roles)
+    DIRECTORY_REFRESH_SECONDS: int = 30
+    DIRECTORY_REBUILD_SECONDS: int = 600
+
+    # Batch endpoint
+    BATCH_MAX_REQUESTS: int = 20
+
+    # Conditional GETs on list endpoints
+    ETAG_ENABLED: bool = True
+
+    # List endpoints stream one JSON object per line for clients sending
+    # Accept: application/x-ndjson; rows per cursor fetch and flush
+    STREAM_BATCH_SIZE: int = 1000
+
+    # Prometheus metrics at /metrics
+    METRICS_ENABLED: bool = True
+
+    # Sampling profiler, writes folded stacks to PROFILE_DIR (off by default)
+    PROFILE_SAMPLE_RATE: float = 0.0  # fraction of requests to profile
+    PROFILE_SECRET: str | None = None  # "X-Profile: <secret>" profiles a request
+    PROFILE_DIR: str = "./profiles"
+    PROFILE_INTERVAL_MS: float = 5
+
+    # Slow-request log (needs METRICS_ENABLED); 0 disables
+    SLOW_REQUEST_MS: int = 0
+    SLOW_REQUEST_TOP_STATEMENTS: int = 10
+
+    # Tracing: "file" (OTLP-JSON lines) or "otlp" (collector); unset disables
+    TRACING_EXPORTER: str | None = None
+    TRACING_FILE: str = "./traces.jsonl"
+    TRACING_OTLP_ENDPOINT: str = "http://localhost:4318/v1/traces"
+    TRACING_SAMPLE_RATE: float = 1.0  # for requests without a traceparent
+
     model_config = SettingsConfigDict(
         env_file=".env", env_file_encoding="utf-8", case_sensitive=False
     )
@@ -1,24 +1,173 @@
-from sqlalchemy import create_engine
+import logging
+import os
+from fastapi import Depends, Request
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from config import settings
+from app.utils.metrics import InstrumentedQueuePool, instrument_engine
+from app.utils.replicas import ReplicaSet, RoutingSession, StickyWindow
+from app.utils import etag
+from app.utils.sharding import SHARDED_TABLES, IdAllocator, ShardRouter, parse_shard_urls
+from app.utils.tracing import trace_engine
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    pool_pre_ping=True,  # Verify connections before using
-    pool_size=10,  # Connection pool size
-    max_overflow=20,  # Max connections beyond pool_size
+
+def _create_engine(url: str):
+    engine = create_engine(
+        url,
+        pool_pre_ping=True,  # Verify connections before using
+        pool_size=settings.DB_POOL_SIZE,  # Connection pool size
+        max_overflow=settings.DB_MAX_OVERFLOW,  # Max connections beyond pool_size
+        pool_timeout=settings.DB_POOL_TIMEOUT,  # Fail fast instead of stalling
+        poolclass=InstrumentedQueuePool,  # Reports checkout waits and waiters
+    )
+    if settings.METRICS_ENABLED:
+        instrument_engine(engine)
+    if settings.TRACING_EXPORTER:
+        trace_engine(engine)
+    return engine
+
+
+engine = _create_engine(settings.DATABASE_URL)
+
+replica_engines = [
+    _create_engine(url.strip())
+    for url in settings.DATABASE_REPLICA_URLS.split(",")
+    if url.strip()
+]
+if replica_engines:
+    RoutingSession.replicas = ReplicaSet(
+        replica_engines,
+        strategy=settings.REPLICA_STRATEGY,
+        max_lag=settings.REPLICA_MAX_LAG_SECONDS,
+        check_interval=settings.REPLICA_LAG_CHECK_SECONDS,
+    )
+    RoutingSession.sticky = StickyWindow(
+        settings.REPLICA_STICKY_SECONDS, settings.REDIS_URL
+    )
+
+shard_engines = {
+    name: engine if url == settings.DATABASE_URL else _create_engine(url)
+    for name, url in parse_shard_urls(settings.SHARD_URLS).items()
+}
+if shard_engines:
+    RoutingSession.shards = ShardRouter(
+        shard_engines,
+        directory_bind=engine,
+        vnodes=settings.SHARD_VNODES,
+        refresh_seconds=settings.SHARD_DIRECTORY_REFRESH_SECONDS,
+        # Lists cached from a moved patient's old shard are not reused
+        on_change=etag.bump_patients,
+    )
+
+
+def all_engines():
+    """Every distinct engine: the primary, replicas and shards"""
+    engines = [engine, *replica_engines]
+    engines += [shard for shard in shard_engines.values() if shard is not engine]
+    return engines
+
+
+def table_binds(table_name: str):
+    """Every distinct engine holding rows of a table: the primary or its shards"""
+    if not shard_engines or table_name not in SHARDED_TABLES:
+        return [engine]
+    return list({id(bind): bind for bind in shard_engines.values()}.values())
+
+
+id_allocator = IdAllocator(engine, table_binds, settings.ID_BLOCK_SIZE)
+
+
+def global_id(table_name: str):
+    """Column default giving a sharded table ids unique across shards
+
+    Without shards the database numbers rows itself, as for other tables.
+    """
+    if not shard_engines:
+        return None
+    return lambda: id_allocator.next(table_name)
+
+
+SessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, bind=engine, class_=RoutingSession
 )
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+@event.listens_for(SessionLocal, "after_commit")
+def _start_sticky_window(db) -> None:
+    # The user's next reads, in any request, go to the primary for a while
+    user_id = db.info.get("user_id")
+    if db.info.get("wrote") and user_id is not None and RoutingSession.sticky:
+        RoutingSession.sticky.mark(user_id)
+
 
 Base = declarative_base()
 
+ALEMBIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic")
+
+logger = logging.getLogger(__name__)
+
 
-def get_db():
+def get_db(request: Request = None):
     """Dependency for database sessions"""
+    # Read sub-requests of a batch share the batch's session
+    shared = getattr(request.state, "batch_db", None) if request else None
+    if shared is not None:
+        yield shared
+        return
+
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+def get_read_db(db: Session = Depends(get_db)):
+    """Dependency for endpoints that only read; their queries may use a replica"""
+    db.info["read_only"] = True
+    return db
+
+
+def _alembic_config(connection=None):
+    from alembic.config import Config
+
+    # No ini file: alembic.ini's logging setup would replace the app's
+    config = Config()
+    config.set_main_option("script_location", ALEMBIC_DIR)
+    if connection is not None:
+        config.attributes["connection"] = connection
+    return config
+
+
+def upgrade_schema(bind=None) -> None:
+    """Apply pending Alembic migrations; the only way the schema is created"""
+    from alembic import command
+
+    with (bind or engine).begin() as connection:
+        command.upgrade(_alembic_config(connection), "head")
+
+
+def check_schema(bind=None) -> bool:
+    """Compare the database's Alembic revision with the migration head
+
+    Reads one row from alembic_version and the revision ids of the scripts,
+    so it is cheap enough to run on every startup.
+    """
+    from alembic.runtime.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+
+    heads = set(ScriptDirectory(ALEMBIC_DIR).get_heads())
+    with (bind or engine).connect() as connection:
+        current = set(MigrationContext.configure(connection).get_current_heads())
+    if current == heads:
+        return True
+
+    message = (
+        f"Database schema is at {sorted(current) or 'no revision'}, "
+        f"migrations are at {sorted(heads)}; run `alembic upgrade head`"
+    )
+    if settings.SCHEMA_CHECK == "error":
+        raise RuntimeError(message)
+    logger.warning(message)
+    return False
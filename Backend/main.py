@@ -1,9 +1,11 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 import os
 from config import settings
-from database import engine, Base
+from database import SessionLocal, check_schema, engine
 from app.api import (
     auth,
     patients,
@@ -15,33 +17,123 @@ from app.api import (
     appointment,
     health_record,
     prescription,
+    batch,
+    sync,
+    drugs,
+    vitals,
 )
+from app.services.audit_services import audit_log
+from app.services.cache_services import install_session_hooks
+from app.services.directory_services import doctor_directory
+from app.services.drug_services import get_dictionary, schedule_normalization
+from app.services.interaction_services import interactions
+from app.services.queue_services import start_worker
+from app.services.symptom_services import schedule_tagging
+from app.services.sync_services import schedule_compaction
+from app.utils.admission import AdmissionMiddleware, pool_timeout_handler
+from app.utils.idempotency import IdempotencyMiddleware
+from app.utils.metrics import InstrumentedRoute, MetricsMiddleware, metrics_response
+from app.utils.profiling import ProfilingMiddleware
+from app.utils.sharding import (
+    ShardKeyRequired,
+    ShardMoving,
+    shard_key_required_handler,
+    shard_moving_handler,
+)
+from app.utils.tracing import TracingMiddleware, configure_tracing, flush_spans
+
+# Drop cached query results when the rows behind them are committed
+install_session_hooks(SessionLocal)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create uploads directory
+    os.makedirs("uploads/prescriptions", exist_ok=True)
+    os.makedirs("uploads/lab_reports", exist_ok=True)
+    os.makedirs("uploads/medical_documents", exist_ok=True)
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+    # The schema is owned by Alembic; only verify it is up to date
+    if settings.SCHEMA_CHECK != "off":
+        check_schema()
+
+    # The memory queue is per process, so its jobs run here; Redis jobs are
+    # run by worker.py
+    worker = start_worker() if settings.QUEUE_BACKEND == "memory" else None
+    schedule_compaction()
+    schedule_tagging()
+    # Load the interaction index and drug dictionary off the event loop
+    # before the first prescription
+    if settings.INTERACTIONS_PATH:
+        asyncio.get_running_loop().run_in_executor(None, interactions.get)
+    if settings.DRUG_DICTIONARY_PATH:
+        asyncio.get_running_loop().run_in_executor(None, get_dictionary)
+        schedule_normalization()
+    # Build the doctor search index before the first /directory request
+    asyncio.get_running_loop().run_in_executor(None, doctor_directory.refresh)
+
+    yield
+
+    if worker is not None:
+        await worker.stop(settings.GRACEFUL_TIMEOUT)
+    # After the worker: jobs may still record audit events
+    await asyncio.to_thread(audit_log.close, settings.GRACEFUL_TIMEOUT)
+    if settings.TRACING_EXPORTER:
+        flush_spans()
 
-# Create uploads directory
-os.makedirs("uploads/prescriptions", exist_ok=True)
-os.makedirs("uploads/lab_reports", exist_ok=True)
-os.makedirs("uploads/medical_documents", exist_ok=True)
 
 app = FastAPI(
     title="Healthcare Prototyper API",
     description="IIT-H Hackathon - Healthcare Management System",
     version="1.0.0",
+    lifespan=lifespan,
 )
+app.router.route_class = InstrumentedRoute
+
+# Replays of retried POST/PUTs; innermost, so metrics and tracing see them
+if settings.IDEMPOTENCY_ENABLED:
+    app.add_middleware(IdempotencyMiddleware)
 
-# CORS Configuration
+# Profiling and slow-request log; not installed at all unless configured
+if (
+    settings.PROFILE_SAMPLE_RATE > 0
+    or settings.PROFILE_SECRET
+    or settings.SLOW_REQUEST_MS > 0
+):
+    app.add_middleware(ProfilingMiddleware)
+
+# Per-request timings and SQL counts; wraps the routers and profiling
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# Load shedding; outside metrics so rejected requests cost next to nothing
+if settings.ADMISSION_ENABLED:
+    app.add_middleware(
+        AdmissionMiddleware,
+        pool_waiters=lambda: getattr(engine.pool, "waiters", 0),
+    )
+app.add_exception_handler(PoolTimeoutError, pool_timeout_handler)
+app.add_exception_handler(ShardMoving, shard_moving_handler)
+app.add_exception_handler(ShardKeyRequired, shard_key_required_handler)
+
+# Request spans; outside everything but CORS so the server span covers the rest
+if settings.TRACING_EXPORTER:
+    configure_tracing()
+    app.add_middleware(TracingMiddleware)
+
+# CORS Configuration; outermost so responses from every other layer,
+# including 503s from admission control, carry CORS headers
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.CORS_ORIGINS.split(","),
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "traceparent", "Retry-After", "Idempotent-Replayed"],
 )
 
-# Mount static files for uploads
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+# Uploaded files are not served statically: every read goes through
+# /api/health-records/{id}/download, which checks access and audits it
 
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
@@ -62,6 +154,10 @@ app.include_router(
 app.include_router(
     prescription.router, prefix="/api/prescriptions", tags=["Prescriptions"]
 )
+app.include_router(batch.router, prefix="/api/batch", tags=["Batch"])
+app.include_router(sync.router, prefix="/api/sync", tags=["Sync"])
+app.include_router(drugs.router, prefix="/api/drugs", tags=["Drugs"])
+app.include_router(vitals.router, prefix="/api/vitals", tags=["Vitals"])
 
 
 @app.get("/")
@@ -79,6 +175,13 @@ async def health_check():
     return {"status": "healthy"}
 
 
+if settings.METRICS_ENABLED:
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return metrics_response()
+
+
 if __name__ == "__main__":
     import uvicorn
 
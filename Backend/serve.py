@@ -0,0 +1,236 @@
+"""Production server: preloaded app, prefork workers, graceful shutdown.
+
+Usage:
+    python serve.py --workers 4 --port 8000
+
+The master imports the application once and forks workers that share the
+listening socket, so imports are paid once and their memory is shared
+copy-on-write. Each worker exits after a jittered request budget and is
+replaced. SIGTERM/SIGINT stop the listeners, let in-flight requests and
+their background tasks finish (up to --graceful-timeout) and run the
+application's shutdown hooks before the workers exit.
+
+POSIX only; use ``uvicorn main:app --reload`` for local development.
+"""
+import argparse
+import logging
+import os
+import random
+import signal
+import socket
+import sys
+import tempfile
+import time
+
+logger = logging.getLogger("serve")
+
+
+def _parse_args(settings):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=settings.HOST)
+    parser.add_argument("--port", type=int, default=settings.PORT)
+    parser.add_argument(
+        "--workers", type=int, default=settings.WORKERS or os.cpu_count() or 1
+    )
+    parser.add_argument(
+        "--max-requests", type=int, default=settings.WORKER_MAX_REQUESTS
+    )
+    parser.add_argument(
+        "--max-requests-jitter", type=int, default=settings.WORKER_MAX_REQUESTS_JITTER
+    )
+    parser.add_argument(
+        "--graceful-timeout", type=int, default=settings.GRACEFUL_TIMEOUT
+    )
+    parser.add_argument("--backlog", type=int, default=2048)
+    return parser.parse_args()
+
+
+def _prepare_multiprocess(settings, workers: int) -> None:
+    """Settings that must change before the app is imported when workers > 1"""
+    if workers <= 1:
+        return
+    # Metrics from all workers are aggregated through files in this directory;
+    # it has to be set before prometheus_client creates any metric.
+    if settings.METRICS_ENABLED and not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="metrics-")
+    # ETag versions are kept per process: a write handled by one worker would
+    # not invalidate tags issued by another, so they would answer 304 with
+    # stale data.
+    if settings.ETAG_ENABLED:
+        logger.warning("ETags are per-process; disabling them for %d workers", workers)
+        settings.ETAG_ENABLED = False
+    # Likewise the query cache without Redis: it is then only the in-process
+    # L1, which a write in another worker does not invalidate
+    if settings.CACHE_ENABLED and not settings.REDIS_URL:
+        logger.warning(
+            "The query cache is per-process without REDIS_URL; "
+            "disabling it for %d workers",
+            workers,
+        )
+        settings.CACHE_ENABLED = False
+
+
+def _bind(host: str, port: int, backlog: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _event_loop_options() -> dict:
+    options = {"loop": "asyncio", "http": "h11"}
+    try:
+        import uvloop  # noqa: F401
+
+        options["loop"] = "uvloop"
+    except ImportError:
+        pass
+    try:
+        import httptools  # noqa: F401
+
+        options["http"] = "httptools"
+    except ImportError:
+        pass
+    return options
+
+
+def _run_worker(app, sock: socket.socket, args) -> None:
+    """Body of a forked worker; never returns"""
+    import uvicorn
+    from database import all_engines
+
+    # Pooled connections inherited from the master belong to its process;
+    # drop them without closing the master's sockets and open our own.
+    for pooled in all_engines():
+        pooled.dispose(close=False)
+
+    for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+        signal.signal(sig, signal.SIG_DFL)
+
+    budget = args.max_requests
+    if budget and args.max_requests_jitter:
+        # Jitter keeps workers forked together from all recycling at once
+        budget += random.randint(0, args.max_requests_jitter)
+
+    config = uvicorn.Config(
+        app,
+        limit_max_requests=budget or None,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        lifespan="on",
+        **_event_loop_options(),
+    )
+    server = uvicorn.Server(config)
+    code = 0
+    try:
+        server.run(sockets=[sock])
+    except Exception:
+        logger.exception("Worker %d crashed", os.getpid())
+        code = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(code)
+
+
+class Master:
+    """Forks workers, replaces the ones that exit and shuts them down on signal"""
+
+    def __init__(self, app, sock: socket.socket, args):
+        self.app = app
+        self.sock = sock
+        self.args = args
+        self.workers = {}  # pid -> start time
+        self.stopping = False
+
+    def spawn(self) -> None:
+        pid = os.fork()
+        if pid == 0:
+            _run_worker(self.app, self.sock, self.args)
+        self.workers[pid] = time.monotonic()
+        logger.info("Started worker %d", pid)
+
+    def reap(self) -> None:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            started = self.workers.pop(pid, None)
+            if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+                from prometheus_client import multiprocess
+
+                multiprocess.mark_process_dead(pid)
+            code = os.waitstatus_to_exitcode(status)
+            logger.info("Worker %d exited with %d", pid, code)
+            if started is not None and code != 0 and time.monotonic() - started < 1:
+                # Crashing on boot: back off instead of fork-bombing
+                time.sleep(1)
+
+    def stop(self, signum, frame) -> None:
+        self.stopping = True
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for _ in range(self.args.workers):
+            self.spawn()
+
+        while not self.stopping:
+            self.reap()
+            while not self.stopping and len(self.workers) < self.args.workers:
+                self.spawn()
+            time.sleep(0.5)
+
+        self.shutdown()
+
+    def shutdown(self) -> None:
+        logger.info("Stopping %d workers", len(self.workers))
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+        deadline = time.monotonic() + self.args.graceful_timeout + 5
+        while self.workers and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.1)
+        for pid in list(self.workers):
+            logger.warning("Worker %d did not stop in time; killing it", pid)
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        while self.workers:
+            pid, _ = os.waitpid(-1, 0)
+            self.workers.pop(pid, None)
+        self.sock.close()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    from config import settings
+
+    args = _parse_args(settings)
+    _prepare_multiprocess(settings, args.workers)
+
+    # Preload: everything imported here is shared by the forked workers
+    from main import app
+    from database import all_engines
+
+    for pooled in all_engines():
+        pooled.dispose()
+    sock = _bind(args.host, args.port, args.backlog)
+    logger.info(
+        "Listening on %s:%d with %d workers", args.host, args.port, args.workers
+    )
+    Master(app, sock, args).run()
+
+
+if __name__ == "__main__":
+    main()
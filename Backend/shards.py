@@ -0,0 +1,115 @@
+"""Shard maintenance for patient-owned tables.
+
+Usage:
+    SHARD_URLS=a=postgresql://...,b=postgresql://... python shards.py init
+    python shards.py locate 42 43
+    python shards.py move 42 b
+    python shards.py pin --shards a,b,c
+    python shards.py rebalance --limit 100
+
+init creates the sharded tables (and columns added since) on every shard;
+the primary's schema stays with Alembic. move copies one patient's rows to
+another shard while the application keeps serving them; their writes get
+503s for a few seconds. Rows keep their ids, and the source keeps them as
+deleted rows so that syncing clients hear of the move.
+
+Adding a shard: create it and run init with the new SHARD_URLS, run pin
+with the new shard names while the old SHARD_URLS is still deployed (it
+records where every patient the new ring would send elsewhere is now),
+deploy the new SHARD_URLS, then run rebalance to move those patients.
+"""
+import argparse
+import logging
+
+logger = logging.getLogger("shards")
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("init", help="create sharded tables on every shard")
+
+    locate = commands.add_parser("locate", help="show where patients' rows are")
+    locate.add_argument("patient_ids", type=int, nargs="+")
+
+    move = commands.add_parser("move", help="move a patient's rows to a shard")
+    move.add_argument("patient_id", type=int)
+    move.add_argument("target")
+    move.add_argument("--settle", type=float, help="seconds to let processes catch up")
+
+    pin = commands.add_parser("pin", help="keep patients in place before a ring change")
+    pin.add_argument("--shards", required=True, help="comma-separated new shard names")
+
+    rebalance = commands.add_parser("rebalance", help="move pinned patients to their ring shard")
+    rebalance.add_argument("--limit", type=int, help="move at most this many patients")
+    rebalance.add_argument("--settle", type=float)
+    return parser.parse_args()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    from config import settings
+
+    args = _parse_args()
+    from sqlalchemy import select
+    from database import Base, engine, shard_engines
+    from app.models.shard import ShardAssignment
+    from app.models.user import User
+    from app.services.shard_services import count_rows, move_patient, pin_patients
+    from app.utils.replicas import RoutingSession
+    from app.utils.sharding import HashRing, create_shard_schema
+
+    router = RoutingSession.shards
+    if router is None:
+        raise SystemExit("SHARD_URLS is not set; everything is on DATABASE_URL")
+
+    if args.command == "init":
+        for name, shard in shard_engines.items():
+            applied = create_shard_schema(shard, Base.metadata)
+            logger.info("%s: %s", name, ", ".join(applied) or "up to date")
+
+    elif args.command == "locate":
+        for patient_id in args.patient_ids:
+            shard, moving_to = router.locate(patient_id)
+            counts = count_rows(router.engines[shard], patient_id)
+            moving = f" (moving to {moving_to})" if moving_to else ""
+            print(f"{patient_id}: {shard}{moving} {counts}")
+
+    elif args.command == "move":
+        source, copied = move_patient(router, args.patient_id, args.target, args.settle)
+        print(f"{args.patient_id}: {source} -> {args.target} {copied}")
+
+    elif args.command == "pin":
+        names = [name.strip() for name in args.shards.split(",") if name.strip()]
+        unknown = set(router.engines) - set(names)
+        if unknown:
+            raise SystemExit(f"Removing shards is not supported: {sorted(unknown)}")
+        new_ring = HashRing(names, settings.SHARD_VNODES)
+        with engine.connect() as conn:
+            patient_ids = (
+                conn.execute(select(User.id).where(User.role == "patient")).scalars().all()
+            )
+        pinned = pin_patients(router, new_ring, patient_ids)
+        logger.info("Pinned %d patients to their current shard", pinned)
+
+    elif args.command == "rebalance":
+        with engine.connect() as conn:
+            rows = conn.execute(
+                select(ShardAssignment.patient_id, ShardAssignment.shard).where(
+                    ShardAssignment.moving_to.is_(None)
+                )
+            ).all()
+        moved = 0
+        for patient_id, shard in rows:
+            target = router.ring.shard_for(patient_id)
+            if shard == target:
+                continue
+            if args.limit is not None and moved >= args.limit:
+                break
+            move_patient(router, patient_id, target, args.settle)
+            moved += 1
+        logger.info("Moved %d patients to their ring shard", moved)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Shared setup: a primary and a replica, both local SQLite files
+
+Settings are read once, when config is first imported, so the environment
+is prepared here before anything from the app is.
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+WORKDIR = Path(tempfile.mkdtemp(prefix="backend-tests-"))
+PRIMARY = WORKDIR / "primary.db"
+REPLICA = WORKDIR / "replica.db"
+
+os.environ.update(
+    SECRET_KEY="test-secret",
+    DATABASE_URL=f"sqlite:///{PRIMARY}",
+    DATABASE_REPLICA_URLS=f"sqlite:///{REPLICA}",
+    REPLICA_MAX_LAG_SECONDS="0.3",
+    REPLICA_LAG_CHECK_SECONDS="0.1",
+    REPLICA_STICKY_SECONDS="0.3",
+    REDIS_URL="",
+)
+sys.path.insert(0, str(BACKEND_DIR))
+os.chdir(WORKDIR)
+
+
+def replicate() -> None:
+    """Bring the replica up to date with the primary (it never is otherwise)"""
+    source = sqlite3.connect(PRIMARY)
+    target = sqlite3.connect(REPLICA)
+    try:
+        source.backup(target)
+    finally:
+        source.close()
+        target.close()
+
+
+@pytest.fixture(scope="session")
+def app():
+    import database
+
+    database.upgrade_schema()
+    replicate()
+    import main
+
+    return main.app
+
+
+@pytest.fixture
+def client(app):
+    from fastapi.testclient import TestClient
+
+    return TestClient(app)
+
+
+@pytest.fixture
+def register(client):
+    """Register a user; returns (auth headers, user id)"""
+
+    def register(role: str = "patient"):
+        name = f"{role}-{uuid.uuid4().hex[:8]}"
+        response = client.post(
+            "/api/auth/register",
+            json={
+                "name": name,
+                "email": f"{name}@example.com",
+                "password": "pw",
+                "role": role,
+            },
+        )
+        assert response.status_code == 201, response.text
+        body = response.json()
+        return {"Authorization": f"Bearer {body['access_token']}"}, body["user"]["id"]
+
+    return register
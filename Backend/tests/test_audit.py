@@ -0,0 +1,65 @@
+"""Audit events are written behind the request, and none are lost at shutdown"""
+import pytest
+from sqlalchemy import create_engine, select
+
+
+@pytest.fixture
+def bind(tmp_path):
+    from app.models.audit import AuditEvent
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'audit.db'}")
+    AuditEvent.__table__.create(engine)
+    yield engine
+    engine.dispose()
+
+
+def _actions(bind):
+    from app.models.audit import AuditEvent
+
+    with bind.connect() as conn:
+        rows = conn.execute(select(AuditEvent.action).order_by(AuditEvent.id))
+        return rows.scalars().all()
+
+
+def test_close_flushes_buffered_events(bind):
+    from app.services.audit_services import AuditLog
+
+    # Neither the batch size nor the interval is reached before close()
+    log = AuditLog(bind, batch_size=1000, interval=60)
+    for action in ("view", "download", "export"):
+        log.record(1, "doctor", 2, action)
+    assert _actions(bind) == []
+
+    log.close(timeout=5)
+
+    assert _actions(bind) == ["view", "download", "export"]
+    # Events recorded while shutting down are written at once
+    log.record(1, "doctor", 2, "late")
+    assert _actions(bind)[-1] == "late"
+
+
+def test_failed_write_keeps_events_for_the_next_attempt(bind, monkeypatch):
+    from app.services.audit_services import AuditLog
+
+    log = AuditLog(bind, batch_size=1000, interval=60)
+    write = log._write
+    failures = []
+
+    def flaky_write(batch):
+        if not failures:
+            failures.append(len(batch))
+            raise RuntimeError("database unavailable")
+        write(batch)
+
+    monkeypatch.setattr(log, "_write", flaky_write)
+    log.record(1, "doctor", 2, "view")
+    # As the writer thread would, had the interval passed
+    with log._cond:
+        batch, log._buffer = log._buffer, []
+    assert not log._flush(batch)
+
+    log.record(1, "doctor", 2, "download")
+    log.close(timeout=5)
+
+    assert failures == [1]
+    assert _actions(bind) == ["view", "download"]
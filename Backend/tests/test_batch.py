@@ -0,0 +1,73 @@
+"""/api/batch: sub-requests run in-process, failures stay with their own entry"""
+import json
+
+MEDICATION = {
+    "name": "Amoxicillin",
+    "dosage": "500mg",
+    "time": "08:00",
+    "total_tablets": 20,
+    "remaining_tablets": 20,
+}
+
+
+def _batch(client, headers, requests):
+    response = client.post("/api/batch/", headers=headers, json={"requests": requests})
+    assert response.status_code == 200, response.text
+    return {sub["id"]: sub for sub in response.json()["responses"]}
+
+
+def test_failing_sub_request_keeps_its_siblings(client, register, monkeypatch):
+    import app.api.medications as medications
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(medications, "render_fields", broken)
+    headers, _ = register()
+
+    results = _batch(
+        client,
+        headers,
+        [
+            {
+                "id": "write",
+                "method": "POST",
+                "path": "/api/medications/",
+                "body": MEDICATION,
+            },
+            {"id": "broken", "path": "/api/medications/?fields=name"},
+            {"id": "list", "path": "/api/medications/"},
+        ],
+    )
+
+    assert results["write"]["status"] == 201
+    assert results["broken"]["status"] == 500
+    assert results["list"]["status"] == 200
+    assert [item["name"] for item in results["list"]["body"]] == ["Amoxicillin"]
+    # The write was committed, whatever happened after it
+    listed = client.get("/api/medications/", headers=headers).json()
+    assert [item["id"] for item in listed] == [results["write"]["body"]["id"]]
+
+
+def test_ndjson_reads_run_beside_shared_session_reads(client, register):
+    headers, _ = register()
+    client.post("/api/medications/", headers=headers, json=MEDICATION)
+
+    results = _batch(
+        client,
+        headers,
+        [
+            {
+                "id": "lines",
+                "path": "/api/medications/",
+                "headers": {"Accept": "application/x-ndjson"},
+            },
+            {"id": "json", "path": "/api/medications/"},
+            {"id": "me", "path": "/api/auth/me"},
+        ],
+    )
+
+    assert results["lines"]["status"] == 200
+    lines = [json.loads(line) for line in results["lines"]["body"].splitlines()]
+    assert lines == results["json"]["body"]
+    assert results["me"]["status"] == 200
@@ -0,0 +1,88 @@
+"""Query cache: invalidation follows rows to their new owner, fills are single-flight"""
+import threading
+import time
+
+
+def test_moving_a_row_invalidates_its_previous_owner(app, register):
+    from database import SessionLocal
+    from app.models.prescription import Prescription
+    from app.services.prescription_services import get_patient_prescriptions
+
+    _, doctor_id = register("doctor")
+    _, first = register()
+    _, second = register()
+    with SessionLocal() as db:
+        rx = Prescription(
+            patient_id=first,
+            doctor_id=doctor_id,
+            medicine="Amoxicillin",
+            dosage="500mg",
+            timing="Morning",
+        )
+        db.add(rx)
+        db.commit()
+        assert len(get_patient_prescriptions(db, first)) == 1
+        assert get_patient_prescriptions(db, second) == []
+
+        rx.patient_id = second
+        db.commit()
+
+        assert get_patient_prescriptions(db, first) == []
+        assert [p["id"] for p in get_patient_prescriptions(db, second)] == [rx.id]
+
+
+def test_demoting_a_doctor_invalidates_the_doctor_list(app, register):
+    from database import SessionLocal
+    from app.models.user import User, UserRole
+    from app.services.user_services import get_doctors
+
+    _, doctor_id = register("doctor")
+    with SessionLocal() as db:
+        assert doctor_id in {d["id"] for d in get_doctors(db)}
+
+        db.get(User, doctor_id).role = UserRole.PATIENT
+        db.commit()
+
+        assert doctor_id not in {d["id"] for d in get_doctors(db)}
+
+
+def test_concurrent_misses_compute_once():
+    from app.services.cache_services import TwoLevelCache
+
+    cache = TwoLevelCache()
+    calls = []
+    started = threading.Event()
+
+    def compute():
+        calls.append(1)
+        started.set()
+        time.sleep(0.1)
+        return "value"
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_compute("k", compute)))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == ["value"] * 8
+
+
+def test_without_redis_workers_do_not_cache(monkeypatch):
+    import serve
+    from config import settings
+
+    monkeypatch.setattr(settings, "CACHE_ENABLED", True)
+    monkeypatch.setattr(settings, "ETAG_ENABLED", False)
+    monkeypatch.setattr(settings, "METRICS_ENABLED", False)
+    monkeypatch.setattr(settings, "REDIS_URL", "")
+
+    serve._prepare_multiprocess(settings, 1)
+    assert settings.CACHE_ENABLED
+    serve._prepare_multiprocess(settings, 4)
+    assert not settings.CACHE_ENABLED
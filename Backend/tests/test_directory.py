@@ -0,0 +1,56 @@
+"""Doctor directory: refreshed in its own session, rebuilt to follow renames"""
+import uuid
+
+
+def test_rebuild_picks_up_renamed_doctor(client, register, monkeypatch):
+    from config import settings
+    from database import SessionLocal
+    from app.models.user import User
+    from app.services.directory_services import doctor_directory
+
+    monkeypatch.setattr(settings, "DIRECTORY_REFRESH_SECONDS", 0)
+    headers, doctor_id = register("doctor")
+    old, new = f"Zed{uuid.uuid4().hex[:8]}", f"Quinn{uuid.uuid4().hex[:8]}"
+    with SessionLocal() as db:
+        db.get(User, doctor_id).name = old
+        db.commit()
+
+    monkeypatch.setattr(settings, "DIRECTORY_REBUILD_SECONDS", 0)
+    found = client.get("/api/doctors/directory", headers=headers, params={"q": old})
+    assert [doctor["id"] for doctor in found.json()] == [doctor_id]
+
+    with SessionLocal() as db:
+        db.get(User, doctor_id).name = new
+        db.commit()
+    # Between rebuilds only new registrations are loaded
+    monkeypatch.setattr(settings, "DIRECTORY_REBUILD_SECONDS", 3600)
+    doctor_directory.refresh()
+    assert [d["id"] for d in doctor_directory.search(old)] == [doctor_id]
+
+    monkeypatch.setattr(settings, "DIRECTORY_REBUILD_SECONDS", 0)
+    assert client.get("/api/doctors/directory", headers=headers, params={"q": old}).json() == []
+    found = client.get("/api/doctors/directory", headers=headers, params={"q": new})
+    assert [doctor["id"] for doctor in found.json()] == [doctor_id]
+
+
+def test_doctors_registered_during_a_rebuild_are_kept(app, register, monkeypatch):
+    from config import settings
+    from app.services import directory_services
+    from app.services.directory_services import doctor_directory
+
+    monkeypatch.setattr(settings, "DIRECTORY_REFRESH_SECONDS", 0)
+    monkeypatch.setattr(settings, "DIRECTORY_REBUILD_SECONDS", 0)
+    added = {}
+    get_doctors = directory_services.get_doctors
+
+    def racing_get_doctors(db):
+        doctors = get_doctors(db)
+        # Registered after the rows were read, before the index is swapped
+        added["id"] = 10**9
+        doctor_directory.add(added["id"], "Late Registrant")
+        return doctors
+
+    monkeypatch.setattr(directory_services, "get_doctors", racing_get_doctors)
+    doctor_directory.refresh()
+
+    assert [d["id"] for d in doctor_directory.search("late registrant")] == [added["id"]]
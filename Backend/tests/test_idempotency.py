@@ -0,0 +1,77 @@
+"""Idempotency-Key replays are scoped to the user, not the exact token"""
+import uuid
+from datetime import timedelta
+
+
+def _token_for(user_id: int, minutes: int) -> dict:
+    from app.utils.security import create_access_token
+
+    token = create_access_token({"sub": str(user_id)}, timedelta(minutes=minutes))
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _add_entry(client, headers, key):
+    return client.post(
+        "/api/symptom-diary/",
+        headers={**headers, "Idempotency-Key": key},
+        json={"symptoms": "headache", "severity": 3},
+    )
+
+
+def test_retry_with_refreshed_token_is_replayed(client, register):
+    _, user_id = register()
+    key = uuid.uuid4().hex
+
+    first = _add_entry(client, _token_for(user_id, 30), key)
+    retry = _add_entry(client, _token_for(user_id, 60), key)
+
+    assert first.status_code == 201, first.text
+    assert retry.status_code == 201
+    assert retry.headers.get("idempotent-replayed") == "true"
+    assert retry.json()["id"] == first.json()["id"]
+
+
+def test_same_key_from_another_user_runs_again(client, register):
+    first_headers, _ = register()
+    other_headers, other_id = register()
+    key = uuid.uuid4().hex
+
+    first = _add_entry(client, first_headers, key)
+    other = _add_entry(client, other_headers, key)
+
+    assert other.status_code == 201, other.text
+    assert "idempotent-replayed" not in other.headers
+    assert other.json()["user_id"] == other_id != first.json()["user_id"]
+
+
+def test_invalid_token_is_not_recorded(client, register):
+    headers, _ = register()
+    key = uuid.uuid4().hex
+
+    rejected = _add_entry(client, {"Authorization": "Bearer not-a-token"}, key)
+    accepted = _add_entry(client, headers, key)
+
+    assert rejected.status_code == 401
+    assert accepted.status_code == 201, accepted.text
+    assert "idempotent-replayed" not in accepted.headers
+
+
+def test_unauthenticated_requests_do_not_share_keys(client):
+    key = uuid.uuid4().hex
+    users = [
+        {"name": name, "email": f"{uuid.uuid4().hex}@example.com", "password": "pw"}
+        for name in ("A", "B")
+    ]
+
+    responses = [
+        client.post(
+            "/api/auth/register",
+            headers={"Idempotency-Key": key},
+            json={**user, "role": "patient"},
+        )
+        for user in users
+    ]
+
+    # Two clients picking the same key: neither is a replay or a mismatch
+    assert [r.status_code for r in responses] == [201, 201], responses[1].text
+    assert [r.json()["user"]["email"] for r in responses] == [u["email"] for u in users]
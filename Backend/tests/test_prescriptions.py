@@ -0,0 +1,60 @@
+"""Prescription bundles are written whole or not at all"""
+import pytest
+
+ITEM = {
+    "medicine": "Amoxicillin",
+    "dosage": "500mg",
+    "timing": "08:00, 20:00",
+    "total_tablets": 20,
+}
+
+
+def _bundle(client, headers, patient_id, items):
+    return client.post(
+        "/api/prescriptions/bulk",
+        headers=headers,
+        json={"patient_id": patient_id, "items": items},
+    )
+
+
+def test_bundle_adds_medications_and_reminders(client, register):
+    doctor, _ = register("doctor")
+    patient, patient_id = register()
+
+    response = _bundle(client, doctor, patient_id, [ITEM])
+
+    assert response.status_code == 201, response.text
+    body = response.json()
+    assert len(body["prescriptions"]) == 1
+    assert len(body["medication_ids"]) == 1 and len(body["reminder_ids"]) == 2
+    medications = client.get("/api/medications/", headers=patient).json()
+    assert [m["id"] for m in medications] == body["medication_ids"]
+
+
+@pytest.mark.parametrize("field, limit", [("medicine", 100), ("dosage", 50)])
+def test_overlong_items_are_rejected(client, register, field, limit):
+    doctor, _ = register("doctor")
+    _, patient_id = register()
+
+    response = _bundle(client, doctor, patient_id, [{**ITEM, field: "x" * (limit + 1)}])
+
+    assert response.status_code == 422
+
+
+def test_failed_bundle_leaves_nothing(client, register, monkeypatch):
+    import app.api.prescription as prescription
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("boom")
+
+    # After every row is inserted, just before the commit
+    monkeypatch.setattr(prescription, "mark_dirty", broken)
+    doctor, _ = register("doctor")
+    patient, patient_id = register()
+
+    with pytest.raises(RuntimeError):
+        _bundle(client, doctor, patient_id, [ITEM])
+
+    assert client.get("/api/prescriptions/", headers=patient).json() == []
+    assert client.get("/api/medications/", headers=patient).json() == []
+    assert client.get("/api/reminders/", headers=patient).json() == []
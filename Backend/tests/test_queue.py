@@ -0,0 +1,121 @@
+"""Job queue backends: ordering, delays, retries, leases and job keys"""
+import threading
+import time
+
+import pytest
+
+from app.services import queue_services
+from app.services.queue_services import Job, MemoryBackend, RedisBackend
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    import redis
+
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(
+        redis.Redis,
+        "from_url",
+        lambda url, **kwargs: fakeredis.FakeRedis(server=server),
+    )
+    # Sweep delayed jobs and expired leases on every pop
+    monkeypatch.setattr(queue_services, "POLL_SECONDS", 0)
+
+
+@pytest.fixture(params=["memory", "redis"])
+def backend(request):
+    if request.param == "memory":
+        return MemoryBackend()
+    request.getfixturevalue("fake_redis")
+    return RedisBackend("redis://fake", visibility_timeout=60)
+
+
+def _job(**fields):
+    return Job(task="tests.noop", **fields)
+
+
+def test_pops_by_priority_then_age(backend):
+    backend.push(_job(priority=5, id="late"), key_ttl=60)
+    backend.push(_job(priority=0, id="urgent"), key_ttl=60)
+    backend.push(_job(priority=5, id="later", run_at=time.time() + 0.001), key_ttl=60)
+    time.sleep(0.01)
+
+    popped = [backend.pop(timeout=0.1).id for _ in range(3)]
+
+    assert popped == ["urgent", "late", "later"]
+    assert backend.pop(timeout=0.05) is None
+
+
+def test_delayed_jobs_are_promoted_when_due(backend):
+    backend.push(_job(id="soon", run_at=time.time() + 0.3), key_ttl=60)
+
+    assert backend.pop(timeout=0.05) is None
+    assert backend.depth()["delayed"] == 1
+    job = backend.pop(timeout=2)
+    assert job is not None and job.id == "soon"
+
+
+def test_retry_requeues_with_its_attempts(backend):
+    backend.push(_job(id="flaky"), key_ttl=60)
+    job = backend.pop(timeout=0.1)
+    job.attempts, job.error = 1, "boom"
+    job.run_at = time.time() + 0.2
+
+    backend.retry(job)
+
+    assert backend.depth() == {"ready": 0, "delayed": 1, "running": 0}
+    again = backend.pop(timeout=2)
+    assert (again.id, again.attempts, again.error) == ("flaky", 1, "boom")
+    backend.complete(again)
+    assert backend.depth() == {"ready": 0, "delayed": 0, "running": 0}
+
+
+def test_job_keys_drop_duplicates_until_the_job_fails(backend):
+    assert backend.push(_job(key="report:1"), key_ttl=60)
+    assert not backend.push(_job(key="report:1"), key_ttl=60)
+    assert backend.push(_job(key="report:2"), key_ttl=60)
+
+    job = backend.pop(timeout=0.1)
+    backend.fail(job)
+
+    assert backend.push(_job(key="report:1"), key_ttl=60)
+
+
+def test_expired_lease_is_delivered_again(fake_redis):
+    backend = RedisBackend("redis://fake", visibility_timeout=0.2)
+    backend.push(_job(id="orphan"), key_ttl=60)
+
+    first = backend.pop(timeout=0.1)
+    assert backend.depth() == {"ready": 0, "delayed": 0, "running": 1}
+    assert backend.pop(timeout=0.05) is None  # still leased
+    time.sleep(0.3)  # the worker died without completing it
+
+    again = backend.pop(timeout=0.1)
+    assert again.id == first.id == "orphan"
+    backend.complete(again)
+    assert backend.depth() == {"ready": 0, "delayed": 0, "running": 0}
+
+
+def test_concurrent_pops_claim_each_job_once(fake_redis):
+    backend = RedisBackend("redis://fake", visibility_timeout=60)
+    for i in range(50):
+        backend.push(_job(id=f"job-{i}"), key_ttl=60)
+    claimed, lock = [], threading.Lock()
+
+    def work():
+        while True:
+            job = backend.pop(timeout=0.05)
+            if job is None:
+                return
+            with lock:
+                claimed.append(job.id)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(claimed) == sorted(f"job-{i}" for i in range(50))
+    assert backend.depth() == {"ready": 0, "delayed": 0, "running": 50}
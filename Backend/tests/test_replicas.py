@@ -0,0 +1,147 @@
+"""Read routing between the primary and a replica, with two local databases
+
+The replica is a separate SQLite file that only changes when a test calls
+replicate(), so any row written since shows which database a read used.
+"""
+import time
+
+import pytest
+from sqlalchemy import select
+
+from conftest import replicate
+
+
+@pytest.fixture
+def routing(app):
+    from database import SessionLocal, engine, replica_engines
+    from app.utils.replicas import RoutingSession
+
+    replicas = RoutingSession.replicas
+    # Measured lag from an earlier test must not carry over
+    replicas._lag.clear()
+    replicas._checked_at.clear()
+    return SessionLocal, engine, replica_engines[0], replicas
+
+
+def _settle(seconds: float = 0.45) -> None:
+    """Outlast the sticky window and the replica lag bound (see conftest)"""
+    time.sleep(seconds)
+
+
+def test_read_only_session_uses_replica(routing, register):
+    SessionLocal, primary, replica, _ = routing
+    from app.models.user import User
+
+    _, user_id = register()
+    with SessionLocal() as db:
+        db.info["read_only"] = True
+        query = select(User.id).where(User.id == user_id)
+        assert db.get_bind(clause=query) is replica
+        assert db.execute(query).first() is None  # not replicated yet
+
+    replicate()
+    with SessionLocal() as db:
+        db.info["read_only"] = True
+        assert db.execute(select(User.id).where(User.id == user_id)).scalar() == user_id
+
+
+def test_writes_and_default_sessions_use_primary(routing, register):
+    SessionLocal, primary, replica, _ = routing
+    from app.models.user import User
+
+    _, user_id = register()
+    with SessionLocal() as db:
+        assert db.execute(select(User.id).where(User.id == user_id)).scalar() == user_id
+
+    with SessionLocal() as db:
+        db.info["read_only"] = True
+        db.query(User).filter(User.id == user_id).update({"name": "renamed"})
+        # Reads after a write in the same session see it
+        assert db.get_bind(clause=select(User.id)) is primary
+        db.rollback()
+
+
+def test_reads_stick_to_primary_after_a_write(routing, client, register):
+    SessionLocal, primary, replica, _ = routing
+    from app.utils.replicas import RoutingSession
+
+    patient, patient_id = register()
+    replicate()
+    _settle()
+
+    # Vitals reads use a replica and no ETag, so only stickiness applies
+    reading = {"kind": "heart_rate", "measured_at": "2026-01-01T08:00:00", "value": 70}
+    batch = {"device_id": "watch", "readings": [reading]}
+    sent = client.post("/api/vitals/", json=batch, headers=patient)
+    assert sent.json()["accepted"] == 1, sent.text
+    params = {
+        "kind": "heart_rate",
+        "start": "2026-01-01T00:00:00",
+        "end": "2026-01-02T00:00:00",
+        "resolution": "raw",
+    }
+    # The replica does not have the reading; its writer still reads it
+    series = client.get("/api/vitals/", params=params, headers=patient)
+    assert [point["avg"] for point in series.json()["points"]] == [70]
+
+    assert RoutingSession.sticky.active(patient_id)
+    with SessionLocal() as db:
+        db.info.update(read_only=True, user_id=patient_id)
+        assert db.get_bind(clause=select(1)) is primary
+
+    _settle()
+    assert not RoutingSession.sticky.active(patient_id)
+    series = client.get("/api/vitals/", params=params, headers=patient)
+    assert series.json()["points"] == []
+
+
+def test_lagging_replica_falls_back_to_primary(routing, monkeypatch):
+    SessionLocal, primary, replica, replicas = routing
+    from app.utils.replicas import ReplicaSet
+
+    def measured(lag):
+        monkeypatch.setattr(ReplicaSet, "_measure", staticmethod(lambda engine: lag))
+
+    measured(60.0)
+    with SessionLocal() as db:
+        db.info["read_only"] = True
+        assert db.get_bind(clause=select(1)) is primary
+
+    measured(float("inf"))  # unreachable
+    time.sleep(replicas.check_interval)
+    with SessionLocal() as db:
+        db.info["read_only"] = True
+        assert db.get_bind(clause=select(1)) is primary
+
+    measured(0.0)
+    time.sleep(replicas.check_interval)
+    with SessionLocal() as db:
+        db.info["read_only"] = True
+        assert db.get_bind(clause=select(1)) is replica
+
+
+def test_etag_never_tags_stale_replica_rows(routing, client, register):
+    patient, patient_id = register()
+    doctor, doctor_id = register("doctor")
+    replicate()
+    _settle()
+
+    first = client.get("/api/messages/", headers=doctor)
+    assert first.json() == []
+    tag = first.headers["ETag"]
+
+    # Another user's write: the doctor has no sticky window, and the
+    # replica has not seen the message
+    message = {"receiver_id": doctor_id, "message": "hello"}
+    client.post("/api/messages/", json=message, headers=patient)
+    second = client.get("/api/messages/", headers={**doctor, "If-None-Match": tag})
+    assert second.status_code == 200
+    assert [m["message"] for m in second.json()] == ["hello"]
+    assert second.headers["ETag"] != tag
+
+    replicate()
+    _settle()
+    third = client.get(
+        "/api/messages/", headers={**doctor, "If-None-Match": second.headers["ETag"]}
+    )
+    assert third.status_code == 304
@@ -0,0 +1,116 @@
+"""Moving a patient between shards keeps their rows' ids"""
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, select
+
+PATIENT_ID = 42
+
+
+@pytest.fixture
+def router(app, tmp_path):
+    from database import Base
+    from app.models.shard import ShardAssignment
+    from app.utils.sharding import ShardRouter, create_shard_schema
+
+    engines = {
+        name: create_engine(f"sqlite:///{tmp_path / f'{name}.db'}") for name in "ab"
+    }
+    for engine in engines.values():
+        create_shard_schema(engine, Base.metadata)
+    ShardAssignment.__table__.create(engines["a"])
+    yield ShardRouter(engines, directory_bind=engines["a"], refresh_seconds=0)
+    for engine in engines.values():
+        engine.dispose()
+
+
+def _rows(engine, table):
+    with engine.connect() as conn:
+        return {row.id: row for row in conn.execute(select(table).order_by(table.c.id))}
+
+
+def test_move_keeps_ids_and_tombstones_the_source(router):
+    from database import Base
+    from app.services.shard_services import count_rows, move_patient
+
+    medications = Base.metadata.tables["medications"]
+    diary = Base.metadata.tables["symptom_diary"]
+    source, _ = router.locate(PATIENT_ID)
+    target = next(name for name in router.engines if name != source)
+    with router.engines[source].begin() as conn:
+        conn.execute(
+            medications.insert(),
+            [
+                {
+                    "id": medication_id,
+                    "user_id": PATIENT_ID,
+                    "name": "Amoxicillin",
+                    "dosage": "500mg",
+                    "time": "08:00",
+                    "total_tablets": 20,
+                    "remaining_tablets": 20,
+                }
+                for medication_id in (1001, 2002)
+            ],
+        )
+        conn.execute(
+            diary.insert(),
+            {
+                "id": 3003,
+                "user_id": PATIENT_ID,
+                "date": datetime.utcnow(),
+                "symptoms": "headache",
+                "severity": 3,
+            },
+        )
+        # Another patient's row on the same shard stays put
+        conn.execute(
+            diary.insert(),
+            {"id": 4004, "user_id": PATIENT_ID + 1, "symptoms": "cough", "severity": 2},
+        )
+
+    moved_from, copied = move_patient(router, PATIENT_ID, target, settle=0)
+
+    assert moved_from == source
+    assert copied["medications"] == 2 and copied["symptom_diary"] == 1
+    assert router.locate(PATIENT_ID) == (target, None)
+    moved = _rows(router.engines[target], medications)
+    assert list(moved) == [1001, 2002]
+    assert all(row.deleted_at is None for row in moved.values())
+    assert list(_rows(router.engines[target], diary)) == [3003]
+    # The source keeps tombstones under the same ids, for delta syncs
+    left = _rows(router.engines[source], medications)
+    assert list(left) == [1001, 2002]
+    assert all(row.deleted_at is not None for row in left.values())
+    assert count_rows(router.engines[source], PATIENT_ID)["medications"] == 0
+    assert _rows(router.engines[source], diary)[4004].deleted_at is None
+
+
+def test_move_back_replaces_the_earlier_copy(router):
+    from database import Base
+    from app.services.shard_services import count_rows, move_patient
+
+    medications = Base.metadata.tables["medications"]
+    source, _ = router.locate(PATIENT_ID)
+    target = next(name for name in router.engines if name != source)
+    with router.engines[source].begin() as conn:
+        conn.execute(
+            medications.insert(),
+            {
+                "id": 5005,
+                "user_id": PATIENT_ID,
+                "name": "Ibuprofen",
+                "dosage": "200mg",
+                "time": "12:00",
+                "total_tablets": 10,
+                "remaining_tablets": 10,
+            },
+        )
+
+    move_patient(router, PATIENT_ID, target, settle=0)
+    move_patient(router, PATIENT_ID, source, settle=0)
+
+    assert router.locate(PATIENT_ID) == (source, None)
+    assert count_rows(router.engines[source], PATIENT_ID)["medications"] == 1
+    assert count_rows(router.engines[target], PATIENT_ID)["medications"] == 0
+    assert list(_rows(router.engines[source], medications)) == [5005]
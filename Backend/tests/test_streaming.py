@@ -0,0 +1,105 @@
+"""NDJSON lists stream in bounded memory, however long the list
+
+The app is called as plain ASGI and each body chunk is dropped once
+counted, so the traced memory is the server's alone: the rows in flight,
+never the whole list or body.
+"""
+import asyncio
+import tracemalloc
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert
+
+ROWS = 100_000
+# A plain JSON response of ROWS entries peaks at over thirty times this
+MAX_PEAK_BYTES = 8 * 1024 * 1024
+
+
+@pytest.fixture
+def long_diary(app, register):
+    """A patient with ROWS symptom diary entries; (auth headers, rows)"""
+    from database import engine
+    from app.models.symptom_diary import SymptomDiary
+
+    headers, user_id = register()
+    start = datetime(2020, 1, 1)
+    with engine.begin() as conn:
+        for first in range(0, ROWS, 10_000):
+            conn.execute(
+                insert(SymptomDiary.__table__),
+                [
+                    {
+                        "user_id": user_id,
+                        "date": start + timedelta(minutes=i),
+                        "symptoms": "headache, fever",
+                        "severity": i % 10 + 1,
+                        "notes": "",
+                        "created_at": start,
+                        "updated_at": start,
+                    }
+                    for i in range(first, first + 10_000)
+                ],
+            )
+    return headers, ROWS
+
+
+def _get(app, path: str, headers: dict):
+    """(status, body size, line count, peak traced bytes) of one request"""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"testserver")]
+        + [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+        "client": ("127.0.0.1", 50000),
+        "server": ("testserver", 80),
+    }
+    result = {"status": None, "bytes": 0, "lines": 0}
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if requested:
+            # The client stays connected until the response is complete
+            await asyncio.Event().wait()
+        requested = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            result["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            body = message.get("body", b"")
+            result["bytes"] += len(body)
+            result["lines"] += body.count(b"\n")
+
+    tracemalloc.start()
+    try:
+        asyncio.run(app(scope, receive, send))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result["status"], result["bytes"], result["lines"], peak
+
+
+def test_ndjson_list_streams_in_bounded_memory(app, long_diary):
+    headers, rows = long_diary
+
+    status, size, lines, peak = _get(
+        app,
+        "/api/symptom-diary/",
+        {**headers, "Accept": "application/x-ndjson", "Accept-Encoding": "identity"},
+    )
+
+    assert status == 200
+    assert lines == rows
+    # The body alone is over the bound, so it cannot have been held whole
+    assert size > MAX_PEAK_BYTES
+    assert peak < MAX_PEAK_BYTES, f"peak {peak / 2**20:.1f} MiB"
@@ -0,0 +1,64 @@
+"""Symptom tags: parsing limits and the registry's lookups on the primary"""
+import uuid
+
+import pytest
+from sqlalchemy import event
+
+
+@pytest.fixture
+def statements(app):
+    """SQL run on the primary while the test runs"""
+    from database import engine
+
+    seen = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        seen.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    yield seen
+    event.remove(engine, "before_cursor_execute", record)
+
+
+def test_tags_are_capped():
+    from app.utils.symptom_tags import MAX_TAG_WORDS, MAX_TAGS, symptom_tags
+
+    text = ", ".join(f"symptom{'x' * i}" for i in range(MAX_TAGS * 3))
+    assert len(symptom_tags(text)) == MAX_TAGS
+    assert symptom_tags("x" * 500) == []
+    sentence = " ".join(["word"] * (MAX_TAG_WORDS + 1))
+    assert symptom_tags(f"headache, {sentence}") == ["headache"]
+
+
+def test_unknown_names_insert_and_select_only_those(statements):
+    from app.services.symptom_services import SymptomTagRegistry
+
+    registry = SymptomTagRegistry()
+    first, second = (f"tag {uuid.uuid4().hex[:8]}" for _ in range(2))
+
+    ids = registry.ids([first, second, first])
+
+    assert len(ids) == 3 and ids[0] == ids[2] != ids[1]
+    assert len(statements) == 2
+    assert statements[0].startswith("INSERT") and "ON CONFLICT" in statements[0]
+    assert statements[1].startswith("SELECT") and " IN " in statements[1]
+
+    statements.clear()
+    assert registry.ids([second, first]) == [ids[1], ids[0]]
+    assert registry.names(ids) == {ids[0]: first, ids[1]: second}
+    assert statements == []  # all cached
+
+
+def test_names_added_elsewhere_are_read_back(statements):
+    from app.services.symptom_services import SymptomTagRegistry
+
+    name = f"tag {uuid.uuid4().hex[:8]}"
+    [tag_id] = SymptomTagRegistry().ids([name])
+    other = SymptomTagRegistry()  # another process, as far as caches go
+
+    statements.clear()
+    assert other.ids([name], create=False) == [tag_id]
+    assert other.names([tag_id]) == {tag_id: name}
+    assert other.ids([name]) == [tag_id]
+    assert len(statements) == 1 and statements[0].startswith("SELECT")
+    assert other.ids([f"tag {uuid.uuid4().hex[:8]}"], create=False) == []
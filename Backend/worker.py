@@ -0,0 +1,77 @@
+"""Background job worker for the Redis queue.
+
+Usage:
+    QUEUE_BACKEND=redis python worker.py --concurrency 8 --metrics-port 9101
+
+Runs jobs enqueued by the web processes: coroutine tasks on the event loop,
+blocking ones in a thread pool and ``executor="process"`` tasks in a
+process pool. SIGTERM/SIGINT stop fetching new jobs and give running ones
+--graceful-timeout seconds to finish; jobs that do not finish are queued
+again when their lease expires. Start as many workers as needed.
+"""
+import argparse
+import asyncio
+import logging
+import signal
+
+logger = logging.getLogger("worker")
+
+
+def _parse_args(settings):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=settings.QUEUE_CONCURRENCY)
+    parser.add_argument("--threads", type=int, default=settings.QUEUE_THREADS)
+    parser.add_argument("--processes", type=int, default=settings.QUEUE_PROCESSES)
+    parser.add_argument(
+        "--graceful-timeout", type=int, default=settings.GRACEFUL_TIMEOUT
+    )
+    parser.add_argument(
+        "--metrics-port", type=int, help="serve Prometheus metrics on this port"
+    )
+    return parser.parse_args()
+
+
+async def _serve(worker, graceful_timeout: int) -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    worker.start()
+    await stop.wait()
+    logger.info("Stopping; waiting up to %ds for running jobs", graceful_timeout)
+    await worker.stop(graceful_timeout)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    from config import settings
+
+    args = _parse_args(settings)
+    if settings.QUEUE_BACKEND != "redis":
+        raise SystemExit(
+            "worker.py needs QUEUE_BACKEND=redis; memory-queue jobs run in the "
+            "web process"
+        )
+
+    # Importing the application registers every task it can enqueue
+    from main import app  # noqa: F401
+    from app.services.queue_services import Worker, queue
+
+    if args.metrics_port:
+        from prometheus_client import start_http_server
+
+        start_http_server(args.metrics_port)
+
+    worker = Worker(
+        queue,
+        concurrency=args.concurrency,
+        threads=args.threads,
+        processes=args.processes,
+    )
+    logger.info("Running jobs with concurrency %d", args.concurrency)
+    asyncio.run(_serve(worker, args.graceful_timeout))
+
+
+if __name__ == "__main__":
+    main()